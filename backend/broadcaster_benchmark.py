@@ -0,0 +1,292 @@
+"""
+实时消息广播器基准测试
+用模拟的 WebSocket 订阅者（可配置发送延迟和失败率）压测 MessageBroadcaster，
+报告入队耗时（即 LiveChatEventHandler 给事件流程增加的延迟）、端到端投递延迟 p50/p99、丢弃数和内存占用
+
+用法（在主程序目录下，需要主程序的运行环境）:
+    python -m <插件包>.broadcaster_benchmark --subscribers 50 --rate 200 --duration 10
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import time
+import tracemalloc
+from typing import Any, Optional
+
+import psutil
+
+from .utils.message_broadcaster import (
+    OVERFLOW_DROP_OLDEST,
+    OVERFLOW_POLICIES,
+    MessageBroadcaster,
+    decode_message,
+)
+
+
+def percentile(sorted_values: list[float], pct: float) -> Optional[float]:
+    """已排序数据的百分位数（最近秩法）"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(values: list[float]) -> dict[str, Optional[float]]:
+    """毫秒为单位的延迟摘要"""
+    ordered = sorted(round(v * 1000, 3) for v in values)
+    return {
+        "count": len(ordered),
+        "p50_ms": percentile(ordered, 50),
+        "p99_ms": percentile(ordered, 99),
+        "max_ms": ordered[-1] if ordered else None,
+    }
+
+
+class FakeSubscriber:
+    """
+    模拟的 WebSocket 客户端
+
+    每次发送等待 send_delay（加上随机抖动）模拟网络和客户端处理，
+    按 failure_rate 的概率抛出异常模拟连接断开
+    """
+
+    def __init__(
+        self,
+        name: str,
+        sent_at: dict[Any, float],
+        send_delay: float,
+        jitter: float,
+        failure_rate: float,
+        rng: random.Random,
+    ):
+        self.name = name
+        self.sent_at = sent_at
+        self.send_delay = send_delay
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.rng = rng
+
+        self.latencies: list[float] = []
+        self.received = 0
+        self.control_frames = 0
+        self.failed = False
+
+    async def send_text(self, text: str) -> None:
+        received_at = time.perf_counter()
+        if self.failure_rate and self.rng.random() < self.failure_rate:
+            self.failed = True
+            raise ConnectionError("模拟的连接断开")
+
+        message = decode_message(text)
+        if message.get("type") == "message":
+            sent_at = self.sent_at.get(message.get("message_id"))
+            if sent_at is not None:
+                self.latencies.append(received_at - sent_at)
+            self.received += 1
+        else:
+            # coalesced / reset 等控制消息
+            self.control_frames += 1
+
+        delay = self.send_delay + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def make_message(index: int, stream_id: str) -> dict[str, Any]:
+    """构造与适配器上报格式相同的消息"""
+    return {
+        "message_info": {
+            "platform": "benchmark",
+            "message_id": index,
+            "time": time.time(),
+            "user_info": {"user_id": str(index % 97), "user_nickname": f"user{index % 97}"},
+            "group_info": {"group_id": stream_id, "group_name": f"group-{stream_id}"},
+        },
+        "message_segment": {
+            "type": "seglist",
+            "data": [
+                {"type": "text", "data": f"benchmark message {index} "},
+                {"type": "at", "data": {"name": "bot"}},
+                {"type": "image", "data": ""},
+            ],
+        },
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> dict[str, Any]:
+    rng = random.Random(args.seed)
+    process = psutil.Process(os.getpid())
+    gc.collect()
+    rss_before = process.memory_info().rss
+    if args.trace_memory:
+        tracemalloc.start()
+
+    broadcaster = MessageBroadcaster(
+        max_queue=args.queue_size,
+        overflow_policy=args.overflow_policy,
+        stream_buffer_size=args.stream_buffer_size,
+        buffer_budget=args.buffer_budget,
+    )
+    streams = [f"stream-{i}" for i in range(max(1, args.streams))]
+    sent_at: dict[Any, float] = {}
+
+    subscribers: list[FakeSubscriber] = []
+    slow_count = round(args.subscribers * args.slow_fraction)
+    for i in range(args.subscribers):
+        slow = i < slow_count
+        subscriber = FakeSubscriber(
+            name=f"sub-{i}",
+            sent_at=sent_at,
+            send_delay=(args.slow_delay_ms if slow else args.send_delay_ms) / 1000,
+            jitter=args.jitter_ms / 1000,
+            failure_rate=args.failure_rate,
+            rng=rng,
+        )
+        subscribers.append(subscriber)
+        # 一部分客户端订阅全部消息，其余各自订阅一个聊天流
+        stream_id = None if rng.random() < args.global_fraction else rng.choice(streams)
+        await broadcaster.subscribe(subscriber.send_text, stream_id, raw=True)
+
+    enqueue_times: list[float] = []
+    interval = 1 / args.rate if args.rate > 0 else 0.0
+    total = int(args.rate * args.duration) if args.rate > 0 else args.messages
+    start = time.perf_counter()
+    for index in range(total):
+        if interval:
+            delay = start + index * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        elif index % 100 == 0:
+            # 不限速时也让出事件循环，让发送任务有机会运行
+            await asyncio.sleep(0)
+
+        stream_id = streams[index % len(streams)]
+        message = make_message(index, stream_id)
+        t0 = time.perf_counter()
+        sent_at[index] = t0
+        await broadcaster.broadcast(message, stream_id=stream_id, direction="incoming", sender_type="user")
+        enqueue_times.append(time.perf_counter() - t0)
+    publish_elapsed = time.perf_counter() - start
+
+    # 等待发送队列排空（或超时）
+    drain_deadline = time.perf_counter() + args.drain_timeout
+    while time.perf_counter() < drain_deadline:
+        if all(s["queue_depth"] == 0 or s["closed"] for s in broadcaster.get_stats()["subscribers"]):
+            break
+        await asyncio.sleep(0.05)
+
+    stats = broadcaster.get_stats()
+    traced_current = traced_peak = None
+    if args.trace_memory:
+        traced_current, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    rss_after = process.memory_info().rss
+
+    for subscriber in subscribers:
+        await broadcaster.unsubscribe_all(subscriber.send_text)
+
+    all_latencies = [lat for subscriber in subscribers for lat in subscriber.latencies]
+    return {
+        "config": {
+            key: getattr(args, key)
+            for key in (
+                "subscribers",
+                "rate",
+                "duration",
+                "streams",
+                "global_fraction",
+                "send_delay_ms",
+                "jitter_ms",
+                "slow_fraction",
+                "slow_delay_ms",
+                "failure_rate",
+                "queue_size",
+                "overflow_policy",
+            )
+        },
+        "published": total,
+        "publish_rate": round(total / publish_elapsed, 1) if publish_elapsed > 0 else None,
+        "enqueue": summarize(enqueue_times),
+        "delivery": summarize(all_latencies),
+        "delivered": sum(s.received for s in subscribers),
+        "control_frames": sum(s.control_frames for s in subscribers),
+        "dropped": sum(s["dropped"] for s in stats["subscribers"]),
+        "undelivered": sum(s["queue_depth"] for s in stats["subscribers"]),
+        "failed_subscribers": sum(1 for s in subscribers if s.failed),
+        "closed_subscribers": sum(1 for s in stats["subscribers"] if s["closed"]),
+        "max_queue_depth": max((s["max_queue_depth"] for s in stats["subscribers"]), default=0),
+        "memory": {
+            "rss_delta_mb": round((rss_after - rss_before) / 1024 / 1024, 2),
+            "traced_current_mb": round(traced_current / 1024 / 1024, 2) if traced_current is not None else None,
+            "traced_peak_mb": round(traced_peak / 1024 / 1024, 2) if traced_peak is not None else None,
+            "buffered": stats["buffered"],
+            "stream_buffered": stats["stream_buffered"],
+        },
+    }
+
+
+def format_report(result: dict[str, Any]) -> str:
+    def ms(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value:.3f} ms"
+
+    config = result["config"]
+    memory = result["memory"]
+    lines = [
+        f"订阅者 {config['subscribers']}，速率 {config['rate']} 条/秒，时长 {config['duration']} 秒，"
+        f"队列 {config['queue_size']}（{config['overflow_policy']}）",
+        f"发布: {result['published']} 条，实际速率 {result['publish_rate']} 条/秒",
+        f"入队耗时: p50 {ms(result['enqueue']['p50_ms'])}  p99 {ms(result['enqueue']['p99_ms'])}  "
+        f"max {ms(result['enqueue']['max_ms'])}",
+        f"端到端投递: p50 {ms(result['delivery']['p50_ms'])}  p99 {ms(result['delivery']['p99_ms'])}  "
+        f"max {ms(result['delivery']['max_ms'])}",
+        f"投递 {result['delivered']} 条，控制消息 {result['control_frames']} 条，丢弃 {result['dropped']} 条，"
+        f"未投递 {result['undelivered']} 条，最大队列深度 {result['max_queue_depth']}",
+        f"失败订阅者 {result['failed_subscribers']}，已关闭订阅者 {result['closed_subscribers']}",
+        f"内存: RSS 增量 {memory['rss_delta_mb']} MB，缓冲 {memory['buffered']} 条（聊天流 {memory['stream_buffered']} 条）",
+    ]
+    if memory["traced_peak_mb"] is not None:
+        lines.append(f"tracemalloc: 当前 {memory['traced_current_mb']} MB，峰值 {memory['traced_peak_mb']} MB")
+    return "\n".join(lines)
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="MessageBroadcaster 吞吐量与扇出基准测试")
+    parser.add_argument("--subscribers", type=int, default=50, help="模拟的 WebSocket 客户端数")
+    parser.add_argument("--rate", type=float, default=200.0, help="每秒发布的消息数，0 表示不限速")
+    parser.add_argument("--duration", type=float, default=10.0, help="发布持续时间（秒）")
+    parser.add_argument("--messages", type=int, default=10000, help="不限速时发布的消息总数")
+    parser.add_argument("--streams", type=int, default=10, help="聊天流数量")
+    parser.add_argument("--global-fraction", type=float, default=0.5, help="订阅全部消息的客户端比例")
+    parser.add_argument("--send-delay-ms", type=float, default=1.0, help="每次发送的模拟耗时（毫秒）")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="发送耗时的随机抖动上限（毫秒）")
+    parser.add_argument("--slow-fraction", type=float, default=0.0, help="慢客户端比例")
+    parser.add_argument("--slow-delay-ms", type=float, default=50.0, help="慢客户端每次发送的耗时（毫秒）")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="每次发送失败（连接断开）的概率")
+    parser.add_argument("--queue-size", type=int, default=256, help="每个订阅者的发送队列上限")
+    parser.add_argument(
+        "--overflow-policy", choices=OVERFLOW_POLICIES, default=OVERFLOW_DROP_OLDEST, help="发送队列满时的策略"
+    )
+    parser.add_argument("--stream-buffer-size", type=int, default=100, help="每个聊天流缓存的消息数")
+    parser.add_argument("--buffer-budget", type=int, default=5000, help="聊天流缓存的消息总数上限")
+    parser.add_argument("--drain-timeout", type=float, default=10.0, help="发布结束后等待队列排空的时间（秒）")
+    parser.add_argument("--trace-memory", action="store_true", help="用 tracemalloc 统计内存（会明显变慢）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    result = asyncio.run(run_benchmark(args))
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print(format_report(result))
+
+
+if __name__ == "__main__":
+    main()
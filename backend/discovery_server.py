@@ -6,41 +6,162 @@
 """
 
 import asyncio
+import json
+import math
+import mimetypes
+import os
+import time
 from pathlib import Path
-from typing import Optional
+from collections.abc import Awaitable
+from typing import Any, AsyncIterator, Optional, TypeVar, Union
+from urllib.parse import urlencode
 
 import aiohttp
 import uvicorn
 from fastapi import FastAPI, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-import websockets
+from starlette.background import BackgroundTask, BackgroundTasks
+from starlette.datastructures import Headers
+from starlette.staticfiles import NotModifiedResponse
 from websockets.exceptions import ConnectionClosed
 
 from src.common.logger import get_logger
 
+from .utils.discovery import (
+    cache_control_for,
+    cached_strong_etag,
+    negotiate_encoding,
+    precompress_static_dir,
+    warm_etag_cache,
+)
+from .utils.discovery.compression import ProxyCompressionMiddleware
+from .utils.discovery.instances import (
+    INSTANCE_HEADER,
+    INSTANCE_QUERY_PARAM,
+    BotInstance,
+    InstanceRegistry,
+)
+from .utils.discovery.metrics import Counter, DiscoveryMetrics, Gauge, ProxyMetricsMiddleware
+from .utils.discovery.rate_limiter import AdmissionController, AdmissionMiddleware
+from .utils.discovery.response_cache import MUTATING_METHODS, ProxyResponseCache
+from .utils.discovery.single_flight import SingleFlight
+from .utils.discovery.static_assets import find_compressed_variants
+from .utils.discovery.ws_multiplexer import ClientChannel, WebSocketMultiplexer
+from .utils.discovery.static_bundle import StaticBundleApp, get_static_bundle, reload_static_bundle
+from .utils.discovery.worker import WorkerSupervisor
+
 logger = get_logger("WebUIAuth.DiscoveryServer")
 
+T = TypeVar("T")
+
 # 发现服务器的固定端口
 DISCOVERY_PORT = 12138
 
+# 流式代理时每次读取的块大小
+PROXY_CHUNK_SIZE = 64 * 1024
+
+# 可以合并或缓存的响应体大小上限，超出时改为流式转发给发起请求的客户端
+MAX_SHARED_BODY = 1024 * 1024
+
+# 逐跳头部，不应由代理转发（RFC 7230 6.1）
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailer",
+    "transfer-encoding",
+    "upgrade",
+}
+
 # 全局变量存储服务器实例
 _server_instance: Optional[uvicorn.Server] = None
 _server_task: Optional[asyncio.Task] = None
+# 独立进程模式下的工作进程守护（父进程）
+_supervisor: Optional[WorkerSupervisor] = None
+# 工作进程自身的守护信息（子进程）
+_worker_info: Optional[dict[str, Any]] = None
+
+
+class BotInstanceInfo(BaseModel):
+    """主程序实例状态"""
+    id: str
+    name: str
+    host: str
+    port: int
+    transport: str
+    status: str
+    latency_ms: Optional[float] = None
+    last_check: Optional[float] = None
+    last_error: Optional[str] = None
+    consecutive_failures: int = 0
+    in_flight: int = 0
+    requests: int = 0
+    circuit: Optional[dict[str, Any]] = None
+    default: bool = False
 
 
 class ServerInfo(BaseModel):
     """主程序服务器信息"""
     host: str
     port: int
+    instance_id: str = ""
+    instance_routing: str = "default"
+    instances: list[BotInstanceInfo] = []
 
 
 class SPAStaticFiles(StaticFiles):
     """
     支持单页应用(SPA)的静态文件服务
     对于不存在的路径，返回index.html而不是404，让前端路由处理
+
+    同时根据 Accept-Encoding 发送预压缩的 .br/.gz 副本，附带强 ETag，
+    带内容哈希的 assets/* 标记为 immutable，其余文件每次重新验证
     """
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        relative_path = os.path.relpath(full_path, str(self.directory))
+
+        variants = find_compressed_variants(full_path, stat_result)
+        encoding = negotiate_encoding(request_headers.get("accept-encoding", ""), list(variants))
+
+        headers = {
+            "cache-control": cache_control_for(relative_path),
+            "vary": "Accept-Encoding",
+        }
+        # 内容摘要在启动时或后台线程中计算，尚未算好时由 FileResponse 按 mtime 和大小生成 ETag，
+        # 不在事件循环上读取整个文件
+        etag = cached_strong_etag(full_path, stat_result, encoding)
+        if etag is not None:
+            headers["etag"] = etag
+        media_type = mimetypes.guess_type(full_path)[0] or "text/plain"
+
+        if encoding:
+            headers["content-encoding"] = encoding
+            response = FileResponse(
+                variants[encoding],
+                status_code=status_code,
+                headers=headers,
+                media_type=media_type,
+            )
+        else:
+            response = FileResponse(
+                full_path,
+                status_code=status_code,
+                headers=headers,
+                media_type=media_type,
+                stat_result=stat_result,
+            )
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
     async def get_response(self, path: str, scope):
         try:
             return await super().get_response(path, scope)
@@ -53,23 +174,95 @@ class SPAStaticFiles(StaticFiles):
             return await super().get_response("index.html", scope)
 
 
-def create_discovery_app(main_host: str, main_port: int) -> FastAPI:
+def _filter_proxy_headers(headers: Any, *extra: str) -> dict[str, str]:
+    """
+    过滤掉逐跳头部以及额外指定的头部
+
+    Args:
+        headers: 原始头部（任意 Mapping）
+        extra: 额外需要排除的头部名称（小写）
+
+    Returns:
+        可以安全转发的头部字典
+    """
+    excluded = HOP_BY_HOP_HEADERS.union(extra)
+    return {k: v for k, v in headers.items() if k.lower() not in excluded}
+
+
+def create_discovery_app(
+    main_host: str,
+    main_port: int,
+    discovery_config: Optional[dict[str, Any]] = None,
+) -> FastAPI:
     """
     创建发现服务的FastAPI应用
     
     Args:
         main_host: 主程序的主机地址
         main_port: 主程序的端口
+        discovery_config: 插件配置中的 discovery 段，为空时使用默认值
         
     Returns:
         FastAPI应用实例
     """
+    discovery_config = discovery_config or {}
+    # 流式代理：请求体和响应体逐块转发，不在内存中完整缓存
+    stream_proxy = bool(discovery_config.get("stream_proxy", True))
+    # 启动时为静态资源生成 .br/.gz 副本
+    precompress_static = bool(discovery_config.get("precompress_static", True))
+    # 将静态资源整体载入内存，由 StaticBundleApp 直接响应
+    memory_static = bool(discovery_config.get("memory_static_bundle", True))
+    # 代理 GET 响应缓存（默认关闭）
+    response_cache: Optional[ProxyResponseCache] = None
+    if discovery_config.get("response_cache", False):
+        response_cache = ProxyResponseCache(
+            route_ttls=discovery_config.get("response_cache_ttls") or None,
+            max_entries=int(discovery_config.get("response_cache_max_entries", 512)),
+        )
+    # 代理与 WebSocket 指标，以 Prometheus 格式导出
+    metrics: Optional[DiscoveryMetrics] = None
+    if discovery_config.get("metrics", True):
+        metrics = DiscoveryMetrics()
+    # 按 API Key 和路由分组的限速与并发上限
+    admission: Optional[AdmissionController] = None
+    if discovery_config.get("rate_limit", False):
+        admission = AdmissionController(limits=discovery_config.get("rate_limits") or None)
+    # 主程序实例：本机主程序和配置中的额外实例，各自拥有连接池和健康状态
+    registry = InstanceRegistry.from_discovery_config(main_host, main_port, discovery_config)
+    # WebSocket 代理：有界发送队列，广播类路由共享上游连接
+    ws_multiplexer = WebSocketMultiplexer(
+        routes=discovery_config.get("ws_multiplex_routes"),
+        max_queue=int(discovery_config.get("ws_queue_size", 256)),
+        overflow_policy=str(discovery_config.get("ws_overflow_policy", "drop_oldest")),
+        replay_size=int(discovery_config.get("ws_replay_size", 100)),
+    )
+    # 合并并发的相同 GET 请求
+    single_flight: Optional[SingleFlight] = None
+    if discovery_config.get("coalesce_requests", True):
+        single_flight = SingleFlight(routes=discovery_config.get("coalesce_routes"))
+    # 合并或缓存的响应只缓冲不超过该大小的 JSON，其余响应保持流式转发
+    max_shared_body = int(discovery_config.get("coalesce_max_body", MAX_SHARED_BODY))
+
     app = FastAPI(
         title="MoFox WebUI Discovery Service",
         description="用于前端发现主程序地址的服务",
         version="1.0.0"
     )
     
+    # 按 Accept-Encoding 压缩代理的 JSON 等文本响应，主程序已压缩的响应原样透传
+    if discovery_config.get("compress_responses", True):
+        app.add_middleware(
+            ProxyCompressionMiddleware,
+            min_size=int(discovery_config.get("compress_min_size", 1024)),
+            content_types=discovery_config.get("compress_types") or None,
+            gzip_level=int(discovery_config.get("compress_gzip_level", 6)),
+            brotli_quality=int(discovery_config.get("compress_brotli_quality", 4)),
+        )
+    
+    # 准入控制放在 CORS 中间件内层，429 响应同样带有跨域头部
+    if admission is not None:
+        app.add_middleware(AdmissionMiddleware, controller=admission)
+    
     # 添加CORS中间件，允许前端跨域访问
     app.add_middleware(
         CORSMiddleware,
@@ -79,21 +272,102 @@ def create_discovery_app(main_host: str, main_port: int) -> FastAPI:
         allow_headers=["*"],
     )
     
-    # 创建 HTTP 客户端用于转发请求
-    http_client = aiohttp.ClientSession(
-        timeout=aiohttp.ClientTimeout(total=30.0)
-    )
+    @app.on_event("startup")
+    async def start_instance_health_checks():
+        """周期性检查所有主程序实例的可用性和延迟"""
+        app.state.instance_check_task = asyncio.create_task(registry.run_health_checks())
+    
+    if metrics is not None:
+        app.add_middleware(ProxyMetricsMiddleware, metrics=metrics)
+        
+        async def fetch_route_templates() -> list[str]:
+            """从默认主程序实例的 OpenAPI 文档获取路由模板"""
+            instance = registry.default
+            # 客户端关闭了自动解压，这里明确要求不压缩的响应
+            async with instance.session.get(
+                f"{instance.base_url}/openapi.json", headers={"Accept-Encoding": "identity"}
+            ) as response:
+                response.raise_for_status()
+                document = json.loads(await response.read())
+            return list(document.get("paths", {}))
+        
+        @app.on_event("startup")
+        async def start_route_template_refresh():
+            app.state.route_refresh_task = asyncio.create_task(
+                metrics.routes.refresh_forever(fetch_route_templates)
+            )
+        
+        def collect_component_metrics() -> list[Counter]:
+            """导出时采集缓存、请求合并、主程序实例状态和 WebSocket 帧计数"""
+            metrics.set_ws_frames(ws_multiplexer.frame_totals())
+            collected: list[Counter] = []
+            if response_cache is not None:
+                cache_counter = Counter("webui_proxy_cache_events_total", "代理响应缓存事件数", ("event",))
+                cache_stats = response_cache.get_stats()
+                for event in ("hits", "misses", "invalidations"):
+                    cache_counter.inc(event, amount=cache_stats[event])
+                collected.append(cache_counter)
+            if single_flight is not None:
+                coalesce_counter = Counter("webui_proxy_coalesce_total", "请求合并结果数", ("result",))
+                coalesce_counter.inc("executed", amount=single_flight.executed)
+                coalesce_counter.inc("coalesced", amount=single_flight.coalesced)
+                collected.append(coalesce_counter)
+            instance_up = Gauge("webui_instance_up", "主程序实例是否可用", ("instance",))
+            instance_latency = Gauge(
+                "webui_instance_latency_seconds", "主程序实例响应延迟的滑动平均", ("instance",)
+            )
+            circuit_open = Gauge("webui_instance_circuit_open", "主程序实例的熔断器是否打开", ("instance",))
+            for instance in registry.instances.values():
+                instance_up.set(instance.id, value=1 if instance.status == "up" else 0)
+                if instance.latency_ms is not None:
+                    instance_latency.set(instance.id, value=instance.latency_ms / 1000)
+                if instance.breaker is not None:
+                    circuit_open.set(instance.id, value=1 if instance.breaker.state != "closed" else 0)
+            collected.extend((instance_up, instance_latency, circuit_open))
+            if admission is not None:
+                rejected_counter = Counter(
+                    "webui_proxy_rejected_total", "准入控制拒绝的代理请求数", ("group", "reason")
+                )
+                for (group, reason), count in admission.rejected.items():
+                    rejected_counter.inc(group, reason, amount=count)
+                queued_counter = Counter("webui_proxy_queued_total", "因并发已满而排队的代理请求数", ("group",))
+                for group, count in admission.queued.items():
+                    queued_counter.inc(group, amount=count)
+                collected.extend((rejected_counter, queued_counter))
+            return collected
+        
+        metrics.registry.add_collector(collect_component_metrics)
+    
+    @app.get("/api/metrics", summary="Prometheus 指标", response_class=PlainTextResponse)
+    def get_metrics():
+        """按路由模板统计的代理请求数、进行中请求数、状态码、延迟直方图及 WebSocket 计数"""
+        if metrics is None:
+            return PlainTextResponse("# metrics disabled\n", status_code=404)
+        return PlainTextResponse(
+            metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+        )
     
     @app.on_event("shutdown")
     async def shutdown_event():
-        """关闭时清理HTTP客户端"""
-        await http_client.close()
+        """关闭时清理各实例的HTTP客户端"""
+        await registry.close()
     
     # 先定义API路由，确保它们不会被静态文件拦截
     @app.get("/api/health", summary="服务状态检查")
     def health_check():
         """检查服务是否运行"""
-        return {"status": "ok", "service": "MoFox WebUI Discovery"}
+        health: dict[str, Any] = {"status": "ok", "service": "MoFox WebUI Discovery"}
+        health["worker"] = _worker_info or {"isolated": False, "pid": os.getpid()}
+        health["upstream_transport"] = registry.default.transport_config.transport_name
+        health["instances"] = registry.to_list()
+        health["instance_routing"] = registry.routing
+        if response_cache is not None:
+            health["proxy_cache"] = response_cache.get_stats()
+        if single_flight is not None:
+            health["coalescing"] = single_flight.get_stats()
+        if admission is not None:
+            health["admission"] = admission.get_stats()
+        return health
     
     @app.get("/api/server-info", summary="获取主程序服务器信息", response_model=ServerInfo)
     def get_server_info():
@@ -101,12 +375,295 @@ def create_discovery_app(main_host: str, main_port: int) -> FastAPI:
         获取主程序的IP和端口信息
         前端通过此接口获取主程序地址，然后自行拼接API地址
         （保留用于调试和兼容性）
+
+        instances 列出所有主程序实例及其健康状态和延迟，
+        请求 /plugins/* 时通过 X-Bot-Instance 头部或 bot_instance 查询参数选择实例
         """
         return ServerInfo(
             host=main_host,
-            port=main_port
+            port=main_port,
+            instance_id=registry.default_id,
+            instance_routing=registry.routing,
+            instances=registry.to_list(),
         )
     
+    async def _stream_proxy_request(
+        instance: BotInstance,
+        request: Request,
+        target_url: str,
+        query_params: dict[str, str],
+        headers: dict[str, str],
+    ) -> Response:
+        """
+        以流式方式转发请求
+
+        请求体通过 request.stream() 逐块送往主程序，响应体通过
+        iter_chunked 逐块写回客户端。两端都是按需拉取，读写速度由较慢的
+        一方决定，单个请求的内存占用与负载大小无关。
+        """
+        # 没有请求体的方法不发送 body，避免 aiohttp 使用分块编码
+        has_body = request.method not in ("GET", "HEAD", "OPTIONS") or (
+            "content-length" in request.headers or "transfer-encoding" in request.headers
+        )
+
+        async def request_body() -> AsyncIterator[bytes]:
+            async for chunk in request.stream():
+                if chunk:
+                    yield chunk
+
+        upstream = await _record_upstream(
+            instance,
+            instance.session.request(
+                method=request.method,
+                url=target_url,
+                params=query_params,
+                headers=headers,
+                data=request_body() if has_body else None,
+                allow_redirects=True,
+                timeout=instance.transport_config.stream_timeout,
+            ),
+        )
+        return _streaming_response(upstream, request, target_url)
+
+    def _streaming_response(
+        upstream: aiohttp.ClientResponse,
+        request: Request,
+        target_url: str,
+        prefix: bytes = b"",
+    ) -> StreamingResponse:
+        """把上游响应逐块写回客户端，prefix 为已经从上游读出的开头部分"""
+
+        async def response_body() -> AsyncIterator[bytes]:
+            try:
+                if prefix:
+                    yield prefix
+                async for chunk in upstream.content.iter_chunked(PROXY_CHUNK_SIZE):
+                    yield chunk
+            except aiohttp.ClientError as e:
+                logger.warning(f"代理响应流中断 [{request.method} {target_url}]: {e}")
+            finally:
+                upstream.release()
+
+        # 保留上游的 Content-Length，缺失时由 uvicorn 使用分块编码
+        return StreamingResponse(
+            response_body(),
+            status_code=upstream.status,
+            headers=_filter_proxy_headers(upstream.headers),
+            background=BackgroundTask(upstream.release),
+        )
+
+    async def _record_upstream(instance: BotInstance, call: Awaitable[T]) -> T:
+        """
+        执行一次主程序调用，并把结果计入实例状态和熔断器
+
+        只在真正发出上游请求的地方调用，合并请求的等待者和缓存命中不会重复计数
+        """
+        start = time.perf_counter()
+        try:
+            result = await call
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            instance.record_failure(e)
+            raise
+        instance.record_success(time.perf_counter() - start)
+        return result
+
+    async def _fetch_buffered(
+        instance: BotInstance,
+        request: Request,
+        target_url: str,
+        query_params: dict[str, str],
+        headers: dict[str, str],
+    ) -> tuple[int, dict[str, str], bytes]:
+        """完整读取请求体和响应体后转发，返回 (状态码, 响应头, 响应体)"""
+        body = await request.body()
+
+        async def call() -> tuple[int, dict[str, str], bytes]:
+            async with instance.session.request(
+                method=request.method,
+                url=target_url,
+                params=query_params,
+                headers=headers,
+                data=body,
+                allow_redirects=True
+            ) as response:
+                response_content = await response.read()
+                response_headers = _filter_proxy_headers(response.headers, "content-length")
+                return response.status, response_headers, response_content
+
+        return await _record_upstream(instance, call())
+
+    async def _fetch_shareable(
+        instance: BotInstance,
+        request: Request,
+        target_url: str,
+        query_params: dict[str, str],
+        headers: dict[str, str],
+    ) -> Union[tuple[int, dict[str, str], bytes], StreamingResponse]:
+        """
+        读取可以分发给多个等待者或写入缓存的 GET 响应
+
+        只缓冲不超过 max_shared_body 的 JSON 响应，返回 (状态码, 响应头, 响应体)；
+        其他响应（日志导出、文件下载等）不读入内存，返回流式响应，只能交给发起调用的请求使用
+        """
+        upstream = await _record_upstream(
+            instance,
+            instance.session.request(
+                method=request.method,
+                url=target_url,
+                params=query_params,
+                headers=headers,
+                allow_redirects=True,
+                timeout=instance.transport_config.stream_timeout,
+            ),
+        )
+        content_type = upstream.headers.get("content-type", "").lower()
+        length = upstream.content_length
+        if "json" not in content_type or (length is not None and length > max_shared_body):
+            return _streaming_response(upstream, request, target_url)
+
+        chunks: list[bytes] = []
+        size = 0
+        try:
+            async for chunk in upstream.content.iter_chunked(PROXY_CHUNK_SIZE):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > max_shared_body:
+                    # 未声明长度的大响应，已读出的部分作为开头继续流式转发
+                    return _streaming_response(upstream, request, target_url, prefix=b"".join(chunks))
+        except BaseException:
+            upstream.release()
+            raise
+        upstream.release()
+        return upstream.status, _filter_proxy_headers(upstream.headers, "content-length"), b"".join(chunks)
+
+    async def _forward_request(
+        instance: BotInstance,
+        request: Request,
+        target_url: str,
+        query_params: dict[str, str],
+        headers: dict[str, str],
+    ) -> Response:
+        """按配置选择流式或缓冲方式转发请求"""
+        if stream_proxy:
+            return await _stream_proxy_request(instance, request, target_url, query_params, headers)
+        
+        status, response_headers, content = await _fetch_buffered(
+            instance, request, target_url, query_params, headers
+        )
+        return Response(
+            content=content,
+            status_code=status,
+            headers=response_headers,
+            media_type=response_headers.get("content-type")
+        )
+
+    async def _buffered_get_request(
+        instance: BotInstance,
+        request: Request,
+        path: str,
+        target_url: str,
+        query_params: dict[str, str],
+        headers: dict[str, str],
+        ttl: Optional[float],
+        coalesce: bool,
+    ) -> Response:
+        """
+        带缓存和请求合并的 GET 转发
+
+        先查 TTL 缓存；未命中时，相同的并发请求只有一个发往主程序，
+        其余等待同一结果。只有不超过 max_shared_body 的 JSON 响应会被缓冲和分享，
+        其他响应流式返回给发起调用的请求，等待者各自单独转发。
+        """
+        key = ProxyResponseCache.make_key(
+            path,
+            request.url.query,
+            request.headers.get("x-api-key"),
+            request.headers.get("accept-encoding", ""),
+            instance.id,
+        )
+        extra_headers: dict[str, str] = {}
+
+        if ttl is not None:
+            cached = response_cache.get(key)
+            if cached is not None:
+                return Response(
+                    content=cached.body,
+                    status_code=cached.status,
+                    headers={**cached.headers, "x-proxy-cache": "HIT"},
+                )
+            extra_headers["x-proxy-cache"] = "MISS"
+
+        async def fetch() -> Union[tuple[int, dict[str, str], bytes], StreamingResponse]:
+            generation = response_cache.generation(path) if ttl is not None else 0
+            result = await _fetch_shareable(instance, request, target_url, query_params, headers)
+            if ttl is not None and isinstance(result, tuple):
+                response_cache.put(key, *result, ttl, generation)
+            return result
+
+        if coalesce:
+            result, shared = await single_flight.do(key, fetch)
+        else:
+            result, shared = await fetch(), False
+
+        if isinstance(result, StreamingResponse):
+            if shared:
+                # 上游响应只能由发起调用的请求读取，等待者单独转发
+                return await _forward_request(instance, request, target_url, query_params, headers)
+            return result
+
+        status, response_headers, content = result
+        if shared:
+            extra_headers["x-proxy-coalesced"] = "1"
+
+        return Response(
+            content=content,
+            status_code=status,
+            headers={**response_headers, **extra_headers},
+        )
+
+    def _circuit_open_response(instance: BotInstance, retry_after: float) -> JSONResponse:
+        """熔断期间的结构化 503 响应"""
+        retry_seconds = max(1, math.ceil(retry_after))
+        return JSONResponse(
+            {
+                "error": "主程序暂时不可用，请稍后重试",
+                "code": "main_server_unavailable",
+                "instance": instance.id,
+                "last_error": instance.last_error,
+                "retry_after": retry_seconds,
+            },
+            status_code=503,
+            headers={"Retry-After": str(retry_seconds)},
+        )
+
+    async def _dispatch_proxy_request(
+        instance: BotInstance,
+        request: Request,
+        path: str,
+        target_url: str,
+        query_params: dict[str, str],
+        headers: dict[str, str],
+    ) -> Response:
+        """按方法和路由选择缓存、合并或直接转发"""
+        if request.method == "GET":
+            ttl = response_cache.ttl_for(path) if response_cache is not None else None
+            coalesce = single_flight is not None and single_flight.matches(path)
+            if ttl is not None or coalesce:
+                return await _buffered_get_request(
+                    instance, request, path, target_url, query_params, headers, ttl, coalesce
+                )
+        
+        if response_cache is not None and request.method in MUTATING_METHODS:
+            # 写请求先使缓存失效，响应返回后再失效一次，
+            # 覆盖请求处理期间被其他 GET 回填的条目
+            response_cache.invalidate(path)
+            try:
+                return await _forward_request(instance, request, target_url, query_params, headers)
+            finally:
+                response_cache.invalidate(path)
+        
+        return await _forward_request(instance, request, target_url, query_params, headers)
+
     # 🌟 核心功能：代理所有对主程序的 API 请求
     # 注意：这个路由必须在静态文件挂载之前定义
     @app.api_route(
@@ -118,43 +675,54 @@ def create_discovery_app(main_host: str, main_port: int) -> FastAPI:
     async def proxy_to_main_server(request: Request, path: str):
         """
         将所有 /plugins/* 请求转发到主程序
-        前端直接请求 http://hostname:12138/plugins/webui_backend/xxx
+        前端直接请求 http://hostname:12138/plugins/webui_backend/xxx，
+        通过 X-Bot-Instance 头部或 bot_instance 查询参数选择主程序实例，未指定时按 instance_routing 策略选择
         """
-        # 构建目标 URL
-        target_url = f"http://{main_host}:{main_port}/plugins/{path}"
-        
-        # 获取查询参数
+        # 获取查询参数，实例选择参数不转发
         query_params = dict(request.query_params)
+        instance_param = query_params.pop(INSTANCE_QUERY_PARAM, None)
+        instance_id = request.headers.get(INSTANCE_HEADER) or instance_param
+        instance = registry.resolve(instance_id)
+        if instance is None:
+            return JSONResponse({"error": f"未知的主程序实例: {instance_id}"}, status_code=404)
         
-        # 获取请求头（排除 host）
-        headers = dict(request.headers)
-        headers.pop("host", None)
+        # 构建目标 URL
+        target_url = f"{instance.base_url}/plugins/{path}"
         
-        # 获取请求体
-        body = await request.body()
+        # 获取请求头（排除 host、实例选择头部和逐跳头部）
+        headers = _filter_proxy_headers(request.headers, "host", INSTANCE_HEADER)
+        # 客户端未声明时不让 aiohttp 自动添加 gzip，避免把压缩内容原样转给不支持的客户端
+        if "accept-encoding" not in request.headers:
+            headers["accept-encoding"] = "identity"
         
+        # 熔断期间直接返回 503，不占用连接等待超时
+        breaker = instance.breaker
+        probe = False
+        if breaker is not None:
+            retry_after, probe = breaker.allow_request()
+            if retry_after > 0:
+                return _circuit_open_response(instance, retry_after)
+        
+        instance.in_flight += 1
+        instance.requests += 1
+        streaming = False
         try:
-            # 转发请求到主程序
-            async with http_client.request(
-                method=request.method,
-                url=target_url,
-                params=query_params,
-                headers=headers,
-                data=body,
-                allow_redirects=True
-            ) as response:
-                # 读取响应内容
-                response_content = await response.read()
-                response_headers = dict(response.headers)
-                
-                # 返回响应
-                return Response(
-                    content=response_content,
-                    status_code=response.status,
-                    headers=response_headers,
-                    media_type=response_headers.get("content-type")
-                )
+            # 实例状态和熔断器由实际发出上游请求的调用（_record_upstream）更新，
+            # 合并请求的等待者收到同一个异常时不会重复计数
+            response = await _dispatch_proxy_request(instance, request, path, target_url, query_params, headers)
+            if isinstance(response, StreamingResponse):
+                # 流式响应在处理函数返回后才开始发送响应体，进行中计数保持到发送结束（或客户端断开）
+                _release_in_flight_after(response, instance)
+                streaming = True
+            return response
             
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            logger.error(f"代理请求失败 [{request.method} {target_url}]: {e}")
+            return Response(
+                content=f'{{"error": "无法连接到主程序服务器: {str(e)}"}}',
+                status_code=502,
+                media_type="application/json"
+            )
         except aiohttp.ClientError as e:
             logger.error(f"代理请求失败 [{request.method} {target_url}]: {e}")
             return Response(
@@ -169,64 +737,184 @@ def create_discovery_app(main_host: str, main_port: int) -> FastAPI:
                 status_code=500,
                 media_type="application/json"
             )
+        finally:
+            if not streaming:
+                instance.in_flight -= 1
+            if probe:
+                # 探测请求既未成功也未连接失败时（如客户端断开），让下一个请求继续探测；
+                # 只有占用探测名额的请求才能释放，其他请求结束时不影响半开状态
+                breaker.release_probe()
     
+    def _release_in_flight_after(response: StreamingResponse, instance: BotInstance) -> None:
+        """在流式响应的后台任务中减少实例的进行中请求数，之后再执行原有的后台任务（释放上游连接）"""
+
+        def release() -> None:
+            instance.in_flight -= 1
+
+        background = BackgroundTasks()
+        background.add_task(release)
+        if response.background is not None:
+            background.add_task(response.background)
+        response.background = background
+
+    async def _run_until_first_done(*coros) -> None:
+        """并发运行多个协程，任意一个结束后取消其余的"""
+        tasks = [asyncio.ensure_future(c) for c in coros]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _on_ws_connected(client: ClientChannel) -> None:
+        """主程序连接建立后登记连接指标"""
+        client.connected = True
+        if metrics is not None:
+            metrics.ws_connections.inc(client.path)
+            metrics.ws_active.inc(client.path)
+
+    async def _dedicated_websocket(
+        websocket: WebSocket,
+        client: ClientChannel,
+        target_url: str,
+        instance: BotInstance,
+    ) -> None:
+        """独占一条主程序连接的双向代理"""
+        async with instance.ws_connect(target_url) as backend_ws:
+            _on_ws_connected(client)
+
+            async def forward_to_backend():
+                """转发前端消息到后端，等待后端接收完成后再读取下一帧"""
+                try:
+                    while True:
+                        message = await websocket.receive()
+                        if message["type"] == "websocket.disconnect":
+                            break
+                        client.received += 1
+                        if message.get("bytes") is not None:
+                            await backend_ws.send(message["bytes"])
+                        elif message.get("text") is not None:
+                            await backend_ws.send(message["text"])
+                except (WebSocketDisconnect, ConnectionClosed):
+                    pass
+                except Exception as e:
+                    logger.debug(f"WebSocket 前端->后端转发错误: {e}")
+
+            async def forward_to_frontend():
+                """转发后端消息到前端发送队列，文本帧和二进制帧保持原样"""
+                try:
+                    async for message in backend_ws:
+                        client.offer(message)
+                except ConnectionClosed:
+                    pass
+                except Exception as e:
+                    logger.debug(f"WebSocket 后端->前端转发错误: {e}")
+                finally:
+                    client.close()
+                    # 等待队列中剩余的帧发送完毕
+                    await sender
+
+            sender = asyncio.ensure_future(client.run_sender())
+            try:
+                await _run_until_first_done(forward_to_backend(), forward_to_frontend())
+            finally:
+                sender.cancel()
+
+    async def _multiplexed_websocket(
+        websocket: WebSocket,
+        client: ClientChannel,
+        target_url: str,
+        key: str,
+        instance: BotInstance,
+    ) -> None:
+        """共享主程序连接的代理，客户端只接收广播，心跳在本地应答"""
+        upstream = await ws_multiplexer.attach(key, target_url, client, connect=instance.ws_connect)
+        _on_ws_connected(client)
+        try:
+            async def receive_from_client():
+                try:
+                    while True:
+                        message = await websocket.receive()
+                        if message["type"] == "websocket.disconnect":
+                            break
+                        client.received += 1
+                        if message.get("text") == "ping":
+                            client.offer("pong")
+                        else:
+                            # 共享连接上转发客户端命令会影响其他客户端，直接忽略
+                            logger.debug(f"共享 WebSocket 连接忽略客户端消息: {key}")
+                except (WebSocketDisconnect, ConnectionClosed):
+                    pass
+
+            await _run_until_first_done(receive_from_client(), client.run_sender())
+        finally:
+            await ws_multiplexer.detach(upstream, client)
+
     # 🌟 WebSocket 代理：将 WebSocket 连接转发到主程序
     @app.websocket("/ws/plugins/{path:path}")
     async def websocket_proxy(websocket: WebSocket, path: str):
         """
         将 WebSocket 连接代理到主程序
-        前端连接 ws://hostname:12138/ws/plugins/webui_backend/log_viewer/realtime
+        前端连接 ws://hostname:12138/ws/plugins/webui_backend/log_viewer/realtime，
+        通过 bot_instance 查询参数选择主程序实例
+
+        每个连接都有有界的发送队列；广播类路由的多个连接共享同一条主程序连接
         """
         await websocket.accept()
         
-        # 构建目标 WebSocket URL
-        target_url = f"ws://{main_host}:{main_port}/plugins/{path}"
+        # 获取查询参数，实例选择参数不转发
+        query_items = [
+            (name, value) for name, value in websocket.query_params.multi_items()
+            if name != INSTANCE_QUERY_PARAM
+        ]
+        instance_id = websocket.query_params.get(INSTANCE_QUERY_PARAM)
+        instance = registry.resolve(instance_id)
+        if instance is None:
+            await websocket.close(code=1008, reason=f"未知的主程序实例: {instance_id}")
+            return
+        if instance.breaker is not None and instance.breaker.open_remaining() > 0:
+            # 1013: Try Again Later
+            await websocket.close(code=1013, reason="主程序暂时不可用")
+            return
+        query_string = urlencode(query_items)
         
-        # 获取查询参数
-        query_string = websocket.scope.get("query_string", b"").decode()
+        # 构建目标 WebSocket URL
+        target_url = f"{instance.ws_base_url}/plugins/{path}"
         if query_string:
             target_url += f"?{query_string}"
         
-        logger.debug(f"代理 WebSocket 连接: {target_url}")
+        multiplexed = ws_multiplexer.matches(path)
+        client = ws_multiplexer.create_client(
+            websocket, f"/plugins/{path}", "shared" if multiplexed else "dedicated"
+        )
+        logger.debug(f"代理 WebSocket 连接 #{client.id} ({client.mode}): {target_url}")
         
         try:
-            # 连接到主程序的 WebSocket
-            async with websockets.connect(target_url) as backend_ws:
-                # 创建两个任务：前端->后端 和 后端->前端
-                async def forward_to_backend():
-                    """转发前端消息到后端"""
-                    try:
-                        while True:
-                            data = await websocket.receive_text()
-                            await backend_ws.send(data)
-                    except (WebSocketDisconnect, ConnectionClosed):
-                        pass
-                    except Exception as e:
-                        logger.debug(f"WebSocket 前端->后端转发错误: {e}")
-                
-                async def forward_to_frontend():
-                    """转发后端消息到前端"""
-                    try:
-                        async for message in backend_ws:
-                            await websocket.send_text(message)
-                    except (WebSocketDisconnect, ConnectionClosed):
-                        pass
-                    except Exception as e:
-                        logger.debug(f"WebSocket 后端->前端转发错误: {e}")
-                
-                # 并发运行两个转发任务
-                await asyncio.gather(
-                    forward_to_backend(),
-                    forward_to_frontend(),
-                    return_exceptions=True
+            if multiplexed:
+                await _multiplexed_websocket(
+                    websocket, client, target_url, f"{instance.id}:{path}?{query_string}", instance
                 )
-                
+            else:
+                await _dedicated_websocket(websocket, client, target_url, instance)
         except Exception as e:
+            if not client.connected and isinstance(e, (OSError, asyncio.TimeoutError)):
+                # 连接主程序失败，计入实例状态和熔断器
+                instance.record_failure(e)
             logger.error(f"WebSocket 代理连接失败 [{target_url}]: {e}")
             try:
                 await websocket.close(code=1011, reason=f"后端连接失败: {str(e)}")
             except Exception:
                 pass
+        finally:
+            if client.connected and metrics is not None:
+                metrics.ws_active.dec(client.path)
+            ws_multiplexer.release_client(client)
+    
+    @app.get("/api/ws-stats", summary="WebSocket 代理连接统计")
+    def get_ws_stats():
+        """返回共享上游连接和每个浏览器连接的队列深度、发送及丢弃计数"""
+        return ws_multiplexer.get_stats()
     
     # 最后挂载静态文件，避免拦截API路由
     # 检查是否存在编译好的前端静态文件
@@ -239,7 +927,31 @@ def create_discovery_app(main_host: str, main_port: int) -> FastAPI:
         index_file = static_dir / "index.html"
         if index_file.exists():
             logger.debug(f"发现编译好的前端文件，将托管静态文件: {static_dir}")
-            app.mount("/", SPAStaticFiles(directory=str(static_dir), html=True), name="static")
+
+            static_app = SPAStaticFiles(directory=str(static_dir), html=True)
+            bundle = get_static_bundle(static_dir) if memory_static else None
+
+            async def prepare_static_assets():
+                """在后台线程中生成压缩副本，并载入内存资源包或预先计算 SPAStaticFiles 使用的 ETag"""
+                try:
+                    if precompress_static:
+                        await asyncio.to_thread(precompress_static_dir, static_dir)
+                    if bundle is not None:
+                        await bundle.reload()
+                    else:
+                        await asyncio.to_thread(warm_etag_cache, static_dir)
+                except Exception as e:
+                    logger.warning(f"准备静态资源失败: {e}")
+
+            @app.on_event("startup")
+            async def schedule_static_preparation():
+                """不阻塞启动，完成前的请求由 SPAStaticFiles 从磁盘响应"""
+                app.state.static_prepare_task = asyncio.create_task(prepare_static_assets())
+
+            if bundle is not None:
+                static_app = StaticBundleApp(bundle, fallback=static_app)
+
+            app.mount("/", static_app, name="static")
         else:
             logger.error("静态目录存在但未找到index.html，不托管静态文件")
     else:
@@ -248,22 +960,24 @@ def create_discovery_app(main_host: str, main_port: int) -> FastAPI:
     return app
 
 
-async def start_discovery_server(
+async def serve_discovery_app(
     main_host: str,
     main_port: int,
-    discovery_host: str = "0.0.0.0"
+    discovery_host: str = "0.0.0.0",
+    discovery_config: Optional[dict[str, Any]] = None,
 ) -> None:
     """
-    启动发现服务器
+    在当前事件循环中运行发现服务器，直到服务器退出
     
     Args:
         main_host: 主程序的主机地址
         main_port: 主程序的端口
-        discovery_host: 发现服务器绑定的主机地址，默认0.0.0.0（允许外部访问）
+        discovery_host: 发现服务器绑定的主机地址
+        discovery_config: 插件配置中的 discovery 段
     """
-    global _server_instance, _server_task
+    global _server_instance
     
-    app = create_discovery_app(main_host, main_port)
+    app = create_discovery_app(main_host, main_port, discovery_config)
     
     config = uvicorn.Config(
         app=app,
@@ -283,9 +997,86 @@ async def start_discovery_server(
         logger.error(f"发现服务器运行出错: {e}")
 
 
+async def start_discovery_server(
+    main_host: str,
+    main_port: int,
+    discovery_host: str = "0.0.0.0",
+    discovery_config: Optional[dict[str, Any]] = None,
+) -> None:
+    """
+    启动发现服务器
+    
+    配置 discovery.isolated_process 为 true 时，发现服务器在受守护的子进程中运行，
+    否则直接运行在机器人的事件循环上
+    
+    Args:
+        main_host: 主程序的主机地址
+        main_port: 主程序的端口
+        discovery_host: 发现服务器绑定的主机地址，默认0.0.0.0（允许外部访问）
+        discovery_config: 插件配置中的 discovery 段
+    """
+    global _supervisor
+    
+    discovery_config = discovery_config or {}
+    
+    if not discovery_config.get("isolated_process", False):
+        await serve_discovery_app(main_host, main_port, discovery_host, discovery_config)
+        return
+    
+    # 按文件路径启动工作进程入口，不导入插件包本身（插件包的 __init__ 依赖插件系统）；
+    # 子进程的工作目录与机器人相同，src.common.logger 等模块仍可导入
+    _supervisor = WorkerSupervisor(
+        script=str(Path(__file__).resolve().with_name("discovery_worker.py")),
+        payload={
+            "main_host": main_host,
+            "main_port": main_port,
+            "discovery_host": discovery_host,
+            "discovery_config": discovery_config,
+        },
+    )
+    
+    logger.info("发现服务器将在独立工作进程中运行")
+    await _supervisor.run()
+
+
+def set_worker_info(info: Optional[dict[str, Any]]) -> None:
+    """由工作进程入口调用，记录本进程的守护信息，在 /api/health 中报告"""
+    global _worker_info
+    _worker_info = info
+
+
+def get_discovery_worker_status() -> Optional[dict[str, Any]]:
+    """
+    获取守护进程看到的工作进程状态，未启用独立进程时返回 None
+
+    在机器人进程中调用，由认证路由的 /health 报告；工作进程自己的 /api/health 在它崩溃或重启期间无法访问
+    """
+    if _supervisor is None:
+        return None
+    return _supervisor.get_status()
+
+
+async def reload_discovery_static() -> None:
+    """
+    UI 文件更新后刷新发现服务器
+    
+    独立进程模式下重启工作进程（同时加载更新后的后端代码），
+    否则重新载入当前进程中的内存静态资源包
+    """
+    if _supervisor is not None:
+        await _supervisor.restart()
+    else:
+        await reload_static_bundle()
+
+
 async def stop_discovery_server() -> None:
     """停止发现服务器"""
-    global _server_instance, _server_task
+    global _server_instance, _server_task, _supervisor
+    
+    if _supervisor is not None:
+        logger.info("正在停止发现服务器工作进程...")
+        await _supervisor.stop()
+        _supervisor = None
     
     if _server_instance:
         logger.info("正在停止发现服务器...")
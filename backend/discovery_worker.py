@@ -0,0 +1,96 @@
+"""
+发现服务器工作进程入口
+由 WorkerSupervisor 通过 `python <本文件路径> <json>` 按文件路径启动，
+不经过插件包的 __init__，工作进程中不会导入插件系统和机器人的其他模块；
+在独立进程和事件循环中运行发现服务器，父进程退出后自动结束
+"""
+
+import asyncio
+import importlib
+import json
+import os
+import sys
+import time
+import types
+from typing import Any
+
+# 按文件路径运行时 sys.path[0] 为插件目录，移除以免 utils、handlers 等目录遮蔽同名的顶层模块
+PLUGIN_DIR = os.path.dirname(os.path.abspath(__file__))
+if sys.path and os.path.abspath(sys.path[0] or os.curdir) == PLUGIN_DIR:
+    del sys.path[0]
+
+import psutil  # noqa: E402
+
+from src.common.logger import get_logger  # noqa: E402
+
+logger = get_logger("WebUIAuth.DiscoveryWorker")
+
+# 检查父进程是否存活的间隔（秒）
+PARENT_CHECK_INTERVAL = 2.0
+
+# 工作进程中插件包使用的模块名，只用于解析发现服务器内部的相对导入
+WORKER_PACKAGE = "_webui_discovery_worker"
+
+
+def _load_discovery_server() -> types.ModuleType:
+    """
+    导入发现服务器模块
+
+    把插件目录和 utils 目录登记为空包，跳过它们的 __init__（插件元数据、消息广播器等），
+    只导入 discovery_server 及其依赖的 utils.discovery 工具模块
+    """
+    for name, path in (
+        (WORKER_PACKAGE, PLUGIN_DIR),
+        (f"{WORKER_PACKAGE}.utils", os.path.join(PLUGIN_DIR, "utils")),
+    ):
+        package = types.ModuleType(name)
+        package.__path__ = [path]
+        package.__package__ = name
+        sys.modules[name] = package
+    return importlib.import_module(f"{WORKER_PACKAGE}.discovery_server")
+
+
+async def _watch_parent(discovery_server: types.ModuleType, parent_pid: int) -> None:
+    """父进程退出后通知服务器停止，避免遗留孤儿进程占用端口"""
+    while True:
+        await asyncio.sleep(PARENT_CHECK_INTERVAL)
+        if not psutil.pid_exists(parent_pid):
+            logger.warning(f"父进程 {parent_pid} 已退出，发现服务器工作进程即将停止")
+            server = discovery_server._server_instance
+            if server is not None:
+                server.should_exit = True
+            return
+
+
+async def _run(discovery_server: types.ModuleType, payload: dict[str, Any]) -> None:
+    parent_pid = int(payload["parent_pid"])
+    watcher = asyncio.create_task(_watch_parent(discovery_server, parent_pid))
+    try:
+        await discovery_server.serve_discovery_app(
+            main_host=payload["main_host"],
+            main_port=int(payload["main_port"]),
+            discovery_host=payload.get("discovery_host", "0.0.0.0"),
+            discovery_config=payload.get("discovery_config") or {},
+        )
+    finally:
+        watcher.cancel()
+
+
+def main() -> None:
+    payload = json.loads(sys.argv[1])
+    discovery_server = _load_discovery_server()
+    discovery_server.set_worker_info(
+        {
+            "isolated": True,
+            "pid": os.getpid(),
+            "parent_pid": payload.get("parent_pid"),
+            "restarts": payload.get("restarts", 0),
+            "last_exit_code": payload.get("last_exit_code"),
+            "started_at": time.time(),
+        }
+    )
+    asyncio.run(_run(discovery_server, payload))
+
+
+if __name__ == "__main__":
+    main()
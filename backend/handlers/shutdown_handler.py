@@ -8,6 +8,7 @@ from src.plugin_system import BaseEventHandler, EventType
 from src.plugin_system.base.base_event import HandlerResult
 
 from ..discovery_server import stop_discovery_server
+from ..utils.message_broadcaster import close_broadcast_transport
 
 logger = get_logger("WebUIAuth.ShutdownHandler")
 
@@ -37,6 +38,7 @@ class WebUIShutdownHandler(BaseEventHandler):
         try:
             logger.info("正在停止WebUI发现服务器...")
             await stop_discovery_server()
+            await close_broadcast_transport()
             
             return HandlerResult(
                 success=True,
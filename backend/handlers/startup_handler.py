@@ -92,6 +92,16 @@ class WebUIStartupHandler(BaseEventHandler):
             main_host = server.host
             main_port = server.port
 
+            discovery_config = self.get_config("discovery", {})
+            if not discovery_config.get("serve", True):
+                logger.info("discovery.serve 为 false，本实例不启动发现服务器，由其他实例的发现服务器代理")
+                return HandlerResult(
+                    success=True,
+                    continue_process=True,
+                    message="本实例未启动发现服务器",
+                    handler_name=self.handler_name,
+                )
+
             logger.info("准备启动发现服务器...")
             logger.info(f"主程序配置: {main_host}:{main_port}")
             logger.info(f"发现服务器端口: {DISCOVERY_PORT}") 
@@ -99,7 +109,10 @@ class WebUIStartupHandler(BaseEventHandler):
             # 创建后台任务启动发现服务器
             task = asyncio.create_task(
                 start_discovery_server(
-                    main_host=main_host, main_port=main_port, discovery_host="0.0.0.0"
+                    main_host=main_host,
+                    main_port=main_port,
+                    discovery_host="0.0.0.0",
+                    discovery_config=discovery_config,
                 )
             )
 
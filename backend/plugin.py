@@ -30,6 +30,7 @@ from .routers import (
     LogViewerRouterComponent,
     InitializationRouter,
     MarketplaceRouterComponent,
+    MediaRouterComponent,
     PluginConfigRouterComponent,
     RelationshipRouterComponent,
     WebUIAuthRouter,
@@ -41,6 +42,7 @@ from .routers import (
     WebUIStatsRouter,
 )
 from .adapters import UIChatroomAdapter
+from .utils.message_broadcaster import configure_broadcast_transport, configure_message_broadcaster
 
 logger = get_logger("WebUIAuth.Plugin")
 
@@ -75,6 +77,139 @@ class WebUIAuthPlugin(BasePlugin):
         "discovery": {
             "port": ConfigField(type=int, default=12138, description="发现服务器端口（固定端口，供前端发现主程序）"),
             "host": ConfigField(type=str, default="0.0.0.0", description="发现服务器绑定地址"),
+            "stream_proxy": ConfigField(
+                type=bool, default=True, description="代理 /plugins/* 时逐块流式转发请求体和响应体，不在内存中完整缓存"
+            ),
+            "precompress_static": ConfigField(
+                type=bool, default=True, description="启动时为前端静态资源生成 .br/.gz 压缩副本并按 Accept-Encoding 发送"
+            ),
+            "memory_static_bundle": ConfigField(
+                type=bool, default=True, description="将前端静态资源整体载入内存响应，UI 更新或回滚后自动重新载入"
+            ),
+            "response_cache": ConfigField(
+                type=bool, default=False, description="缓存代理的 GET 响应，同一路由前缀的写请求会使缓存失效"
+            ),
+            "response_cache_ttls": ConfigField(
+                type=dict,
+                default={
+                    "webui_backend/stats/overview": 5.0,
+                    "webui_backend/model_stats/": 15.0,
+                    "webui_backend/plugin_manager/plugins": 5.0,
+                },
+                description="可缓存的路由前缀（相对于 /plugins/）及其 TTL（秒），按最长前缀匹配",
+            ),
+            "response_cache_max_entries": ConfigField(type=int, default=512, description="代理响应缓存的最大条目数"),
+            "coalesce_requests": ConfigField(
+                type=bool, default=True, description="将并发的相同 GET 请求合并为一次主程序请求，结果分发给所有等待者"
+            ),
+            "coalesce_routes": ConfigField(
+                type=list,
+                default=[
+                    "webui_backend/stats/",
+                    "webui_backend/model_stats/",
+                    "webui_backend/relationship/",
+                ],
+                description="参与请求合并的路由前缀（相对于 /plugins/），只应列出返回小型 JSON 的只读接口",
+            ),
+            "coalesce_max_body": ConfigField(
+                type=int,
+                default=1048576,
+                description="合并或缓存的响应体上限（字节），非 JSON 或超过该大小的响应改为流式转发，不分享给等待者",
+            ),
+            "ws_multiplex_routes": ConfigField(
+                type=list,
+                default=["webui_backend/log_viewer/realtime"],
+                description="多个浏览器连接共享同一条主程序连接的 WebSocket 路由前缀，仅适用于只广播、不接收客户端命令的路由",
+            ),
+            "ws_queue_size": ConfigField(type=int, default=256, description="每个 WebSocket 代理连接的发送队列上限（帧数）"),
+            "ws_overflow_policy": ConfigField(
+                type=str, default="drop_oldest", description="发送队列满时的策略：drop_oldest 丢弃最旧帧，disconnect 断开慢客户端"
+            ),
+            "ws_replay_size": ConfigField(type=int, default=100, description="共享连接为新加入的客户端重放的最近帧数"),
+            "isolated_process": ConfigField(
+                type=bool,
+                default=False,
+                description="在受守护的独立子进程中运行发现服务器，崩溃后自动重启，避免 WebUI 流量占用机器人事件循环",
+            ),
+            "main_server_uds": ConfigField(
+                type=str,
+                default="",
+                description="主程序监听的 Unix 域套接字路径，设置后代理通过 UDS 而不是 TCP 连接主程序（留空使用 TCP）",
+            ),
+            "upstream_pool_limit": ConfigField(type=int, default=100, description="代理到主程序的连接池总连接数上限，0 表示不限制"),
+            "upstream_pool_limit_per_host": ConfigField(
+                type=int, default=0, description="代理到主程序的每主机连接数上限，0 表示不限制"
+            ),
+            "upstream_keepalive_timeout": ConfigField(
+                type=float, default=30.0, description="代理到主程序的空闲连接保持时间（秒）"
+            ),
+            "upstream_timeout": ConfigField(type=float, default=30.0, description="缓冲代理请求的总超时（秒）；流式转发时为两次读取之间的最长间隔，不限制总时长"),
+            "upstream_connect_timeout": ConfigField(
+                type=float, default=5.0, description="连接主程序的超时（秒），主程序重启时请求尽快失败"
+            ),
+            "circuit_breaker": ConfigField(
+                type=bool, default=True, description="主程序连续连接失败后熔断，熔断期间代理请求立即返回 503"
+            ),
+            "circuit_failure_threshold": ConfigField(type=int, default=5, description="触发熔断的连续连接失败次数"),
+            "circuit_reset_timeout": ConfigField(
+                type=float, default=5.0, description="熔断后发送半开探测请求前的冷却时间（秒）"
+            ),
+            "circuit_max_reset_timeout": ConfigField(
+                type=float, default=60.0, description="探测连续失败时冷却时间倍增的上限（秒）"
+            ),
+            "metrics": ConfigField(
+                type=bool, default=True, description="统计代理请求和 WebSocket 指标，并在 /api/metrics 以 Prometheus 格式导出"
+            ),
+            "compress_responses": ConfigField(
+                type=bool, default=True, description="按 Accept-Encoding 对代理的 JSON 等文本响应做 br/gzip 流式压缩"
+            ),
+            "compress_min_size": ConfigField(type=int, default=1024, description="小于该大小（字节）的代理响应不压缩"),
+            "compress_types": ConfigField(
+                type=list,
+                default=["application/json", "application/javascript", "application/xml", "image/svg+xml", "text/"],
+                description="可压缩的内容类型前缀，text/event-stream 始终不压缩",
+            ),
+            "compress_gzip_level": ConfigField(type=int, default=6, description="gzip 压缩级别（1-9）"),
+            "compress_brotli_quality": ConfigField(
+                type=int, default=4, description="brotli 压缩质量（0-11），响应是实时压缩的，取值过高会占用较多 CPU"
+            ),
+            "serve": ConfigField(
+                type=bool,
+                default=True,
+                description="是否由本实例启动发现服务器；同一主机上的多个机器人共用一个发现服务器时，其余实例设为 false",
+            ),
+            "instance_id": ConfigField(type=str, default="main", description="本机主程序实例的 ID，也是默认实例"),
+            "instance_name": ConfigField(type=str, default="", description="本机主程序实例的显示名称"),
+            "instances": ConfigField(
+                type=list,
+                default=[],
+                description='额外的主程序实例，例如 {id = "bot-2", host = "127.0.0.1", port = 8001, uds = "", name = ""}，'
+                "前端通过 X-Bot-Instance 头部或 bot_instance 查询参数选择实例",
+            ),
+            "instance_check_interval": ConfigField(
+                type=float, default=10.0, description="主程序实例健康检查间隔（秒），0 表示只在转发请求时更新状态"
+            ),
+            "instance_routing": ConfigField(
+                type=str,
+                default="default",
+                description="未指定实例的请求如何选择实例：default 使用本机实例；"
+                "least_in_flight 在可用实例中选择进行中请求最少的，只适用于各实例提供相同数据的部署",
+            ),
+            "rate_limit": ConfigField(
+                type=bool,
+                default=False,
+                description="按 API Key（无 Key 时按客户端地址）和路由分组对代理请求限速和限制并发，超限返回 429",
+            ),
+            "rate_limits": ConfigField(
+                type=dict,
+                default={
+                    "default": {"rate": 50.0, "burst": 200, "max_concurrency": 32, "max_wait": 5.0},
+                    "webui_backend/log_viewer/search": {"rate": 5.0, "burst": 30, "max_concurrency": 4, "max_wait": 5.0},
+                    "webui_backend/log_viewer/stats": {"rate": 2.0, "burst": 10, "max_concurrency": 2, "max_wait": 5.0},
+                },
+                description="路由前缀（相对于 /plugins/）-> 限额；rate 为每秒令牌数，burst 为桶容量，"
+                "max_concurrency 为单个 API Key 的并发上限，max_wait 为并发已满时的最长排队秒数，default 为未匹配路由的限额",
+            ),
         },
         "auth": {
             "api_keys": ConfigField(
@@ -84,6 +219,35 @@ class WebUIAuthPlugin(BasePlugin):
                 type=int, default=1440, description="会话超时时间（分钟），默认24小时"
             ),
         },
+        "live_chat": {
+            "queue_size": ConfigField(
+                type=int, default=256, description="每个实时消息 WebSocket 连接的发送队列上限（条）"
+            ),
+            "overflow_policy": ConfigField(
+                type=str,
+                default="drop_oldest",
+                description="发送队列满时的策略：drop_oldest 丢弃最旧消息，coalesce 将积压消息合并为一条提示，disconnect 断开慢客户端",
+            ),
+            "stream_buffer_size": ConfigField(
+                type=int, default=100, description="每个聊天流各自缓存的最近消息数，供新连接重放"
+            ),
+            "buffer_budget": ConfigField(
+                type=int, default=5000, description="所有聊天流缓存的消息总数上限，超出时淘汰最久没有新消息的聊天流"
+            ),
+            "transport": ConfigField(
+                type=str,
+                default="local",
+                description="实时消息的跨进程传输：local 只推送给本进程的连接，unix 通过 Unix 域套接字把机器人进程的消息推送到同一个机器人的 WebUI 工作进程",
+            ),
+            "transport_role": ConfigField(
+                type=str,
+                default="hub",
+                description="unix 传输的角色：机器人进程为 hub（负责分配消息序号），只接收消息的 WebUI 工作进程为 client；不要把另一个机器人进程配置为 client",
+            ),
+            "transport_socket": ConfigField(
+                type=str, default="", description="unix 传输的套接字路径，留空使用系统临时目录下的默认路径"
+            ),
+        },
         "main_server": {
             "host": ConfigField(type=str, default="127.0.0.1", description="主程序HTTP服务器地址"),
             "port": ConfigField(type=int, default=8000, description="主程序HTTP服务器端口"),
@@ -103,6 +267,19 @@ class WebUIAuthPlugin(BasePlugin):
         logger.info(
             f"主程序配置: {self.get_config('main_server.host', '127.0.0.1')}:{self.get_config('main_server.port', 8000)}"
         )
+        configure_message_broadcaster(
+            max_queue=self.get_config("live_chat.queue_size", 256),
+            overflow_policy=self.get_config("live_chat.overflow_policy", "drop_oldest"),
+            stream_buffer_size=self.get_config("live_chat.stream_buffer_size", 100),
+            buffer_budget=self.get_config("live_chat.buffer_budget", 5000),
+        )
+        transport = self.get_config("live_chat.transport", "local")
+        if transport != "local":
+            await configure_broadcast_transport(
+                transport=transport,
+                role=self.get_config("live_chat.transport_role", "hub"),
+                socket_path=self.get_config("live_chat.transport_socket", ""),
+            )
 
     def get_plugin_components(self) -> List:
         """
@@ -134,6 +311,7 @@ class WebUIAuthPlugin(BasePlugin):
             (EmojiManagerRouterComponent.get_router_info(), EmojiManagerRouterComponent),
             (ChatroomRouterComponent.get_router_info(), ChatroomRouterComponent),
             (LiveChatRouterComponent.get_router_info(), LiveChatRouterComponent),
+            (MediaRouterComponent.get_router_info(), MediaRouterComponent),
              (InitializationRouter.get_router_info(),     InitializationRouter),
             (GitEnvRouterComponent.get_router_info(), GitEnvRouterComponent),
             (UIUpdateRouterComponent.get_router_info(), UIUpdateRouterComponent),
@@ -14,6 +14,7 @@ from .initialization_router import InitializationRouter
 from .live_chat_router import LiveChatRouterComponent
 from .log_viewer_router import LogViewerRouterComponent
 from .marketplace_router import MarketplaceRouterComponent
+from .media_router import MediaRouterComponent
 from .model_stats_router import WebUIModelStatsRouter
 from .plugin_router import WebUIPluginRouter
 from .relationship_router import RelationshipRouterComponent
@@ -33,6 +34,7 @@ __all__ = [
     "LiveChatRouterComponent",
     "LogViewerRouterComponent",
     "MarketplaceRouterComponent",
+    "MediaRouterComponent",
     "PluginConfigRouterComponent",
     "RelationshipRouterComponent",
     "WebUIAuthRouter",
@@ -11,6 +11,8 @@ from src.common.logger import get_logger
 from src.common.security import VerifiedDep
 from src.plugin_system import BaseRouterComponent
 
+from ..discovery_server import get_discovery_worker_status
+
 logger = get_logger("WebUIAuth.AuthRouter")
 
 
@@ -48,7 +50,7 @@ class WebUIAuthRouter(BaseRouterComponent):
     WebUI认证路由组件
     
     提供以下API端点：
-    - GET /health: 健康检查
+    - GET /health: 健康检查（含发现服务器工作进程的守护状态）
     - GET /login: 登录验证
     """
     
@@ -62,9 +64,14 @@ class WebUIAuthRouter(BaseRouterComponent):
         def health_check():
             """
             检查API服务是否正常运行
-            此端点不需要认证
+            此端点不需要认证；发现服务器运行在独立进程中时附带守护进程看到的工作进程状态
+            （是否存活、重启次数、上次退出码），工作进程崩溃或重启期间也能查到
             """
-            return {"status": "healthy", "service": "WebUI Auth API"}
+            health = {"status": "healthy", "service": "WebUI Auth API"}
+            worker_status = get_discovery_worker_status()
+            if worker_status is not None:
+                health["discovery_worker"] = worker_status
+            return health
         
         @self.router.get("/login", summary="登录验证", response_model=LoginResponse)
         def login(_=VerifiedDep):
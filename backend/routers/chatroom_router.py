@@ -10,7 +10,6 @@ UI Chatroom 路由组件
 import base64
 import hashlib
 import json
-import os
 import time
 import uuid
 import orjson
@@ -33,6 +32,7 @@ from ..utils.chatroom_storage import (
     get_chatroom_storage,
     get_chatroom_message_storage,
 )
+from ..utils.media_store import KIND_EMOJI, get_media_store, media_url
 
 logger = get_logger("ChatroomRouter")
 
@@ -173,7 +173,7 @@ class ChatroomRouterComponent(BaseRouterComponent):
                     elif user_id == "mofox_bot":
                         nickname = global_config.bot.nickname
                     
-                    # 处理表情包：从emoji_hashes获取base64图片
+                    # 处理表情包：从emoji_hashes获取表情包 URL
                     emoji_images = []
                     emoji_hashes_str = msg.get("emoji_hashes")
                     if emoji_hashes_str:
@@ -508,6 +508,9 @@ class ChatroomRouterComponent(BaseRouterComponent):
                     
                     # 将emoji哈希列表转换为JSON字符串保存
                     emoji_hashes_json = json.dumps(emoji_hashes) if emoji_hashes else None
+                    # 与历史消息一样返回媒体 URL，不再内嵌 base64
+                    if emojis_base64:
+                        response["emojis"] = [media_url(KIND_EMOJI, h) for h in emoji_hashes]
                     
                     # 保存消息到SQLite（包含emoji哈希）
                     self.message_storage.save_message(
@@ -707,39 +710,26 @@ class ChatroomRouterComponent(BaseRouterComponent):
 
     async def _get_emoji_images_by_hashes(self, emoji_hashes: list[str]) -> list[str]:
         """
-        根据表情包哈希值列表从数据库获取对应的base64图片
-        
+        根据表情包哈希值列表获取对应的媒体 URL
+
         Args:
             emoji_hashes: 表情包哈希值列表
-            
+
         Returns:
-            base64编码的图片列表
+            表情包 URL 列表（保持原顺序，数据库中不存在的表情包被跳过）
         """
+        if not emoji_hashes:
+            return []
+        try:
+            paths = await get_media_store().lookup_paths(KIND_EMOJI, set(emoji_hashes))
+        except Exception as e:
+            logger.error(f"获取表情包失败: {e}")
+            return []
+
         emoji_images = []
-        
         for emoji_hash in emoji_hashes:
-            try:
-                # 从数据库获取表情包对象
-                emoji_list = await self.emoji_manager.get_emoji_from_db(emoji_hash)
-                
-                if emoji_list and len(emoji_list) > 0:
-                    emoji_obj = emoji_list[0]
-                    # 读取文件并转换为base64
-                    if os.path.exists(emoji_obj.full_path):
-                        from src.chat.utils.utils_image import image_path_to_base64
-                        emoji_base64 = image_path_to_base64(emoji_obj.full_path)
-                        if emoji_base64:
-                            emoji_images.append(emoji_base64)
-                            logger.debug(f"获取表情包成功: {emoji_hash}")
-                        else:
-                            logger.warning(f"转换表情包为base64失败: {emoji_hash}")
-                    else:
-                        logger.warning(f"表情包文件不存在: {emoji_obj.full_path}")
-                else:
-                    logger.warning(f"数据库中未找到表情包: {emoji_hash}")
-                    
-            except Exception as e:
-                logger.error(f"获取表情包失败 {emoji_hash}: {e}")
-                continue
-        
+            if emoji_hash in paths:
+                emoji_images.append(media_url(KIND_EMOJI, emoji_hash))
+            else:
+                logger.warning(f"数据库中未找到表情包: {emoji_hash}")
         return emoji_images
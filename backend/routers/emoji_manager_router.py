@@ -5,7 +5,6 @@
 """
 
 import asyncio
-import base64
 import io
 import json
 import logging
@@ -22,7 +21,7 @@ from sqlalchemy import and_, delete, func, or_, select, update
 
 from src.chat.emoji_system.emoji_manager import get_emoji_manager
 from src.chat.emoji_system.emoji_constants import EMOJI_DIR
-from src.chat.utils.utils_image import get_image_manager, image_path_to_base64
+from src.chat.utils.utils_image import get_image_manager
 from src.common.database.api.crud import CRUDBase
 from src.common.database.compatibility import get_db_session
 from src.common.database.core.models import Emoji
@@ -31,6 +30,8 @@ from src.common.security import VerifiedDep
 from src.config.config import global_config
 from src.plugin_system import BaseRouterComponent
 
+from ..utils.media_store import KIND_EMOJI, KIND_EMOJI_THUMB, get_media_store, media_url
+
 logger = get_logger("WebUI.EmojiRouter")
 
 
@@ -128,49 +129,6 @@ class EmojiStatsResponse(BaseModel):
 # ============================================================================
 
 
-async def generate_thumbnail(image_path: str, max_size: tuple = (200, 200)) -> str:
-    """生成缩略图并返回Base64编码"""
-    try:
-        with Image.open(image_path) as img:
-            # 检查是否是GIF动图
-            is_gif = img.format == 'GIF' and getattr(img, 'is_animated', False)
-            
-            if is_gif:
-                # GIF动图：返回原始base64
-                buffer = io.BytesIO()
-                with open(image_path, 'rb') as f:
-                    buffer.write(f.read())
-                img_base64 = base64.b64encode(buffer.getvalue()).decode()
-                return f"data:image/gif;base64,{img_base64}"
-            
-            # 静态图片：生成缩略图
-            # 保持宽高比缩放
-            img.thumbnail(max_size, Image.Resampling.LANCZOS)
-
-            # 转换为RGB（处理RGBA、P等模式）
-            if img.mode not in ('RGB', 'L'):
-                if img.mode == 'RGBA':
-                    background = Image.new("RGB", img.size, (255, 255, 255))
-                    background.paste(img, mask=img.split()[3])
-                    img = background
-                elif img.mode == 'P':
-                    # P模式（调色板模式）转RGB
-                    img = img.convert('RGB')
-                else:
-                    # 其他模式统一转RGB
-                    img = img.convert('RGB')
-
-            # 转换为Base64
-            buffer = io.BytesIO()
-            img.save(buffer, format="JPEG", quality=85, optimize=True)
-            img_base64 = base64.b64encode(buffer.getvalue()).decode()
-
-            return f"data:image/jpeg;base64,{img_base64}"
-    except Exception as e:
-        logger.error(f"生成缩略图失败: {e}")
-        return ""
-
-
 async def get_emoji_by_hash(emoji_hash: str) -> Optional[Emoji]:
     """根据哈希值获取表情包"""
     async with get_db_session() as session:
@@ -250,9 +208,7 @@ class EmojiManagerRouterComponent(BaseRouterComponent):
                     # 生成响应数据
                     items = []
                     for emoji in emojis:
-                        # 生成缩略图
-                        thumbnail = await generate_thumbnail(emoji.full_path)
-
+                        # 缩略图由媒体接口按需生成，浏览器按哈希长期缓存
                         items.append(
                             EmojiItemResponse(
                                 id=emoji.id,
@@ -264,7 +220,7 @@ class EmojiManagerRouterComponent(BaseRouterComponent):
                                 usage_count=emoji.usage_count,
                                 query_count=emoji.query_count,
                                 record_time=emoji.record_time,
-                                thumbnail=thumbnail,
+                                thumbnail=media_url(KIND_EMOJI_THUMB, emoji.emoji_hash),
                             )
                         )
 
@@ -292,47 +248,6 @@ class EmojiManagerRouterComponent(BaseRouterComponent):
                 if not emoji:
                     raise HTTPException(status_code=404, detail="表情包不存在")
 
-                # 获取完整图片（支持GIF动图）
-                full_image = ""
-                try:
-                    # 获取图片格式
-                    img_format = "JPEG"
-                    try:
-                        with Image.open(emoji.full_path) as img:
-                            img_format = img.format
-                    except Exception:
-                        pass
-
-                    # 读取文件内容
-                    with open(emoji.full_path, 'rb') as f:
-                        file_content = f.read()
-                    
-                    img_base64 = base64.b64encode(file_content).decode()
-                    
-                    # 确定 MIME type
-                    mime_type = "image/jpeg" # 默认
-                    if img_format:
-                        fmt = img_format.upper()
-                        if fmt == 'GIF':
-                            mime_type = "image/gif"
-                        elif fmt == 'PNG':
-                            mime_type = "image/png"
-                        elif fmt in ['JPEG', 'JPG']:
-                            mime_type = "image/jpeg"
-                        elif fmt == 'WEBP':
-                            mime_type = "image/webp"
-                        elif fmt == 'BMP':
-                            mime_type = "image/bmp"
-                    
-                    full_image = f"data:{mime_type};base64,{img_base64}"
-
-                except Exception as e:
-                    logger.error(f"读取图片失败: {e}")
-                    try:
-                        full_image = image_path_to_base64(emoji.full_path)
-                    except Exception:
-                        full_image = ""
-
                 detail = EmojiDetailResponse(
                     id=emoji.id,
                     hash=emoji.emoji_hash,
@@ -346,7 +261,7 @@ class EmojiManagerRouterComponent(BaseRouterComponent):
                     last_used_time=emoji.last_used_time,
                     record_time=emoji.record_time,
                     register_time=emoji.register_time,
-                    full_image=full_image,
+                    full_image=media_url(KIND_EMOJI, emoji.emoji_hash),
                 )
 
                 return {"success": True, "data": detail.model_dump()}
@@ -449,6 +364,7 @@ class EmojiManagerRouterComponent(BaseRouterComponent):
                 success = await self.emoji_manager.delete_emoji(emoji_hash)
                 if not success:
                     raise HTTPException(status_code=404, detail="表情包不存在或删除失败")
+                get_media_store().forget(emoji_hash)
 
                 return {"success": True, "message": "表情包删除成功"}
 
@@ -517,6 +433,7 @@ class EmojiManagerRouterComponent(BaseRouterComponent):
                         if request.action == "delete":
                             success = await self.emoji_manager.delete_emoji(emoji_hash)
                             if success:
+                                get_media_store().forget(emoji_hash)
                                 results.append(BatchOperationResult(hash=emoji_hash, success=True))
                                 succeeded += 1
                             else:
@@ -4,6 +4,8 @@
 零侵入实现 - 使用 send_api 和 message_api 公开接口
 """
 
+import asyncio
+import json
 from typing import Any, Optional
 
 from fastapi import Query, WebSocket, WebSocketDisconnect
@@ -14,7 +16,18 @@ from src.common.security import VerifiedDep
 from src.plugin_system import BaseRouterComponent
 from src.plugin_system.apis import send_api, message_api
 
+from ..utils.frame_batcher import DEFAULT_BATCH_SIZE, MAX_BATCH_MS, MAX_BATCH_SIZE, FrameBatcher
+from ..utils.media_store import KIND_EMOJI, KIND_IMAGE, get_media_store, media_url
 from ..utils.message_broadcaster import get_message_broadcaster
+from ..utils.message_cursor import (
+    CURSOR_AFTER,
+    CURSOR_BEFORE,
+    PagePosition,
+    decode_cursor,
+    keyset_condition,
+    next_page_cursor,
+)
+from ..utils.message_filter import MessageFilter
 
 logger = get_logger("WebUI.LiveChatRouter")
 
@@ -22,54 +35,145 @@ logger = get_logger("WebUI.LiveChatRouter")
 # ==================== 辅助函数 ====================
 
 
-async def get_image_base64(image_hash: str) -> Optional[str]:
-    """获取图片的 base64 数据 URL"""
-    try:
-        from sqlalchemy import select
-        from src.common.database.core import get_db_session
-        from src.common.database.core.models import Images
-        from src.chat.utils.utils_image import image_path_to_base64
+async def resolve_media_urls(
+    image_hashes: set[str], emoji_hashes: set[str]
+) -> tuple[dict[str, str], dict[str, str]]:
+    """
+    批量获取图片和表情包的媒体 URL
 
-        async with get_db_session() as session:
-            stmt = select(Images).where(Images.emoji_hash == image_hash)
-            result = await session.execute(stmt)
-            image = result.scalar()
+    每张表只查询一次（已缓存的哈希不再查询），不读取文件内容；
+    浏览器按 URL 从媒体接口获取文件，并按 ETag 长期缓存
 
-            if image and image.path:
-                try:
-                    base64_data = image_path_to_base64(image.path)
-                    return f"data:image/png;base64,{base64_data}"
-                except Exception as e:
-                    logger.debug(f"读取图片文件失败: {e}")
-                    return None
+    Returns:
+        (图片哈希 -> URL, 表情包哈希 -> URL)，数据库中不存在的哈希不出现在结果中
+    """
+    if not image_hashes and not emoji_hashes:
+        return {}, {}
+    store = get_media_store()
+    try:
+        image_paths = await store.lookup_paths(KIND_IMAGE, image_hashes) if image_hashes else {}
+        emoji_paths = await store.lookup_paths(KIND_EMOJI, emoji_hashes) if emoji_hashes else {}
     except Exception as e:
-        logger.debug(f"获取图片失败: {e}")
-    return None
-
+        logger.debug(f"获取媒体文件路径失败: {e}")
+        return {}, {}
+
+    images = {h: media_url(KIND_IMAGE, h) for h in image_paths}
+    emojis = {h: media_url(KIND_EMOJI, h) for h in emoji_paths}
+    return images, emojis
+
+
+# 历史消息接口用到的消息字段（与 message_api 返回的字典键一致）
+MESSAGE_FIELDS = (
+    "message_id",
+    "time",
+    "user_id",
+    "user_nickname",
+    "processed_plain_text",
+    "display_message",
+    "is_emoji",
+    "is_picid",
+    "reply_to",
+)
+
+
+async def fetch_message_page(
+    stream_id: str,
+    limit: int,
+    before: Optional[PagePosition] = None,
+    after: Optional[PagePosition] = None,
+) -> tuple[list[dict[str, Any]], bool]:
+    """
+    按 (time, message_id) 键集分页查询聊天流的消息
 
-async def get_emoji_base64(emoji_hash: str) -> Optional[str]:
-    """获取表情包的 base64 数据 URL"""
-    try:
-        from sqlalchemy import select
-        from src.common.database.core import get_db_session
-        from src.common.database.core.models import Emoji
-        from src.chat.utils.utils_image import image_path_to_base64
+    查询从游标位置沿时间索引扫描 limit + 1 行，不使用 OFFSET，
+    每页的开销只与页大小有关，与向前翻了多远无关
 
-        async with get_db_session() as session:
-            stmt = select(Emoji).where(Emoji.emoji_hash == emoji_hash)
-            result = await session.execute(stmt)
-            emoji = result.scalar()
+    Args:
+        stream_id: 聊天流 ID
+        limit: 每页消息数
+        before: (时间戳, 消息 ID)，只返回早于该位置的消息（从新到旧翻页）
+        after: (时间戳, 消息 ID)，只返回晚于该位置的消息（从旧到新翻页）
 
-            if emoji and emoji.path:
-                try:
-                    base64_data = image_path_to_base64(emoji.path)
-                    return f"data:image/png;base64,{base64_data}"
-                except Exception as e:
-                    logger.debug(f"读取表情包文件失败: {e}")
-                    return None
-    except Exception as e:
-        logger.debug(f"获取表情包失败: {e}")
-    return None
+    Returns:
+        (按时间升序排列的消息字典列表, 翻页方向上是否还有更多消息)
+    """
+    from sqlalchemy import select
+    from src.common.database.core import get_db_session
+    from src.common.database.core.models import Messages
+
+    stmt = select(Messages).where(Messages.chat_id == stream_id)
+    if before is not None:
+        stmt = stmt.where(keyset_condition(Messages, CURSOR_BEFORE, *before))
+    if after is not None:
+        stmt = stmt.where(keyset_condition(Messages, CURSOR_AFTER, *after))
+
+    # 只有 after 时从旧到新翻页，其余情况取最靠近 before（或最新）的一页
+    ascending = after is not None and before is None
+    if ascending:
+        stmt = stmt.order_by(Messages.time.asc(), Messages.message_id.asc())
+    else:
+        stmt = stmt.order_by(Messages.time.desc(), Messages.message_id.desc())
+    stmt = stmt.limit(limit + 1)
+
+    async with get_db_session() as session:
+        result = await session.execute(stmt)
+        rows = [{field: getattr(msg, field, None) for field in MESSAGE_FIELDS} for msg in result.scalars().all()]
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not ascending:
+        rows.reverse()
+    return rows, has_more
+
+
+async def build_message_infos(stream_id: str, messages: list[dict[str, Any]]) -> list["MessageInfo"]:
+    """把消息字典转换为 MessageInfo，图片和表情包批量解析为媒体 URL"""
+    # 先收集本页所有图片/表情包哈希，统一批量解析为媒体 URL
+    image_hashes: set[str] = set()
+    emoji_hashes: set[str] = set()
+    for m in messages:
+        content = m.get("processed_plain_text") or m.get("display_message")
+        if not content:
+            continue
+        if m.get("is_picid", False):
+            image_hashes.add(content)
+        elif m.get("is_emoji", False):
+            emoji_hashes.add(content)
+    images, emojis = await resolve_media_urls(image_hashes, emoji_hashes)
+
+    message_list = []
+    for m in messages:
+        content = m.get("processed_plain_text") or m.get("display_message")
+        is_emoji = m.get("is_emoji", False)
+        is_picid = m.get("is_picid", False)
+
+        # 图片/表情包 URL
+        image_data = None
+        emoji_data = None
+
+        if is_picid and content:
+            image_data = images.get(content)
+        elif is_emoji and content:
+            emoji_data = emojis.get(content)
+
+        message_list.append(
+            MessageInfo(
+                message_id=m.get("message_id"),
+                stream_id=stream_id,
+                user_id=m.get("user_id"),
+                user_nickname=m.get("user_nickname"),
+                content=content,
+                timestamp=m.get("time"),
+                is_emoji=is_emoji,
+                is_picid=is_picid,
+                reply_to_id=m.get("reply_to"),
+                direction="incoming",
+                sender_type="user",
+                image_data=image_data,
+                emoji_data=emoji_data,
+            )
+        )
+    return message_list
 
 
 # ==================== 请求/响应模型 ====================
@@ -119,8 +223,8 @@ class MessageInfo(BaseModel):
     reply_to_id: Optional[str] = None
     direction: str = "incoming"
     sender_type: str = "user"
-    image_data: Optional[str] = None  # base64 图片数据 (data:image/...)
-    emoji_data: Optional[str] = None  # base64 表情包数据 (data:image/...)
+    image_data: Optional[str] = None  # 图片 URL (/plugins/webui_backend/media/image/{hash})
+    emoji_data: Optional[str] = None  # 表情包 URL (/plugins/webui_backend/media/emoji/{hash})
 
 
 class MessagesResponse(BaseModel):
@@ -129,6 +233,9 @@ class MessagesResponse(BaseModel):
     success: bool
     messages: list[MessageInfo]
     count: int
+    next_cursor: Optional[str] = None  # 继续向同一方向翻页的游标，为空表示没有更早的消息
+    has_more: bool = False  # 翻页方向上是否还有更多消息
+    error: Optional[str] = None
 
 
 class SendResponse(BaseModel):
@@ -233,57 +340,72 @@ class LiveChatRouterComponent(BaseRouterComponent):
         async def get_messages(
             stream_id: str,
             hours: float = Query(
-                24.0, ge=0.1, le=168, description="查询时间范围（小时）"
+                24.0, ge=0.1, le=168, description="查询时间范围（小时），使用游标分页时忽略"
             ),
             limit: int = Query(100, ge=1, le=500, description="返回数量限制"),
+            cursor: Optional[str] = Query(None, description="上一页响应中的 next_cursor"),
+            before_time: Optional[float] = Query(None, description="只返回早于该时间的消息"),
+            before_message_id: Optional[str] = Query(
+                None, description="与 before_time 配合，同一时间的消息只返回 message_id 更小的"
+            ),
+            after_time: Optional[float] = Query(None, description="只返回晚于该时间的消息"),
+            after_message_id: Optional[str] = Query(
+                None, description="与 after_time 配合，同一时间的消息只返回 message_id 更大的"
+            ),
             _=VerifiedDep,
         ):
-            """获取指定聊天流的历史消息"""
-            try:
-                # 使用 message_api 公开接口查询消息
-                messages = await message_api.get_recent_messages(
-                    chat_id=stream_id,
-                    hours=hours,
-                    limit=limit,
+            """
+            获取指定聊天流的历史消息
+
+            不带游标参数时返回最近 hours 小时内的消息，并附带向前翻页的 next_cursor；
+            带 cursor 或 before_* / after_* 时按 (time, message_id) 键集分页，
+            before 方向从新到旧翻页（next_cursor 为空表示已到最早的消息），
+            after 方向从旧到新追赶新消息（next_cursor 总是指向本页最后一条，可用于之后继续拉取）。
+            每页消息都按时间升序返回
+            """
+            if (before_message_id is not None and before_time is None) or (
+                after_message_id is not None and after_time is None
+            ):
+                return MessagesResponse(
+                    success=False, messages=[], count=0, error="message_id 游标参数需要同时提供对应的时间"
                 )
 
-                message_list = []
-                for m in messages:
-                    # message_api 返回的是字典列表
-                    content = m.get("processed_plain_text") or m.get("display_message")
-                    is_emoji = m.get("is_emoji", False)
-                    is_picid = m.get("is_picid", False)
-                    
-                    # 获取图片/表情包数据
-                    image_data = None
-                    emoji_data = None
-                    
-                    if is_picid and content:
-                        image_data = await get_image_base64(content)
-                    elif is_emoji and content:
-                        emoji_data = await get_emoji_base64(content)
-                    
-                    msg_info = MessageInfo(
-                        message_id=m.get("message_id"),
-                        stream_id=stream_id,
-                        user_id=m.get("user_id"),
-                        user_nickname=m.get("user_nickname"),
-                        content=content,
-                        timestamp=m.get("time"),
-                        is_emoji=is_emoji,
-                        is_picid=is_picid,
-                        reply_to_id=m.get("reply_to"),
-                        direction="incoming",
-                        sender_type="user",
-                        image_data=image_data,
-                        emoji_data=emoji_data,
+            before: Optional[PagePosition] = None
+            after: Optional[PagePosition] = None
+            if cursor:
+                try:
+                    direction, cursor_time, cursor_message_id = decode_cursor(cursor)
+                except ValueError as e:
+                    return MessagesResponse(success=False, messages=[], count=0, error=str(e))
+                if direction == CURSOR_BEFORE:
+                    before = (cursor_time, cursor_message_id)
+                else:
+                    after = (cursor_time, cursor_message_id)
+            if before_time is not None:
+                before = (before_time, before_message_id)
+            if after_time is not None:
+                after = (after_time, after_message_id)
+
+            try:
+                if before is None and after is None:
+                    # 使用 message_api 公开接口查询最近的消息
+                    messages = await message_api.get_recent_messages(
+                        chat_id=stream_id,
+                        hours=hours,
+                        limit=limit,
                     )
-                    message_list.append(msg_info)
+                    has_more = len(messages) >= limit
+                else:
+                    messages, has_more = await fetch_message_page(stream_id, limit, before=before, after=after)
+                next_cursor = next_page_cursor(messages, has_more, before=before, after=after)
 
+                message_list = await build_message_infos(stream_id, messages)
                 return MessagesResponse(
                     success=True,
                     messages=message_list,
                     count=len(message_list),
+                    next_cursor=next_cursor,
+                    has_more=has_more,
                 )
 
             except Exception as e:
@@ -399,6 +521,14 @@ class LiveChatRouterComponent(BaseRouterComponent):
             websocket: WebSocket,
             stream_id: Optional[str] = Query(None, description="订阅特定聊天流"),
             token: Optional[str] = Query(None, description="API Token"),
+            since_seq: Optional[int] = Query(
+                None, ge=0, description="断线重连时已收到的最大序号，只补发之后的消息（需同时指定 stream_id）"
+            ),
+            filter_spec: Optional[str] = Query(
+                None, alias="filter", description="JSON 格式的过滤条件，指定时代替 stream_id 订阅"
+            ),
+            batch_ms: int = Query(0, ge=0, le=MAX_BATCH_MS, description="批量推送的时间窗口（毫秒），0 表示逐条推送"),
+            max_batch: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=MAX_BATCH_SIZE, description="单个批次的消息数上限"),
         ):
             """
             WebSocket 实时消息推送
@@ -406,14 +536,29 @@ class LiveChatRouterComponent(BaseRouterComponent):
             连接参数:
             - stream_id: 可选，指定只接收某个聊天流的消息
             - token: API Token，用于验证
+            - since_seq: 可选，断线重连时传入已收到的最大 seq，只补发缺失的消息；
+              不指定时重放最近 50 条
+            - filter: 可选，JSON 格式的过滤条件（格式同 subscribe 命令），只接收满足条件的消息
+            - batch_ms / max_batch: 可选，开启批量模式，时间窗口内的推送合并为一个 JSON 数组帧，
+              数组元素与逐条模式下的推送相同；命令的回复（pong、subscribed 等）仍单独发送
 
             客户端消息:
             - "ping": 心跳检测，服务器返回 "pong"
-            - {"type": "subscribe", "stream_id": "xxx"}: 动态订阅聊天流
+            - {"type": "subscribe", "stream_id": "xxx", "since_seq": 可选}: 动态订阅聊天流
+            - {"type": "subscribe", "filter": {...}}: 按过滤条件订阅，条件字段包括
+              platforms、group_ids、user_ids、stream_ids、directions、sender_types、keywords
+              （可用单数形式，取值为单个值或列表；字段之间为“且”，同一字段的多个值之间为“或”）
             - {"type": "unsubscribe", "stream_id": "xxx"}: 取消订阅
+            - {"type": "unsubscribe", "filter_id": n}: 取消过滤订阅
 
             服务器推送:
-            - {"type": "message", ...}: 新消息
+            - {"type": "subscribed", "filter_id": n, "filter": {...}}: 过滤订阅成功
+            - {"type": "error", "message": "..."}: 过滤条件无效
+            - {"type": "message", "seq": n, ...}: 新消息，seq 为该聊天流内递增的序号
+            - {"type": "reset", "stream_id": "xxx", "seq": n}: since_seq 之后的消息已不在缓冲区，
+              客户端应通过 /messages 接口重新拉取历史，并以 n 作为新的起点
+            - {"type": "coalesced", "dropped": n, "stream_ids": [...]}: 客户端接收过慢，
+              积压的消息被合并（coalesce 策略），应重新拉取这些聊天流的历史
             """
             # 验证 Token
             from src.config.config import global_config as bot_config
@@ -433,34 +578,54 @@ class LiveChatRouterComponent(BaseRouterComponent):
                 logger.warning("WebSocket 连接被拒绝: 无效的 Token")
                 return
 
+            initial_filter = None
+            if filter_spec:
+                try:
+                    initial_filter = MessageFilter.from_spec(json.loads(filter_spec))
+                except ValueError as e:
+                    # json.JSONDecodeError 是 ValueError 的子类
+                    await websocket.close(code=4400, reason="过滤条件无效")
+                    logger.warning(f"WebSocket 连接被拒绝: 过滤条件无效 ({e})")
+                    return
+
             await websocket.accept()
 
             # 获取消息广播器
             broadcaster = get_message_broadcaster()
 
-            # 定义消息回调
-            async def send_message(msg: dict[str, Any]):
-                try:
-                    await websocket.send_json(msg)
-                except Exception as e:
-                    logger.debug(f"发送消息到 WebSocket 失败: {e}")
-
-            # 订阅消息
-            await broadcaster.subscribe(send_message, stream_id)
+            # 定义消息回调，由该连接自己的发送任务调用，发送失败时抛出异常结束发送任务；
+            # 收到的是广播器已编码好的 JSON 文本，所有连接共享同一份
+            batcher: Optional[FrameBatcher] = None
+            if batch_ms > 0:
+                batcher = FrameBatcher(websocket.send_text, batch_ms, max_batch)
+                batcher.start()
+                send_message = batcher.add
+            else:
+
+                async def send_message(text: str):
+                    await websocket.send_text(text)
+
+            # 持有关闭任务的引用直到其完成，避免任务在执行中被垃圾回收
+            close_tasks: set[asyncio.Task] = set()
+
+            def close_slow_client():
+                # 发送队列溢出（disconnect 策略）时断开连接，客户端重连后会重新收到最近消息
+                task = asyncio.create_task(websocket.close(code=1013, reason="客户端接收过慢"))
+                close_tasks.add(task)
+                task.add_done_callback(close_tasks.discard)
+
+            # 订阅消息，并先在发送队列中放入缓存的最近消息
+            await broadcaster.subscribe(
+                send_message,
+                stream_id,
+                on_overflow=close_slow_client,
+                replay=50,
+                raw=True,
+                since_seq=since_seq,
+                message_filter=initial_filter,
+            )
 
             try:
-                # 发送缓存的最近消息
-                if stream_id:
-                    recent = broadcaster.get_recent_messages_for_stream(stream_id, 50)
-                else:
-                    recent = broadcaster.get_recent_messages(50)
-
-                for msg in recent:
-                    try:
-                        await websocket.send_json(msg)
-                    except Exception:
-                        break
-
                 # 保持连接，处理客户端消息
                 while True:
                     try:
@@ -473,29 +638,56 @@ class LiveChatRouterComponent(BaseRouterComponent):
 
                         # 尝试解析 JSON 命令
                         try:
-                            import json
-
                             cmd = json.loads(data)
                             cmd_type = cmd.get("type")
 
-                            if cmd_type == "subscribe":
+                            if cmd_type == "subscribe" and cmd.get("filter") is not None:
+                                # 按过滤条件订阅，由广播器在服务端筛选
+                                try:
+                                    message_filter = MessageFilter.from_spec(cmd["filter"])
+                                except ValueError as e:
+                                    await websocket.send_json({"type": "error", "message": str(e)})
+                                    continue
+                                # 确认消息（带 filter_id）经由发送队列送出，排在补发的消息之前
+                                await broadcaster.subscribe(
+                                    send_message,
+                                    on_overflow=close_slow_client,
+                                    raw=True,
+                                    message_filter=message_filter,
+                                    ack={"type": "subscribed", "filter": message_filter.to_dict()},
+                                )
+
+                            elif cmd_type == "subscribe":
                                 # 动态订阅
                                 new_stream_id = cmd.get("stream_id")
                                 if new_stream_id:
+                                    cmd_since_seq = cmd.get("since_seq")
+                                    if not isinstance(cmd_since_seq, int) or cmd_since_seq < 0:
+                                        cmd_since_seq = None
+                                    # 广播器先登记订阅再读取当前序号，确认消息经由发送队列送出，
+                                    # 排在补发和之后的新消息之前，确认中的 seq 与推送的消息不会出现缺口
                                     await broadcaster.subscribe(
-                                        send_message, new_stream_id
-                                    )
-                                    await websocket.send_json(
-                                        {
-                                            "type": "subscribed",
-                                            "stream_id": new_stream_id,
-                                        }
+                                        send_message,
+                                        new_stream_id,
+                                        on_overflow=close_slow_client,
+                                        raw=True,
+                                        since_seq=cmd_since_seq,
+                                        ack={"type": "subscribed", "stream_id": new_stream_id},
                                     )
 
                             elif cmd_type == "unsubscribe":
                                 # 取消订阅
                                 old_stream_id = cmd.get("stream_id")
-                                if old_stream_id:
+                                filter_id = cmd.get("filter_id")
+                                if isinstance(filter_id, int):
+                                    await broadcaster.unsubscribe(send_message, filter_id=filter_id)
+                                    await websocket.send_json(
+                                        {
+                                            "type": "unsubscribed",
+                                            "filter_id": filter_id,
+                                        }
+                                    )
+                                elif old_stream_id:
                                     await broadcaster.unsubscribe(
                                         send_message, old_stream_id
                                     )
@@ -518,6 +710,8 @@ class LiveChatRouterComponent(BaseRouterComponent):
                         break
 
             finally:
-                # 取消订阅
-                await broadcaster.unsubscribe(send_message, stream_id)
+                # 取消该连接的全部订阅（包括动态订阅的聊天流）
+                await broadcaster.unsubscribe_all(send_message)
+                if batcher is not None:
+                    await batcher.stop()
                 logger.debug(f"WebSocket 清理完成, stream_id={stream_id}")
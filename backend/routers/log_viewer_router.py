@@ -22,6 +22,8 @@ from src.common.security import VerifiedDep
 from src.config.config import PROJECT_ROOT
 from src.plugin_system import BaseRouterComponent
 
+from ..utils.frame_batcher import DEFAULT_BATCH_SIZE, MAX_BATCH_MS, MAX_BATCH_SIZE, FrameBatcher
+
 logger = get_logger("WebUI.LogViewerRouter")
 
 # 日志目录
@@ -494,18 +496,34 @@ class LogViewerRouterComponent(BaseRouterComponent):
                 )
 
         @self.router.websocket("/realtime")
-        async def websocket_realtime_logs(websocket: WebSocket):
-            """WebSocket端点,用于实时推送日志"""
+        async def websocket_realtime_logs(
+            websocket: WebSocket,
+            batch_ms: int = Query(0, ge=0, le=MAX_BATCH_MS, description="批量推送的时间窗口（毫秒），0 表示逐条推送"),
+            max_batch: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=MAX_BATCH_SIZE, description="单个批次的日志数上限"),
+        ):
+            """
+            WebSocket端点,用于实时推送日志
+
+            指定 batch_ms 时开启批量模式，时间窗口内的日志合并为一个 JSON 数组帧推送
+            """
             await websocket.accept()
             logger.info("WebSocket客户端已连接")
 
             # 获取日志广播器
             broadcaster = get_log_broadcaster()
 
+            batcher: Optional[FrameBatcher] = None
+            if batch_ms > 0:
+                batcher = FrameBatcher(websocket.send_text, batch_ms, max_batch)
+                batcher.start()
+
             # 定义日志回调函数
             async def send_log(log_record: dict[str, Any]):
                 try:
-                    await websocket.send_json(log_record)
+                    if batcher is not None:
+                        await batcher.add_record(log_record)
+                    else:
+                        await websocket.send_json(log_record)
                 except Exception as e:
                     logger.debug(f"发送日志到WebSocket失败: {e}")
 
@@ -515,11 +533,19 @@ class LogViewerRouterComponent(BaseRouterComponent):
             try:
                 # 发送历史日志
                 recent_logs = broadcaster.get_recent_logs(limit=100)
-                for log in recent_logs:
+                if batcher is not None:
                     try:
-                        await websocket.send_json(log)
+                        for log in recent_logs:
+                            await batcher.add_record(log)
+                        await batcher.flush()
                     except Exception:
-                        break
+                        pass
+                else:
+                    for log in recent_logs:
+                        try:
+                            await websocket.send_json(log)
+                        except Exception:
+                            break
 
                 # 保持连接,等待客户端消息或断开
                 while True:
@@ -538,3 +564,5 @@ class LogViewerRouterComponent(BaseRouterComponent):
             finally:
                 # 取消订阅
                 await broadcaster.unsubscribe(send_log)
+                if batcher is not None:
+                    await batcher.stop()
@@ -0,0 +1,160 @@
+"""
+媒体文件路由组件
+按内容哈希输出聊天图片、表情包和表情包缩略图的原始文件，
+支持强 ETag、immutable 缓存和 Range 请求
+"""
+
+import asyncio
+import os
+from collections.abc import AsyncIterator
+from typing import Optional
+
+from fastapi import Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from src.common.logger import get_logger
+from src.plugin_system import BaseRouterComponent
+
+from ..utils.discovery.http_ranges import parse_byte_range
+from ..utils.media_store import (
+    KIND_EMOJI_THUMB,
+    MEDIA_HASH_PATTERN,
+    MEDIA_KINDS,
+    get_media_store,
+    sniff_media_type,
+    verify_media_signature,
+)
+
+logger = get_logger("WebUI.MediaRouter")
+
+# 内容不会变化，浏览器可以永久缓存；需要认证，只允许私有缓存
+MEDIA_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+# 流式读取文件的块大小
+MEDIA_CHUNK_SIZE = 64 * 1024
+
+
+def _has_valid_api_key(request: Request) -> bool:
+    """X-API-Key 请求头是否有效（供脚本等可以设置请求头的调用方使用）"""
+    from src.config.config import global_config as bot_config
+
+    api_key = request.headers.get("x-api-key")
+    valid_keys = bot_config.plugin_http_system.plugin_api_valid_keys if bot_config else []
+    return bool(api_key and valid_keys and api_key in valid_keys)
+
+
+async def _iter_file(path: str, start: int, length: int) -> AsyncIterator[bytes]:
+    """在线程中分块读取文件的指定范围"""
+    f = await asyncio.to_thread(open, path, "rb")
+    try:
+        await asyncio.to_thread(f.seek, start)
+        remaining = length
+        while remaining > 0:
+            chunk = await asyncio.to_thread(f.read, min(MEDIA_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+def _read_head(path: str) -> tuple[int, bytes]:
+    """文件大小和文件头（用于判断类型）"""
+    with open(path, "rb") as f:
+        head = f.read(16)
+        size = os.fstat(f.fileno()).st_size
+    return size, head
+
+
+class MediaRouterComponent(BaseRouterComponent):
+    """
+    媒体文件路由组件
+
+    路径: /media/{kind}/{hash}，kind 为 image（聊天图片）、emoji（表情包原图）或 emoji_thumb（表情包缩略图）；
+    哈希即内容，ETag 直接由类型和哈希得出，命中 If-None-Match 时不读取文件
+    """
+
+    component_name = "media"
+    component_description = "WebUI 媒体文件接口"
+    component_version = "1.0.0"
+
+    def register_endpoints(self) -> None:
+        """注册所有 HTTP 端点"""
+
+        @self.router.get("/{kind}/{media_hash}")
+        async def get_media(
+            request: Request,
+            kind: str,
+            media_hash: str,
+            sig: Optional[str] = Query(None, description="只对该文件有效的签名（media_url 生成）"),
+        ):
+            """获取媒体文件原始内容，需要有效的 URL 签名或 X-API-Key 请求头"""
+            if kind not in MEDIA_KINDS or not MEDIA_HASH_PATTERN.match(media_hash):
+                return JSONResponse({"detail": "媒体不存在"}, status_code=404)
+            if not verify_media_signature(kind, media_hash, sig) and not _has_valid_api_key(request):
+                return JSONResponse({"detail": "媒体链接无效"}, status_code=401)
+
+            etag = f'"{kind}-{media_hash}"'
+            headers = {
+                "ETag": etag,
+                "Cache-Control": MEDIA_CACHE_CONTROL,
+                "Accept-Ranges": "bytes",
+            }
+            if_none_match = request.headers.get("if-none-match")
+            if if_none_match and (if_none_match.strip() == "*" or etag in if_none_match):
+                return Response(status_code=304, headers=headers)
+
+            store = get_media_store()
+            try:
+                path = await store.resolve_path(kind, media_hash)
+            except Exception as e:
+                logger.error(f"查询媒体文件失败: {e}")
+                return JSONResponse({"detail": "查询媒体文件失败"}, status_code=500)
+            if not path:
+                return JSONResponse({"detail": "媒体不存在"}, status_code=404)
+
+            body: Optional[bytes] = None
+            try:
+                if kind == KIND_EMOJI_THUMB:
+                    body, media_type = await store.thumbnail(media_hash, path)
+                    size = len(body)
+                else:
+                    size, head = await asyncio.to_thread(_read_head, path)
+                    media_type = sniff_media_type(head, path)
+            except FileNotFoundError:
+                store.forget(media_hash)
+                return JSONResponse({"detail": "媒体文件不存在"}, status_code=404)
+            except Exception as e:
+                logger.error(f"读取媒体文件失败: {path} ({e})")
+                return JSONResponse({"detail": "读取媒体文件失败"}, status_code=500)
+
+            # If-Range 与当前 ETag 不一致时忽略 Range，返回完整内容
+            range_header = request.headers.get("range")
+            if_range = request.headers.get("if-range")
+            if if_range and if_range.strip() != etag:
+                range_header = None
+            try:
+                byte_range = parse_byte_range(range_header, size)
+            except ValueError:
+                return Response(
+                    status_code=416,
+                    headers={**headers, "Content-Range": f"bytes */{size}"},
+                )
+
+            status_code = 200
+            start, end = 0, size - 1
+            if byte_range is not None:
+                start, end = byte_range
+                status_code = 206
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            length = end - start + 1 if size else 0
+            headers["Content-Length"] = str(length)
+
+            if body is not None:
+                return Response(
+                    content=body[start : end + 1], status_code=status_code, headers=headers, media_type=media_type
+                )
+            return StreamingResponse(
+                _iter_file(path, start, length), status_code=status_code, headers=headers, media_type=media_type
+            )
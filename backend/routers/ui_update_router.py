@@ -7,6 +7,7 @@ from src.common.logger import get_logger
 from src.common.security import VerifiedDep
 from src.plugin_system import BaseRouterComponent
 
+from ..discovery_server import reload_discovery_static
 from ..utils.update import UIVersionManager
 from ..utils.update.models import (
     UIStatsCheckResponse,
@@ -50,6 +51,9 @@ class UIUpdateRouterComponent(BaseRouterComponent):
             try:
                 manager = UIVersionManager()
                 result = await manager.download_and_apply()
+                if result.get("success"):
+                    # 静态文件已变化，刷新发现服务器
+                    await reload_discovery_static()
                 return UIUpdateResponse(**result)
             except Exception as e:
                 logger.error(f"UI 更新失败: {e}")
@@ -74,6 +78,8 @@ class UIUpdateRouterComponent(BaseRouterComponent):
             try:
                 manager = UIVersionManager()
                 result = manager.rollback(request.commit_hash)
+                if result.get("success"):
+                    await reload_discovery_static()
                 return UIUpdateResponse(**result)
             except Exception as e:
                 logger.error(f"UI 回滚失败: {e}")
@@ -0,0 +1,65 @@
+"""
+测试配置
+
+插件包的 __init__ 依赖插件系统，这里把插件目录、utils 和 utils.discovery 登记为空包，
+测试只导入被测的工具模块；插件目录本身的模块名（pytest 收集时会导入）也指向这个空包。
+在机器人仓库之外运行时，用标准库 logging 代替 src.common.logger
+"""
+
+import importlib
+import logging
+import sys
+import time
+import types
+from pathlib import Path
+
+import pytest
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+
+# 测试中插件包使用的模块名，例如 webui_plugin.utils.media_store
+PACKAGE = "webui_plugin"
+
+
+def _register_package(name: str, path: Path) -> types.ModuleType:
+    package = types.ModuleType(name)
+    package.__path__ = [str(path)]
+    package.__package__ = name
+    sys.modules[name] = package
+    return package
+
+
+def _ensure_logger() -> None:
+    try:
+        importlib.import_module("src.common.logger")
+    except ImportError:
+        modules = {name: types.ModuleType(name) for name in ("src", "src.common", "src.common.logger")}
+        modules["src.common.logger"].get_logger = logging.getLogger
+        for name, module in modules.items():
+            if name != "src.common.logger":
+                module.__path__ = []
+            sys.modules.setdefault(name, module)
+
+
+_ensure_logger()
+sys.modules.setdefault(PLUGIN_DIR.name, _register_package(PACKAGE, PLUGIN_DIR))
+_register_package(f"{PACKAGE}.utils", PLUGIN_DIR / "utils")
+_register_package(f"{PACKAGE}.utils.discovery", PLUGIN_DIR / "utils" / "discovery")
+
+
+class FakeClock:
+    """可手动拨动的 time.monotonic 替身"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """把 time.monotonic 换成 FakeClock，测试通过修改 clock.now 推进时间"""
+    fake = FakeClock()
+    monkeypatch.setattr(time, "monotonic", fake)
+    return fake
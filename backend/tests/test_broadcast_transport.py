@@ -0,0 +1,88 @@
+"""实时消息的 Unix 域套接字传输"""
+
+import asyncio
+import socket
+import sys
+
+import pytest
+
+from webui_plugin.utils.broadcast_transport import BroadcastTransport, UnixSocketClient, UnixSocketHub
+from webui_plugin.utils.message_broadcaster import MessageBroadcaster
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="需要 Unix 域套接字")
+
+
+def _message(text):
+    return {"message_info": {"message_id": text}, "message_segment": {"type": "text", "data": text}}
+
+
+async def _wait_for(predicate, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+def test_worker_receives_hub_messages_with_hub_seqs(tmp_path):
+    path = str(tmp_path / "hub.sock")
+
+    async def scenario():
+        hub, worker = MessageBroadcaster(), MessageBroadcaster()
+        assert await hub.set_transport(UnixSocketHub(path))
+        client = UnixSocketClient(path)
+        assert await worker.set_transport(client)
+        await _wait_for(lambda: client.connected and hub.transport.get_stats()["peers"] == 1)
+
+        received = []
+        await worker.subscribe(lambda message: received.append(message), "A")
+        hub.enqueue(_message("one"), "A")
+        hub.enqueue(_message("two"), "A")
+        await _wait_for(lambda: len(received) == 2)
+
+        # 工作进程自己产生的消息不会发往中心
+        worker.enqueue(_message("local"), "A")
+        await asyncio.sleep(0.05)
+        hub_seq = hub.current_seq("A")
+
+        await worker.set_transport(BroadcastTransport())
+        await hub.set_transport(BroadcastTransport())
+        return received, hub_seq
+
+    received, hub_seq = asyncio.run(scenario())
+    assert [(m["content"], m["seq"]) for m in received[:2]] == [("one", 1), ("two", 2)]
+    assert hub_seq == 2
+
+
+def test_second_hub_does_not_take_over_a_live_socket(tmp_path):
+    path = str(tmp_path / "hub.sock")
+
+    async def scenario():
+        first = UnixSocketHub(path)
+        await first.start(lambda text: None)
+        broadcaster = MessageBroadcaster()
+        started = await broadcaster.set_transport(UnixSocketHub(path))
+
+        client = UnixSocketClient(path)
+        await client.start(lambda text: None)
+        await _wait_for(lambda: client.connected)
+        peers = first.get_stats()["peers"]
+
+        await client.close()
+        await first.close()
+        return started, broadcaster.transport.name, peers
+
+    assert asyncio.run(scenario()) == (False, "local", 1)
+
+
+def test_hub_replaces_a_stale_socket_file(tmp_path):
+    path = str(tmp_path / "hub.sock")
+    stale = socket.socket(socket.AF_UNIX)
+    stale.bind(path)
+    stale.close()
+
+    async def scenario():
+        hub = UnixSocketHub(path)
+        await hub.start(lambda text: None)
+        await hub.close()
+
+    asyncio.run(scenario())
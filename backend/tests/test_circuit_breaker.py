@@ -0,0 +1,89 @@
+"""主程序熔断器"""
+
+import pytest
+
+from webui_plugin.utils.discovery.circuit_breaker import (
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    CircuitBreaker,
+)
+
+
+def _tripped(threshold=3, reset_timeout=5.0, max_reset_timeout=60.0):
+    breaker = CircuitBreaker("test", threshold, reset_timeout, max_reset_timeout)
+    for _ in range(threshold):
+        breaker.record_failure()
+    return breaker
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.allow_request() == (0.0, False)
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+
+    clock.now += 2.0
+    retry_after, probe = breaker.allow_request()
+    assert retry_after == pytest.approx(3.0)
+    assert not probe
+    assert breaker.open_remaining() == pytest.approx(3.0)
+    assert breaker.get_stats()["rejected"] == 1
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == STATE_CLOSED
+
+
+def test_half_open_allows_a_single_probe(clock):
+    breaker = _tripped()
+    clock.now += 5.0
+    assert breaker.allow_request() == (0.0, True)
+    assert breaker.state == STATE_HALF_OPEN
+    assert breaker.allow_request() == (1.0, False)
+    # 半开状态不算熔断，长连接不被拒绝
+    assert breaker.open_remaining() == 0.0
+
+
+def test_successful_probe_closes_the_breaker(clock):
+    breaker = _tripped()
+    clock.now += 5.0
+    breaker.allow_request()
+    breaker.record_success()
+    breaker.release_probe()
+    assert breaker.state == STATE_CLOSED
+    assert breaker.allow_request() == (0.0, False)
+
+
+def test_failed_probe_doubles_the_timeout_up_to_the_cap(clock):
+    breaker = _tripped(reset_timeout=5.0, max_reset_timeout=15.0)
+    expected_timeouts = [10.0, 15.0, 15.0]
+    for expected in expected_timeouts:
+        clock.now += breaker.current_timeout
+        assert breaker.allow_request() == (0.0, True)
+        breaker.record_failure()
+        breaker.release_probe()
+        assert breaker.state == STATE_OPEN
+        assert breaker.open_remaining() == pytest.approx(expected)
+    assert breaker.trips == 1 + len(expected_timeouts)
+
+    clock.now += breaker.current_timeout
+    breaker.allow_request()
+    breaker.record_success()
+    assert breaker.current_timeout == 5.0
+
+
+def test_release_probe_without_verdict_lets_the_next_request_probe(clock):
+    # 探测请求被取消或返回前客户端断开时，没有得出结论，下一个请求接替探测
+    breaker = _tripped()
+    clock.now += 5.0
+    assert breaker.allow_request() == (0.0, True)
+    breaker.release_probe()
+    assert breaker.state == STATE_HALF_OPEN
+    assert breaker.allow_request() == (0.0, True)
@@ -0,0 +1,35 @@
+"""Range 请求头解析"""
+
+import pytest
+
+from webui_plugin.utils.discovery.http_ranges import parse_byte_range
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, None),
+        ("", None),
+        ("bytes=0-4", (0, 4)),
+        ("bytes=5-", (5, 9)),
+        ("bytes=-3", (7, 9)),
+        ("bytes=2-100", (2, 9)),
+        ("bytes=-100", (0, 9)),
+        (" bytes = 1 - 2 ", (1, 2)),
+        # 不支持的单位、多段范围和格式错误都退回完整内容
+        ("items=0-1", None),
+        ("bytes=0-1,3-4", None),
+        ("bytes=a-b", None),
+        ("bytes=-", None),
+        # 结束位置小于起始位置的范围无效，忽略
+        ("bytes=4-2", None),
+    ],
+)
+def test_parse_byte_range(header, expected):
+    assert parse_byte_range(header, 10) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=10-", "bytes=20-30", "bytes=-0", "bytes=10-12"])
+def test_parse_byte_range_unsatisfiable(header):
+    with pytest.raises(ValueError):
+        parse_byte_range(header, 10)
@@ -0,0 +1,53 @@
+"""媒体链接签名"""
+
+import sys
+import types
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from webui_plugin.utils import media_store
+from webui_plugin.utils.media_store import (
+    KIND_EMOJI,
+    KIND_IMAGE,
+    media_url,
+    verify_media_signature,
+)
+
+
+def _signature(url):
+    return parse_qs(urlsplit(url).query)["sig"][0]
+
+
+@pytest.fixture
+def project_root(tmp_path, monkeypatch):
+    """让签名密钥保存到临时目录，并在测试前后清空已加载的密钥"""
+    config_module = types.ModuleType("src.config.config")
+    config_module.PROJECT_ROOT = str(tmp_path)
+    monkeypatch.setitem(sys.modules, "src.config", types.ModuleType("src.config"))
+    monkeypatch.setitem(sys.modules, "src.config.config", config_module)
+    monkeypatch.setattr(media_store, "_signing_key", None)
+    return tmp_path
+
+
+def test_media_url_signature_verifies(project_root):
+    url = media_url(KIND_IMAGE, "abc123")
+    assert urlsplit(url).path.endswith(f"/media/{KIND_IMAGE}/abc123")
+    assert verify_media_signature(KIND_IMAGE, "abc123", _signature(url))
+
+
+def test_media_url_is_stable_across_restarts(project_root):
+    # URL 不随时间和重启变化，浏览器缓存才能一直命中
+    url = media_url(KIND_EMOJI, "h")
+    key_file = project_root / "data" / "webui" / media_store.MEDIA_KEY_FILENAME
+    assert key_file.stat().st_size == 32
+    media_store._signing_key = None
+    assert media_url(KIND_EMOJI, "h") == url
+
+
+def test_media_signature_rejects_tampering(project_root):
+    signature = _signature(media_url(KIND_IMAGE, "abc123"))
+    assert not verify_media_signature(KIND_EMOJI, "abc123", signature)
+    assert not verify_media_signature(KIND_IMAGE, "other", signature)
+    assert not verify_media_signature(KIND_IMAGE, "abc123", ("B" if signature[0] == "A" else "A") + signature[1:])
+    assert not verify_media_signature(KIND_IMAGE, "abc123", None)
@@ -0,0 +1,86 @@
+"""消息广播器的订阅与取消订阅"""
+
+import asyncio
+
+from webui_plugin.utils.message_broadcaster import MessageBroadcaster
+from webui_plugin.utils.message_filter import MessageFilter
+
+
+def _message(text):
+    return {"message_info": {"message_id": text}, "message_segment": {"type": "text", "data": text}}
+
+
+async def _drain():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_unsubscribing_unknown_stream_keeps_existing_subscription():
+    async def scenario():
+        broadcaster = MessageBroadcaster()
+        received = []
+
+        async def callback(message):
+            received.append(message["content"])
+
+        await broadcaster.subscribe(callback, "A")
+        await broadcaster.unsubscribe(callback, "B")
+        await broadcaster.unsubscribe(callback)
+        broadcaster.enqueue(_message("hello"), "A")
+        await _drain()
+
+        subscriber = broadcaster._by_callback[callback]
+        await broadcaster.unsubscribe_all(callback)
+        return received, subscriber, broadcaster
+
+    received, subscriber, broadcaster = asyncio.run(scenario())
+    assert received == ["hello"]
+    assert subscriber.closed
+    assert broadcaster.subscribers == {}
+    assert broadcaster._by_callback == {}
+
+
+def test_repeated_subscribe_is_undone_by_one_unsubscribe():
+    async def scenario():
+        broadcaster = MessageBroadcaster()
+
+        async def callback(message):
+            pass
+
+        await broadcaster.subscribe(callback, "A")
+        await broadcaster.subscribe(callback, "A")
+        await broadcaster.subscribe(callback)
+        subscriber = broadcaster._by_callback[callback]
+        counts = [subscriber.subscriptions]
+        await broadcaster.unsubscribe(callback, "A")
+        counts.append(subscriber.subscriptions)
+        await broadcaster.unsubscribe(callback)
+        return counts, subscriber, broadcaster
+
+    counts, subscriber, broadcaster = asyncio.run(scenario())
+    assert counts == [2, 1]
+    assert subscriber.closed
+    assert broadcaster.subscribers == {}
+    assert not broadcaster.global_subscribers
+    assert broadcaster._by_callback == {}
+
+
+def test_unsubscribing_foreign_filter_is_ignored():
+    async def scenario():
+        broadcaster = MessageBroadcaster()
+
+        async def first(message):
+            pass
+
+        async def second(message):
+            pass
+
+        filter_id = await broadcaster.subscribe(first, message_filter=MessageFilter.from_spec({"platform": "qq"}))
+        await broadcaster.subscribe(second, "A")
+        await broadcaster.unsubscribe(second, filter_id=filter_id)
+        result = (len(broadcaster.filters), broadcaster._by_callback[second].subscriptions)
+        await broadcaster.unsubscribe_all(first)
+        await broadcaster.unsubscribe_all(second)
+        return result
+
+    assert asyncio.run(scenario()) == (1, 1)
@@ -0,0 +1,112 @@
+"""历史消息游标编码与键集分页"""
+
+import pytest
+
+from webui_plugin.utils.message_cursor import (
+    CURSOR_AFTER,
+    CURSOR_BEFORE,
+    decode_cursor,
+    encode_cursor,
+    keyset_condition,
+    next_page_cursor,
+)
+
+
+@pytest.mark.parametrize(
+    "direction, timestamp, message_id",
+    [
+        (CURSOR_BEFORE, 1700000000.5, "m-1"),
+        (CURSOR_AFTER, 0.0, None),
+        (CURSOR_BEFORE, 1.25, "消息/带?特殊&字符"),
+    ],
+)
+def test_cursor_round_trip(direction, timestamp, message_id):
+    cursor = encode_cursor(direction, timestamp, message_id)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (direction, timestamp, message_id)
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "",
+        "not base64!",
+        encode_cursor("sideways", 1.0, "m"),
+        encode_cursor(CURSOR_BEFORE, float("inf"), "m"),
+        # message_id 不是字符串
+        "eyJkIjoiYmVmb3JlIiwidCI6MSwiaWQiOjF9",
+        # JSON 不是对象
+        "WzFd",
+    ],
+)
+def test_decode_rejects_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_next_cursor_for_recent_messages_points_at_oldest():
+    messages = [{"time": 20.0, "message_id": "b"}, {"time": 10.0, "message_id": "a"}]
+    cursor = next_page_cursor(messages, has_more=True)
+    assert decode_cursor(cursor) == (CURSOR_BEFORE, 10.0, "a")
+    assert next_page_cursor([], has_more=False) is None
+
+
+def test_next_cursor_before_direction_stops_at_oldest_page():
+    messages = [{"time": 1.0, "message_id": "a"}, {"time": 2.0, "message_id": "b"}]
+    cursor = next_page_cursor(messages, has_more=True, before=(3.0, "c"))
+    assert decode_cursor(cursor) == (CURSOR_BEFORE, 1.0, "a")
+    assert next_page_cursor(messages, has_more=False, before=(3.0, "c")) is None
+
+
+def test_next_cursor_after_direction_keeps_position_on_empty_page():
+    messages = [{"time": 4.0, "message_id": "d"}, {"time": 5.0, "message_id": "e"}]
+    assert decode_cursor(next_page_cursor(messages, False, after=(3.0, "c"))) == (CURSOR_AFTER, 5.0, "e")
+    assert decode_cursor(next_page_cursor([], False, after=(3.0, "c"))) == (CURSOR_AFTER, 3.0, "c")
+
+
+def _keyset_pages(rows, page_size, direction):
+    """用 keyset_condition 在 SQLite 内存库中逐页翻完，返回每页的 (time, message_id)"""
+    sqlalchemy = pytest.importorskip("sqlalchemy")
+    from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+    class Base(DeclarativeBase):
+        pass
+
+    class Messages(Base):
+        __tablename__ = "messages"
+        id: Mapped[int] = mapped_column(primary_key=True)
+        time: Mapped[float]
+        message_id: Mapped[str]
+
+    engine = sqlalchemy.create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    pages = []
+    with Session(engine) as session:
+        session.add_all(Messages(time=t, message_id=m) for t, m in rows)
+        session.commit()
+
+        position = None
+        while True:
+            stmt = sqlalchemy.select(Messages)
+            if position is not None:
+                stmt = stmt.where(keyset_condition(Messages, direction, *position))
+            if direction == CURSOR_BEFORE:
+                stmt = stmt.order_by(Messages.time.desc(), Messages.message_id.desc())
+            else:
+                stmt = stmt.order_by(Messages.time.asc(), Messages.message_id.asc())
+            page = [(m.time, m.message_id) for m in session.scalars(stmt.limit(page_size))]
+            if not page:
+                return pages
+            pages.append(page)
+            position = page[-1]
+
+
+@pytest.mark.parametrize("direction", [CURSOR_BEFORE, CURSOR_AFTER])
+def test_keyset_paging_visits_every_row_once(direction):
+    # 多条消息共享同一时间戳，必须按 message_id 区分才不会漏掉或重复
+    rows = [(float(t // 3), f"m{t:03d}") for t in range(25)]
+    pages = _keyset_pages(rows, page_size=4, direction=direction)
+    visited = [row for page in pages for row in page]
+    expected = sorted(rows, reverse=direction == CURSOR_BEFORE)
+    assert visited == expected
+    assert all(len(page) <= 4 for page in pages)
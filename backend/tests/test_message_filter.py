@@ -0,0 +1,135 @@
+"""订阅过滤条件与过滤索引"""
+
+import random
+
+import pytest
+
+from webui_plugin.utils.message_filter import MAX_VALUES_PER_FIELD, FilterIndex, MessageFilter
+
+
+def _message(**fields):
+    message = {
+        "stream_id": "s1",
+        "group_id": "g1",
+        "user_id": "u1",
+        "platform": "qq",
+        "direction": "incoming",
+        "sender_type": "user",
+        "content": "hello",
+        "display_message": "",
+    }
+    message.update(fields)
+    return message
+
+
+def test_from_spec_accepts_aliases_and_single_values():
+    message_filter = MessageFilter.from_spec({"platform": "qq", "group_ids": [123, "456"], "keyword": "MaiMai"})
+    assert message_filter.platforms == frozenset({"qq"})
+    assert message_filter.group_ids == frozenset({"123", "456"})
+    assert message_filter.keywords == ("maimai",)
+    assert message_filter.index_field == "group_ids"
+
+
+@pytest.mark.parametrize(
+    "spec",
+    [
+        "qq",
+        {"unknown": "x"},
+        {"platforms": {"qq": True}},
+        {"user_ids": [str(i) for i in range(MAX_VALUES_PER_FIELD + 1)]},
+    ],
+)
+def test_from_spec_rejects_invalid_spec(spec):
+    with pytest.raises(ValueError):
+        MessageFilter.from_spec(spec)
+
+
+def test_empty_values_mean_no_constraint():
+    message_filter = MessageFilter.from_spec({"platforms": [], "user_id": ""})
+    assert message_filter.index_field is None
+    assert message_filter.matches(_message())
+
+
+def test_matches_combines_fields_with_and_and_values_with_or():
+    message_filter = MessageFilter.from_spec({"group_ids": ["g1", "g2"], "directions": "incoming"})
+    assert message_filter.matches(_message(group_id="g2"))
+    assert not message_filter.matches(_message(group_id="g3"))
+    assert not message_filter.matches(_message(direction="outgoing"))
+    assert not message_filter.matches(_message(group_id=None))
+
+
+def test_keywords_match_content_or_display_text_case_insensitively():
+    message_filter = MessageFilter.from_spec({"keywords": ["Foo", "bar"]})
+    assert message_filter.matches(_message(content="xx FOO yy"))
+    assert message_filter.matches(_message(content=None, display_message="BAR"))
+    assert not message_filter.matches(_message(content="baz"))
+
+
+def test_index_match_deduplicates_subscribers_and_honours_exclude():
+    index = FilterIndex()
+    index.add(MessageFilter.from_spec({"stream_ids": "s1"}), "a")
+    index.add(MessageFilter.from_spec({"platforms": "qq"}), "a")
+    index.add(MessageFilter.from_spec({"user_ids": "u1"}), "b")
+    index.add(MessageFilter.from_spec({"keywords": "hello"}), "c")
+
+    assert sorted(index.match(_message())) == ["a", "b", "c"]
+    assert sorted(index.match(_message(), exclude={"b"})) == ["a", "c"]
+    assert index.match(_message(stream_id="s2", platform="tg", user_id="u2", content="")) == []
+
+
+def test_index_remove_cleans_up_buckets():
+    index = FilterIndex()
+    first = index.add(MessageFilter.from_spec({"group_ids": ["g1", "g2"]}), "a")
+    second = index.add(MessageFilter.from_spec({}), "a")
+    index.add(MessageFilter.from_spec({"group_ids": "g2"}), "b")
+
+    assert index.ids_for("a") == [first, second]
+    assert index.remove(first)[1] == "a"
+    assert index.remove(first) is None
+    assert index.get(first) is None
+    stats = index.get_stats()
+    assert stats["filters"] == 2
+    assert stats["unindexed"] == 1
+    assert stats["indexed_values"]["group_ids"] == 1
+    assert index.match(_message(group_id="g1")) == ["a"]
+
+
+def test_index_match_equals_linear_scan():
+    # 索引只是加速，结果必须与逐个校验全部过滤器一致
+    rng = random.Random(0)
+    pools = {
+        "stream_ids": ["s1", "s2", "s3"],
+        "group_ids": ["g1", "g2", "g3"],
+        "user_ids": ["u1", "u2", "u3"],
+        "platforms": ["qq", "tg"],
+        "directions": ["incoming", "outgoing"],
+        "sender_types": ["user", "bot"],
+        "keywords": ["hello", "world"],
+    }
+    index = FilterIndex()
+    filters = []
+    for i in range(200):
+        spec = {
+            field: rng.sample(values, rng.randint(1, len(values)))
+            for field, values in pools.items()
+            if rng.random() < 0.3
+        }
+        subscriber = f"sub{i % 50}"
+        message_filter = MessageFilter.from_spec(spec)
+        filters.append((message_filter, subscriber))
+        index.add(message_filter, subscriber)
+
+    for _ in range(300):
+        message = _message(
+            stream_id=rng.choice(pools["stream_ids"]),
+            group_id=rng.choice(pools["group_ids"] + [None]),
+            user_id=rng.choice(pools["user_ids"]),
+            platform=rng.choice(pools["platforms"]),
+            direction=rng.choice(pools["directions"]),
+            sender_type=rng.choice(pools["sender_types"]),
+            content=rng.choice(["hello there", "world", "nothing"]),
+        )
+        expected = {subscriber for message_filter, subscriber in filters if message_filter.matches(message)}
+        matched = index.match(message)
+        assert len(matched) == len(set(matched))
+        assert set(matched) == expected
@@ -0,0 +1,106 @@
+"""代理准入控制：令牌桶与并发上限"""
+
+import asyncio
+
+import pytest
+
+from webui_plugin.utils.discovery.rate_limiter import AdmissionController
+
+
+def test_limit_for_uses_longest_prefix():
+    controller = AdmissionController({
+        "default": {"rate": 1},
+        "api/": {"rate": 2},
+        "/api/search": {"rate": 3},
+    })
+    assert controller.limit_for("api/search/logs").rate == 3
+    assert controller.limit_for("/api/stats").rate == 2
+    assert controller.limit_for("other").rate == 1
+    assert AdmissionController({"api": {"rate": 1}}).limit_for("other") is None
+
+
+def test_token_bucket_rejects_with_retry_after(clock):
+    async def scenario():
+        controller = AdmissionController({"default": {"rate": 2.0, "burst": 3}})
+        results = []
+        for _ in range(4):
+            state, retry_after = await controller.acquire("key", "path")
+            if state is not None:
+                controller.release(state)
+            results.append(retry_after)
+        clock.now += 0.5
+        state, retry_after = await controller.acquire("key", "path")
+        return results, state, retry_after, controller.get_stats()
+
+    results, state, retry_after, stats = asyncio.run(scenario())
+    assert results[:3] == [0.0, 0.0, 0.0]
+    assert results[3] == pytest.approx(0.5)
+    # 0.5 秒补充了一个令牌
+    assert state is not None and retry_after == 0.0
+    assert stats["rejected"] == [{"group": "default", "reason": "rate", "count": 1}]
+
+
+def test_keys_and_anonymous_clients_are_counted_separately(clock):
+    async def scenario():
+        controller = AdmissionController({"default": {"rate": 1.0, "burst": 1}})
+        return [
+            (await controller.acquire(api_key, "path", client))[1]
+            for api_key, client in [
+                ("k1", None), ("k2", None), (None, "10.0.0.1"), (None, "10.0.0.2"), ("k1", "10.0.0.3"),
+            ]
+        ]
+
+    assert asyncio.run(scenario()) == [0.0, 0.0, 0.0, 0.0, pytest.approx(1.0)]
+
+
+def test_concurrency_limit_without_queue_rejects_immediately(clock):
+    async def scenario():
+        controller = AdmissionController({"default": {"max_concurrency": 1, "max_wait": 0}})
+        first, _ = await controller.acquire("key", "path")
+        rejected = await controller.acquire("key", "path")
+        controller.release(first)
+        second, _ = await controller.acquire("key", "path")
+        return rejected, second
+
+    rejected, second = asyncio.run(scenario())
+    assert rejected == (None, 1.0)
+    assert second is not None
+
+
+def test_queued_request_is_admitted_when_slot_is_released():
+    async def scenario():
+        controller = AdmissionController({"default": {"max_concurrency": 1, "max_wait": 5.0}})
+        first, _ = await controller.acquire("key", "path")
+        waiter = asyncio.create_task(controller.acquire("key", "path"))
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        controller.release(first)
+        state, retry_after = await asyncio.wait_for(waiter, timeout=1.0)
+        return state, retry_after, controller.get_stats()
+
+    state, retry_after, stats = asyncio.run(scenario())
+    assert state is not None and retry_after == 0.0
+    assert stats["queued"] == {"default": 1}
+
+
+def test_queued_request_gives_up_after_max_wait():
+    async def scenario():
+        controller = AdmissionController({"default": {"max_concurrency": 1, "max_wait": 0.05}})
+        await controller.acquire("key", "path")
+        return await controller.acquire("key", "path")
+
+    assert asyncio.run(scenario()) == (None, 1.0)
+
+
+def test_concurrency_rejection_does_not_consume_tokens(clock):
+    async def scenario():
+        controller = AdmissionController({"default": {"rate": 1.0, "burst": 2, "max_concurrency": 1}})
+        first, _ = await controller.acquire("key", "path")
+        for _ in range(3):
+            assert await controller.acquire("key", "path") == (None, 1.0)
+        controller.release(first)
+        return await controller.acquire("key", "path")
+
+    state, retry_after = asyncio.run(scenario())
+    # 桶里还剩一个令牌
+    assert state is not None and retry_after == 0.0
@@ -0,0 +1,145 @@
+"""消息段提取：非递归实现与原先递归实现的结果一致"""
+
+import random
+
+from webui_plugin.utils.message_broadcaster import SEGMENT_PLACEHOLDERS, SegmentExtractor
+
+extractor = SegmentExtractor(SEGMENT_PLACEHOLDERS)
+
+
+def _reference_content(segment):
+    """原 MessageBroadcaster._extract_content_from_segment（递归实现）"""
+    if not segment:
+        return ""
+
+    contents = []
+
+    def extract_from_seg(seg):
+        seg_type = seg.get("type")
+        data = seg.get("data")
+
+        if seg_type == "text":
+            if isinstance(data, str):
+                contents.append(data)
+            elif isinstance(data, dict):
+                contents.append(data.get("text", ""))
+        elif seg_type == "image":
+            contents.append("[图片]")
+        elif seg_type == "emoji":
+            contents.append("[表情]")
+        elif seg_type == "voice":
+            contents.append("[语音]")
+        elif seg_type == "video":
+            contents.append("[视频]")
+        elif seg_type == "file":
+            contents.append("[文件]")
+        elif seg_type == "at":
+            at_name = data.get("name", "") if isinstance(data, dict) else ""
+            contents.append(f"@{at_name}")
+        elif seg_type == "seglist":
+            for sub_seg in data if isinstance(data, list) else []:
+                if isinstance(sub_seg, dict):
+                    extract_from_seg(sub_seg)
+
+    if isinstance(segment, dict):
+        extract_from_seg(segment)
+    elif isinstance(segment, list):
+        for seg in segment:
+            if isinstance(seg, dict):
+                extract_from_seg(seg)
+
+    return "".join(contents)
+
+
+def _reference_reply(segment):
+    """原 MessageBroadcaster._extract_reply_from_segment，只查看顶层和一层 seglist"""
+    if not segment:
+        return None
+
+    if isinstance(segment, dict):
+        seg_type = segment.get("type")
+        if seg_type == "reply":
+            return segment.get("data")
+        elif seg_type == "seglist":
+            for seg in segment.get("data", []):
+                if isinstance(seg, dict) and seg.get("type") == "reply":
+                    return seg.get("data")
+    elif isinstance(segment, list):
+        for seg in segment:
+            if isinstance(seg, dict) and seg.get("type") == "reply":
+                return seg.get("data")
+
+    return None
+
+
+def _random_segment(rng, depth, allow_reply):
+    """随机消息段；allow_reply 为 False 时不在这一层生成 reply"""
+    choices = ["text", "text_dict", "at", "at_bad", "image", "emoji", "voice", "video", "file", "unknown", "junk"]
+    if allow_reply:
+        choices.append("reply")
+    if depth < 4:
+        choices += ["seglist", "seglist"]
+    kind = rng.choice(choices)
+    if kind == "text":
+        return {"type": "text", "data": rng.choice(["a", "bc", "", "麦麦"])}
+    if kind == "text_dict":
+        return {"type": "text", "data": rng.choice([{"text": "d"}, {}])}
+    if kind == "at":
+        return {"type": "at", "data": {"name": rng.choice(["x", "y"])}}
+    if kind == "at_bad":
+        return {"type": "at", "data": "123"}
+    if kind == "reply":
+        return {"type": "reply", "data": f"r{rng.randint(0, 99)}"}
+    if kind == "seglist":
+        return {"type": "seglist", "data": _random_list(rng, depth + 1, allow_reply=False)}
+    if kind == "unknown":
+        return {"type": "poke", "data": None}
+    if kind == "junk":
+        return rng.choice([None, "text", 3])
+    return {"type": kind, "data": "base64"}
+
+
+def _random_list(rng, depth, allow_reply):
+    return [_random_segment(rng, depth, allow_reply) for _ in range(rng.randint(0, 5))]
+
+
+def test_content_matches_recursive_extractor():
+    rng = random.Random(0)
+    for _ in range(2000):
+        segment = _random_list(rng, 0, allow_reply=True)
+        if rng.random() < 0.3:
+            segment = {"type": "seglist", "data": segment}
+        assert extractor.extract(segment)[0] == _reference_content(segment)
+
+
+def test_reply_matches_recursive_extractor_for_top_level_replies():
+    # 原实现只在顶层列表或单个 seglist 的直接子段中查找 reply，这些情况下结果必须一致
+    rng = random.Random(1)
+    for _ in range(2000):
+        segment = _random_list(rng, 0, allow_reply=True)
+        if rng.random() < 0.3:
+            segment = {"type": "seglist", "data": segment}
+        assert extractor.extract(segment)[1] == _reference_reply(segment)
+
+
+def test_reply_is_found_in_nested_seglist():
+    segment = [
+        {"type": "text", "data": "hi"},
+        {"type": "seglist", "data": [{"type": "seglist", "data": [{"type": "reply", "data": "m1"}]}]},
+        {"type": "reply", "data": "m2"},
+    ]
+    assert extractor.extract(segment) == ("hi", "m1")
+
+
+def test_single_segments_and_empty_input():
+    assert extractor.extract(None) == ("", None)
+    assert extractor.extract([]) == ("", None)
+    assert extractor.extract({"type": "text", "data": "x"}) == ("x", None)
+    assert extractor.extract({"type": "reply", "data": "m1"}) == ("", "m1")
+
+
+def test_deeply_nested_seglist_does_not_hit_recursion_limit():
+    segment = {"type": "text", "data": "deep"}
+    for _ in range(5000):
+        segment = {"type": "seglist", "data": [segment]}
+    assert extractor.extract(segment) == ("deep", None)
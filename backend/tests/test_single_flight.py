@@ -0,0 +1,106 @@
+"""单飞请求合并"""
+
+import asyncio
+
+import pytest
+
+from webui_plugin.utils.discovery.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    async def scenario():
+        flight = SingleFlight(routes=[])
+        calls = 0
+        release = asyncio.Event()
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "result"
+
+        waiters = [asyncio.create_task(flight.do("key", fetch)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters)
+        return calls, results, flight.get_stats()
+
+    calls, results, stats = asyncio.run(scenario())
+    assert calls == 1
+    assert [value for value, _ in results] == ["result"] * 5
+    assert [coalesced for _, coalesced in results] == [False, True, True, True, True]
+    assert stats == {"executed": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_different_keys_are_not_coalesced():
+    async def scenario():
+        flight = SingleFlight(routes=[])
+
+        async def fetch(value):
+            await asyncio.sleep(0)
+            return value
+
+        return await asyncio.gather(flight.do("a", lambda: fetch(1)), flight.do("b", lambda: fetch(2)))
+
+    assert asyncio.run(scenario()) == [(1, False), (2, False)]
+
+
+def test_cancelled_waiter_does_not_cancel_upstream_call():
+    async def scenario():
+        flight = SingleFlight(routes=[])
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return "done"
+
+        leader = asyncio.create_task(flight.do("key", fetch))
+        follower = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return leader, await follower
+
+    leader, follower_result = asyncio.run(scenario())
+    assert leader.cancelled()
+    assert follower_result == ("done", True)
+
+
+def test_exception_reaches_every_waiter_and_key_is_released():
+    async def scenario():
+        flight = SingleFlight(routes=[])
+
+        async def fail():
+            await asyncio.sleep(0)
+            raise ConnectionError("upstream down")
+
+        results = await asyncio.gather(
+            flight.do("key", fail), flight.do("key", fail), return_exceptions=True
+        )
+
+        async def succeed():
+            return "ok"
+
+        return results, await flight.do("key", succeed)
+
+    results, retry = asyncio.run(scenario())
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert retry == ("ok", False)
+
+
+@pytest.mark.parametrize(
+    "path, expected",
+    [
+        ("webui_backend/stats/overview", True),
+        ("/webui_backend/model_stats/", True),
+        ("webui_backend/log_viewer/logs", False),
+        ("other_plugin/stats/", False),
+    ],
+)
+def test_matches_default_routes(path, expected):
+    assert SingleFlight().matches(path) is expected
+
+
+def test_empty_route_list_matches_nothing():
+    assert not SingleFlight(routes=[]).matches("webui_backend/stats/overview")
@@ -2,7 +2,25 @@
 工具模块
 """
 
-from .message_broadcaster import MessageBroadcaster, get_message_broadcaster
+from .broadcast_transport import (
+    BroadcastTransport,
+    UnixSocketClient,
+    UnixSocketHub,
+    create_transport,
+)
+from .frame_batcher import FrameBatcher
+from .media_store import MediaStore, get_media_store, media_url
+from .message_broadcaster import (
+    MessageBroadcaster,
+    MessageRecord,
+    Subscriber,
+    close_broadcast_transport,
+    configure_broadcast_transport,
+    configure_message_broadcaster,
+    get_message_broadcaster,
+)
+from .message_cursor import decode_cursor, encode_cursor, next_page_cursor
+from .message_filter import FilterIndex, MessageFilter
 from .plugin_schema_service import (
     parse_plugin_schema,
     get_plugin_default_config,
@@ -11,8 +29,26 @@ from .plugin_schema_service import (
 )
 
 __all__ = [
+    "BroadcastTransport",
+    "UnixSocketClient",
+    "UnixSocketHub",
+    "create_transport",
+    "FrameBatcher",
+    "MediaStore",
+    "get_media_store",
+    "media_url",
     "MessageBroadcaster",
+    "MessageRecord",
+    "Subscriber",
+    "close_broadcast_transport",
+    "configure_broadcast_transport",
+    "configure_message_broadcaster",
     "get_message_broadcaster",
+    "decode_cursor",
+    "encode_cursor",
+    "next_page_cursor",
+    "FilterIndex",
+    "MessageFilter",
     "parse_plugin_schema",
     "get_plugin_default_config",
     "infer_input_type",
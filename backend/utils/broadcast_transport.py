@@ -0,0 +1,292 @@
+"""
+消息广播器的跨进程传输
+默认只在本进程内广播；使用 Unix 域套接字传输时，机器人进程作为中心（hub），
+为同一个机器人提供实时聊天接口的 WebUI 工作进程作为客户端连接到中心，
+机器人进程产生的消息会推送到所有工作进程的订阅者
+
+消息只从中心流向客户端：聊天流序号只由中心分配，客户端沿用中心的 JSON 文本和序号，
+不向中心发送任何消息。客户端与中心共享同一个机器人的数据库，历史消息、聊天流列表和发送接口
+在任一进程中都指向同一份数据；不要把另一个机器人进程配置为客户端
+
+线路格式为逐行 JSON（每行一条已编码的消息），JSON 文本中的换行都已转义
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any, Optional
+
+from src.common.logger import get_logger
+
+if TYPE_CHECKING:
+    from .message_broadcaster import Frame
+
+logger = get_logger("WebUI.BroadcastTransport")
+
+TRANSPORT_LOCAL = "local"
+TRANSPORT_UNIX = "unix"
+
+ROLE_HUB = "hub"
+ROLE_CLIENT = "client"
+
+# 默认的中心套接字路径
+DEFAULT_SOCKET_PATH = os.path.join(tempfile.gettempdir(), "mofox-webui-live-chat.sock")
+
+# 单条消息（一行）的最大长度
+MAX_LINE_SIZE = 4 * 1024 * 1024
+
+# 单个对端未发送数据的上限，超出时断开该对端，避免慢进程拖累中心的内存
+MAX_PEER_BUFFER = 8 * 1024 * 1024
+
+# 客户端重连的退避上限（秒）
+MAX_RECONNECT_DELAY = 10.0
+
+# 收到其他进程消息时的回调，参数为一行 JSON 文本
+FrameCallback = Callable[[str], None]
+
+
+class BroadcastTransport:
+    """进程内传输（默认），不与其他进程通信"""
+
+    name = TRANSPORT_LOCAL
+    # 是否需要把消息发布到其他进程
+    remote = False
+    # 本进程是否负责分配聊天流序号；为 False 时只转发中心编好号的消息
+    assigns_seq = True
+
+    async def start(self, on_frame: FrameCallback) -> None:
+        """
+        开始接收其他进程发布的消息
+
+        Raises:
+            OSError, RuntimeError: 无法启动（例如套接字路径已被占用）
+        """
+
+    def publish(self, frame: "Frame") -> bool:
+        """
+        把消息发布到其他进程，不阻塞
+
+        Returns:
+            是否已写出；未连接或积压过多时为 False
+        """
+        return False
+
+    async def close(self) -> None:
+        """关闭传输"""
+
+    def get_stats(self) -> dict[str, Any]:
+        return {"transport": self.name}
+
+
+class UnixSocketHub(BroadcastTransport):
+    """
+    Unix 域套接字中心，运行在 transport_role = "hub" 的机器人进程中
+
+    广播器编号后的消息通过 publish 写给所有客户端；客户端只接收，中心不读取它们发来的数据。
+    写入不等待对端读取，对端积压超过上限时断开，由对端自动重连
+    """
+
+    name = "unix_hub"
+    remote = True
+
+    def __init__(self, path: str = DEFAULT_SOCKET_PATH, max_peer_buffer: int = MAX_PEER_BUFFER):
+        self.path = path
+        self.max_peer_buffer = max_peer_buffer
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._peers: set[asyncio.StreamWriter] = set()
+
+        self.published = 0
+        self.dropped_peers = 0
+
+    async def start(self, on_frame: FrameCallback) -> None:
+        if os.path.exists(self.path):
+            if await self._hub_alive():
+                raise RuntimeError(f"套接字 {self.path} 已被另一个运行中的实时消息中心占用")
+            # 上次运行遗留的套接字文件
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle_peer, path=self.path, limit=MAX_LINE_SIZE)
+        os.chmod(self.path, 0o600)
+        logger.info(f"实时消息中心已启动: {self.path}")
+
+    async def _hub_alive(self) -> bool:
+        """套接字文件上是否有正在监听的中心"""
+        try:
+            _, writer = await asyncio.open_unix_connection(self.path)
+        except OSError:
+            return False
+        writer.close()
+        return True
+
+    async def _handle_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._peers.add(writer)
+        logger.debug(f"实时消息工作进程已连接，当前 {len(self._peers)} 个")
+        try:
+            # 客户端不发送数据，读到 EOF 表示对端断开
+            while await reader.read(4096):
+                pass
+        except ConnectionError as e:
+            logger.debug(f"实时消息工作进程连接中断: {e}")
+        finally:
+            self._drop_peer(writer)
+
+    def _drop_peer(self, writer: asyncio.StreamWriter) -> None:
+        if writer in self._peers:
+            self._peers.discard(writer)
+            writer.close()
+
+    def _fanout(self, data: bytes) -> None:
+        for writer in list(self._peers):
+            if writer.is_closing():
+                self._drop_peer(writer)
+                continue
+            if writer.transport.get_write_buffer_size() > self.max_peer_buffer:
+                logger.warning("实时消息工作进程接收过慢，断开连接")
+                self.dropped_peers += 1
+                self._drop_peer(writer)
+                continue
+            writer.write(data)
+
+    def publish(self, frame: "Frame") -> bool:
+        if not self._peers:
+            return False
+        self.published += 1
+        self._fanout(frame.text.encode("utf-8") + b"\n")
+        return True
+
+    async def close(self) -> None:
+        if self._server is None:
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        self._server = None
+        for writer in list(self._peers):
+            self._drop_peer(writer)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            "transport": self.name,
+            "path": self.path,
+            "peers": len(self._peers),
+            "published": self.published,
+            "dropped_peers": self.dropped_peers,
+        }
+
+
+class UnixSocketClient(BroadcastTransport):
+    """
+    连接到 Unix 域套接字中心的客户端，运行在 transport_role = "client" 的 WebUI 工作进程中
+
+    只接收中心编好号的消息，不向中心发送；中心不可用时按退避间隔重连
+    """
+
+    name = "unix_client"
+    assigns_seq = False
+
+    def __init__(self, path: str = DEFAULT_SOCKET_PATH):
+        self.path = path
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+        self._on_frame: Optional[FrameCallback] = None
+
+        self.connected = False
+        self.reconnects = 0
+        self.received = 0
+
+    async def start(self, on_frame: FrameCallback) -> None:
+        self._on_frame = on_frame
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        delay = 0.5
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path, limit=MAX_LINE_SIZE)
+            except OSError as e:
+                logger.debug(f"连接实时消息中心失败: {e}，{delay:.1f} 秒后重试")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+                continue
+
+            self._writer = writer
+            self.connected = True
+            delay = 0.5
+            logger.info(f"已连接实时消息中心: {self.path}")
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    if not line.endswith(b"\n"):
+                        continue
+                    self.received += 1
+                    if self._on_frame is not None:
+                        self._on_frame(line[:-1].decode("utf-8"))
+            except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+                logger.debug(f"实时消息中心连接中断: {e}")
+            finally:
+                self.connected = False
+                self._writer = None
+                writer.close()
+
+            self.reconnects += 1
+            logger.warning("与实时消息中心的连接已断开，正在重连")
+            await asyncio.sleep(delay)
+
+    async def close(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            "transport": self.name,
+            "path": self.path,
+            "connected": self.connected,
+            "reconnects": self.reconnects,
+            "received": self.received,
+        }
+
+
+def create_transport(
+    transport: str = TRANSPORT_LOCAL,
+    role: str = ROLE_HUB,
+    socket_path: str = "",
+) -> BroadcastTransport:
+    """
+    按配置创建传输
+
+    Args:
+        transport: local 只在本进程内广播；unix 通过 Unix 域套接字在进程间转发
+        role: hub 为中心（机器人进程），client 为连接中心的 WebUI 工作进程
+        socket_path: 套接字路径，留空使用临时目录下的默认路径
+
+    Returns:
+        传输实例，当前平台不支持时退回进程内传输
+    """
+    if transport == TRANSPORT_LOCAL:
+        return BroadcastTransport()
+    if transport != TRANSPORT_UNIX:
+        logger.warning(f"未知的实时消息传输 {transport}，只在本进程内广播")
+        return BroadcastTransport()
+    if sys.platform == "win32" or not hasattr(asyncio, "start_unix_server"):
+        logger.warning("当前平台不支持 Unix 域套接字，实时消息只在本进程内广播")
+        return BroadcastTransport()
+
+    path = socket_path or DEFAULT_SOCKET_PATH
+    if role == ROLE_CLIENT:
+        return UnixSocketClient(path)
+    if role != ROLE_HUB:
+        logger.warning(f"未知的实时消息传输角色 {role}，作为中心运行")
+    return UnixSocketHub(path)
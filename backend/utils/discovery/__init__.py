@@ -0,0 +1,117 @@
+"""
+发现服务器工具模块
+提供静态资源预压缩、内存资源包、代理响应缓存与压缩、准入控制、请求合并、WebSocket 多路复用、工作进程守护、主程序实例注册表、熔断器与传输层、Prometheus 指标等功能
+"""
+
+from .circuit_breaker import CircuitBreaker
+from .compression import DEFAULT_COMPRESSIBLE_TYPES, ProxyCompressionMiddleware, StreamCompressor
+from .http_ranges import parse_byte_range
+from .instances import (
+    INSTANCE_HEADER,
+    INSTANCE_QUERY_PARAM,
+    BotInstance,
+    InstanceRegistry,
+)
+from .metrics import (
+    Counter,
+    DiscoveryMetrics,
+    Gauge,
+    Histogram,
+    MetricsRegistry,
+    ProxyMetricsMiddleware,
+    RouteTemplateMatcher,
+)
+from .rate_limiter import (
+    DEFAULT_RATE_LIMITS,
+    AdmissionController,
+    AdmissionMiddleware,
+    RouteLimit,
+)
+from .response_cache import (
+    DEFAULT_ROUTE_TTLS,
+    MUTATING_METHODS,
+    CachedResponse,
+    ProxyResponseCache,
+)
+from .single_flight import DEFAULT_COALESCE_ROUTES, SingleFlight
+from .static_assets import (
+    ASSET_CACHE_CONTROL,
+    REVALIDATE_CACHE_CONTROL,
+    cache_control_for,
+    cached_strong_etag,
+    compute_strong_etag,
+    negotiate_encoding,
+    precompress_static_dir,
+    warm_etag_cache,
+)
+from .static_bundle import (
+    StaticBundle,
+    StaticBundleApp,
+    get_static_bundle,
+    reload_static_bundle,
+)
+from .transport import (
+    UpstreamTransportConfig,
+    create_upstream_session,
+    create_ws_connect,
+)
+from .worker import WorkerSupervisor
+from .ws_multiplexer import (
+    DEFAULT_MULTIPLEX_ROUTES,
+    OVERFLOW_DISCONNECT,
+    OVERFLOW_DROP_OLDEST,
+    ClientChannel,
+    UpstreamChannel,
+    WebSocketMultiplexer,
+)
+
+__all__ = [
+    "CircuitBreaker",
+    "DEFAULT_COMPRESSIBLE_TYPES",
+    "ProxyCompressionMiddleware",
+    "StreamCompressor",
+    "parse_byte_range",
+    "INSTANCE_HEADER",
+    "INSTANCE_QUERY_PARAM",
+    "BotInstance",
+    "InstanceRegistry",
+    "Counter",
+    "DiscoveryMetrics",
+    "Gauge",
+    "Histogram",
+    "MetricsRegistry",
+    "ProxyMetricsMiddleware",
+    "RouteTemplateMatcher",
+    "DEFAULT_RATE_LIMITS",
+    "AdmissionController",
+    "AdmissionMiddleware",
+    "RouteLimit",
+    "DEFAULT_ROUTE_TTLS",
+    "MUTATING_METHODS",
+    "CachedResponse",
+    "ProxyResponseCache",
+    "DEFAULT_COALESCE_ROUTES",
+    "SingleFlight",
+    "ASSET_CACHE_CONTROL",
+    "REVALIDATE_CACHE_CONTROL",
+    "cache_control_for",
+    "cached_strong_etag",
+    "compute_strong_etag",
+    "negotiate_encoding",
+    "precompress_static_dir",
+    "warm_etag_cache",
+    "StaticBundle",
+    "StaticBundleApp",
+    "get_static_bundle",
+    "reload_static_bundle",
+    "DEFAULT_MULTIPLEX_ROUTES",
+    "OVERFLOW_DISCONNECT",
+    "OVERFLOW_DROP_OLDEST",
+    "ClientChannel",
+    "UpstreamChannel",
+    "WebSocketMultiplexer",
+    "UpstreamTransportConfig",
+    "create_upstream_session",
+    "create_ws_connect",
+    "WorkerSupervisor",
+]
@@ -0,0 +1,130 @@
+"""
+主程序熔断器
+连续连接失败达到阈值后熔断，熔断期间代理请求立即返回 503，
+冷却结束后放行单个探测请求（半开），成功则恢复，失败则以倍增的冷却时间再次熔断
+"""
+
+import time
+from typing import Any
+
+from src.common.logger import get_logger
+
+logger = get_logger("WebUI.CircuitBreaker")
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """单个主程序实例的熔断器"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 5.0,
+        max_reset_timeout: float = 60.0,
+    ):
+        """
+        Args:
+            name: 名称，用于日志
+            failure_threshold: 触发熔断的连续失败次数
+            reset_timeout: 首次熔断后的冷却时间（秒）
+            max_reset_timeout: 探测连续失败时冷却时间的上限（秒）
+        """
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max(max_reset_timeout, reset_timeout)
+
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.current_timeout = reset_timeout
+        self.probe_in_flight = False
+        self.rejected = 0
+        self.trips = 0
+
+    def allow_request(self) -> tuple[float, bool]:
+        """
+        请求发出前调用
+
+        Returns:
+            (retry_after, probe)：retry_after 为 0 表示放行，大于 0 表示熔断中，值为建议的重试秒数；
+            probe 为 True 表示该请求占用了半开状态唯一的探测名额，
+            请求结束时必须调用 release_probe()，其他请求不能调用
+        """
+        if self.state == STATE_CLOSED:
+            return 0.0, False
+
+        if self.state == STATE_OPEN:
+            remaining = self.opened_at + self.current_timeout - time.monotonic()
+            if remaining > 0:
+                self.rejected += 1
+                return remaining, False
+            # 冷却结束，放行一个探测请求
+            self.state = STATE_HALF_OPEN
+            self.probe_in_flight = True
+            logger.info(f"熔断器 [{self.name}] 半开，发送探测请求")
+            return 0.0, True
+
+        # 半开状态只允许一个探测请求
+        if self.probe_in_flight:
+            self.rejected += 1
+            return 1.0, False
+        self.probe_in_flight = True
+        return 0.0, True
+
+    def open_remaining(self) -> float:
+        """
+        熔断剩余时间，不改变状态也不占用探测名额
+
+        供 WebSocket 等长连接使用，它们不适合作为探测请求
+        """
+        if self.state != STATE_OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.current_timeout - time.monotonic())
+
+    def record_success(self) -> None:
+        """主程序有响应（任意状态码）"""
+        if self.state != STATE_CLOSED:
+            logger.info(f"熔断器 [{self.name}] 关闭，主程序已恢复")
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.current_timeout = self.reset_timeout
+        self.probe_in_flight = False
+
+    def record_failure(self) -> None:
+        """连接失败或超时"""
+        self.failures += 1
+        if self.state == STATE_HALF_OPEN:
+            self._open(min(self.current_timeout * 2, self.max_reset_timeout))
+        elif self.state == STATE_CLOSED and self.failures >= self.failure_threshold:
+            self._open(self.reset_timeout)
+
+    def release_probe(self) -> None:
+        """
+        探测请求结束时释放探测名额
+
+        只能由 allow_request() 返回 probe=True 的请求调用；探测已得出结论时状态不再是半开，这里不做任何事
+        """
+        if self.state == STATE_HALF_OPEN:
+            self.probe_in_flight = False
+
+    def _open(self, timeout: float) -> None:
+        self.state = STATE_OPEN
+        self.opened_at = time.monotonic()
+        self.current_timeout = timeout
+        self.probe_in_flight = False
+        self.trips += 1
+        logger.warning(f"熔断器 [{self.name}] 打开，{timeout:.1f} 秒内的请求将直接返回 503")
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "retry_after": round(self.open_remaining(), 2),
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
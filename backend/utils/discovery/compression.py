@@ -0,0 +1,265 @@
+"""
+代理响应压缩
+按 Accept-Encoding 对 /plugins/* 的 JSON 等文本响应做 br/gzip 流式压缩，
+主程序已经压缩过的响应原样透传
+"""
+
+import asyncio
+import zlib
+from typing import Optional
+
+from src.common.logger import get_logger
+
+from .static_assets import negotiate_encoding
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，缺失时只使用 gzip
+    brotli = None
+
+logger = get_logger("WebUI.ProxyCompression")
+
+# 默认压缩的内容类型（前缀匹配）
+DEFAULT_COMPRESSIBLE_TYPES: list[str] = [
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+]
+
+# 逐条推送的流不压缩，压缩器的缓冲会推迟消息到达
+INCOMPRESSIBLE_TYPES = ("text/event-stream",)
+
+# 小于该大小（字节）的响应不压缩
+DEFAULT_MIN_SIZE = 1024
+
+# 单块超过该大小时在线程中压缩，避免阻塞事件循环
+THREAD_COMPRESS_THRESHOLD = 256 * 1024
+
+# 可用编码，按服务端偏好排序
+AVAILABLE_ENCODINGS = ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+class StreamCompressor:
+    """增量压缩器，内存占用与响应大小无关"""
+
+    def __init__(self, encoding: str, gzip_level: int = 6, brotli_quality: int = 4):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits=31 输出带 gzip 头部和尾部的数据
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data)
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+class _CompressionResponder:
+    """处理单个响应：判断是否压缩，并在需要时边收边压"""
+
+    def __init__(self, app, middleware: "ProxyCompressionMiddleware", encoding: str):
+        self.app = app
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = None
+        self.start_message: Optional[dict] = None
+        # None: 尚未决定；True: 压缩；False: 透传
+        self.compressing: Optional[bool] = None
+        self.compressor: Optional[StreamCompressor] = None
+        self.pending: list[bytes] = []
+        self.pending_size = 0
+
+    async def __call__(self, scope, receive, send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_wrapper)
+
+    async def send_wrapper(self, message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            self.start_message = message
+            if not self.middleware.should_compress(message):
+                self.compressing = False
+                await self.send(message)
+            return
+
+        if message_type != "http.response.body" or self.compressing is False:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressing is None:
+            self.pending.append(body)
+            self.pending_size += len(body)
+            if self.pending_size < self.middleware.min_size:
+                if more_body:
+                    return
+                # 整个响应都小于阈值，原样发送
+                await self._flush_uncompressed()
+                return
+            if not more_body:
+                # 响应体已完整收到，一次压缩并给出准确的 Content-Length
+                await self._send_compressed_whole()
+                return
+            await self._begin_compression()
+            body = b"".join(self.pending)
+            self.pending.clear()
+
+        data = await self._compress(body)
+        if not more_body:
+            data += self.compressor.finish()
+        if data or not more_body:
+            await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+    async def _flush_uncompressed(self) -> None:
+        self.compressing = False
+        await self.send(self.start_message)
+        await self.send({"type": "http.response.body", "body": b"".join(self.pending), "more_body": False})
+        self.pending.clear()
+
+    def _compressed_headers(self) -> list[tuple[bytes, bytes]]:
+        """去掉 Content-Length，添加 Content-Encoding 和 Vary，强 ETag 改为弱 ETag"""
+        headers = []
+        vary = None
+        for name, value in self.start_message["headers"]:
+            lower = name.lower()
+            if lower == b"content-length":
+                continue
+            if lower == b"vary":
+                vary = value
+                continue
+            if lower == b"etag" and not value.startswith(b"W/"):
+                # 压缩后的内容与原始 ETag 不再逐字节一致
+                value = b"W/" + value
+            headers.append((name, value))
+        headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+        if vary is None:
+            vary = b"Accept-Encoding"
+        elif b"accept-encoding" not in vary.lower():
+            vary = vary + b", Accept-Encoding"
+        headers.append((b"vary", vary))
+        return headers
+
+    def _new_compressor(self) -> StreamCompressor:
+        return StreamCompressor(
+            self.encoding,
+            gzip_level=self.middleware.gzip_level,
+            brotli_quality=self.middleware.brotli_quality,
+        )
+
+    async def _send_compressed_whole(self) -> None:
+        self.compressing = True
+        self.compressor = self._new_compressor()
+        body = await self._compress(b"".join(self.pending)) + self.compressor.finish()
+        self.pending.clear()
+        headers = self._compressed_headers()
+        headers.append((b"content-length", str(len(body)).encode("latin-1")))
+        await self.send({**self.start_message, "headers": headers})
+        await self.send({"type": "http.response.body", "body": body, "more_body": False})
+
+    async def _begin_compression(self) -> None:
+        """响应体超过阈值但尚未结束，转为逐块压缩，使用分块编码发送"""
+        self.compressing = True
+        self.compressor = self._new_compressor()
+        await self.send({**self.start_message, "headers": self._compressed_headers()})
+
+    async def _compress(self, data: bytes) -> bytes:
+        if not data:
+            return b""
+        if len(data) >= THREAD_COMPRESS_THRESHOLD:
+            return await asyncio.to_thread(self.compressor.compress, data)
+        return self.compressor.compress(data)
+
+
+class ProxyCompressionMiddleware:
+    """
+    ASGI 中间件，压缩代理响应
+
+    - 只处理客户端声明支持 br/gzip 的请求
+    - 响应已带 Content-Encoding、内容类型不在白名单或小于阈值时原样透传
+    - 流式响应逐块压缩，不缓存完整响应体
+    """
+
+    def __init__(
+        self,
+        app,
+        min_size: int = DEFAULT_MIN_SIZE,
+        content_types: Optional[list[str]] = None,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        prefix: str = "/plugins/",
+    ):
+        """
+        Args:
+            app: 下游 ASGI 应用
+            min_size: 最小压缩大小（字节）
+            content_types: 可压缩的内容类型前缀，None 使用默认列表
+            gzip_level: gzip 压缩级别（1-9）
+            brotli_quality: brotli 压缩质量（0-11），动态压缩宜取较低值
+            prefix: 需要压缩的路径前缀
+        """
+        self.app = app
+        self.min_size = min_size
+        types = DEFAULT_COMPRESSIBLE_TYPES if content_types is None else content_types
+        self.content_types = tuple(t.lower() for t in types)
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] == "HEAD"
+            or not scope["path"].startswith(self.prefix)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+
+        encoding = negotiate_encoding(accept_encoding, AVAILABLE_ENCODINGS)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await _CompressionResponder(self.app, self, encoding)(scope, receive, send)
+
+    def should_compress(self, start_message: dict) -> bool:
+        """根据状态码和响应头判断是否可能需要压缩（大小在收到响应体后再判断）"""
+        status = start_message["status"]
+        if status < 200 or status in (204, 206, 304):
+            return False
+
+        content_type = b""
+        for name, value in start_message["headers"]:
+            lower = name.lower()
+            if lower == b"content-encoding":
+                # 主程序已经压缩过
+                return False
+            if lower == b"content-type":
+                content_type = value
+            elif lower == b"content-length":
+                try:
+                    if int(value) < self.min_size:
+                        return False
+                except ValueError:
+                    return False
+
+        media_type = content_type.decode("latin-1").split(";", 1)[0].strip().lower()
+        if not media_type or media_type.startswith(INCOMPRESSIBLE_TYPES):
+            return False
+        return media_type.startswith(self.content_types)
@@ -0,0 +1,52 @@
+"""
+HTTP Range 请求解析
+静态资源包和媒体文件接口共用，只支持单段字节范围
+"""
+
+from typing import Optional
+
+
+def parse_byte_range(header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """
+    解析单个字节范围的 Range 请求头
+
+    Args:
+        header: Range 请求头
+        size: 文件大小
+
+    Returns:
+        (起始, 结束) 闭区间；没有 Range、格式不支持或多段范围时返回 None（返回完整内容）
+
+    Raises:
+        ValueError: 范围无法满足，应返回 416
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start_text, sep, end_text = spec.strip().partition("-")
+    start_text, end_text = start_text.strip(), end_text.strip()
+    if (
+        not sep
+        or not (start_text or end_text)
+        or (start_text and not start_text.isdigit())
+        or (end_text and not end_text.isdigit())
+    ):
+        return None
+
+    if not start_text:
+        # 后缀范围：最后 N 个字节
+        length = int(end_text)
+        if length == 0 or size == 0:
+            raise ValueError("范围超出文件大小")
+        return max(0, size - length), size - 1
+
+    start = int(start_text)
+    end = int(end_text) if end_text else size - 1
+    if end_text and start > end:
+        # 结束位置小于起始位置的范围无效，按 RFC 7233 忽略
+        return None
+    if start >= size:
+        raise ValueError("范围超出文件大小")
+    return start, min(end, size - 1)
@@ -0,0 +1,321 @@
+"""
+主程序实例注册表
+一个发现服务器可以代理多个机器人实例，每个实例有独立的连接池、健康检查和延迟统计，
+前端通过 X-Bot-Instance 头部或 bot_instance 查询参数选择实例；
+未指定实例的请求默认转发到默认实例，多个实例为同一数据的副本时可以改为按负载选择
+"""
+
+import asyncio
+import time
+from typing import Any, Optional
+
+import aiohttp
+
+from src.common.logger import get_logger
+
+from .circuit_breaker import CircuitBreaker
+from .transport import UpstreamTransportConfig, create_upstream_session, create_ws_connect
+
+logger = get_logger("WebUI.BotInstances")
+
+# 选择实例的请求头和查询参数，转发前会被移除
+INSTANCE_HEADER = "x-bot-instance"
+INSTANCE_QUERY_PARAM = "bot_instance"
+
+# 本机实例的默认 ID
+DEFAULT_INSTANCE_ID = "main"
+
+# 延迟指数滑动平均的权重
+LATENCY_EWMA_ALPHA = 0.2
+
+STATUS_UNKNOWN = "unknown"
+STATUS_UP = "up"
+STATUS_DOWN = "down"
+
+# 未指定实例时的选择策略
+ROUTING_DEFAULT = "default"
+ROUTING_LEAST_IN_FLIGHT = "least_in_flight"
+ROUTING_STRATEGIES = (ROUTING_DEFAULT, ROUTING_LEAST_IN_FLIGHT)
+
+
+class BotInstance:
+    """一个主程序实例"""
+
+    def __init__(
+        self,
+        instance_id: str,
+        host: str,
+        port: int,
+        transport_config: UpstreamTransportConfig,
+        name: str = "",
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.id = instance_id
+        self.name = name or instance_id
+        self.host = host
+        self.port = port
+        self.transport_config = transport_config
+        self.base_url = f"http://{host}:{port}"
+        self.ws_base_url = f"ws://{host}:{port}"
+        self.ws_connect = create_ws_connect(transport_config)
+        self._session: Optional[aiohttp.ClientSession] = None
+        # 熔断器，None 表示不熔断
+        self.breaker = breaker
+
+        self.status = STATUS_UNKNOWN
+        self.latency_ms: Optional[float] = None
+        self.last_check: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.consecutive_failures = 0
+        self.in_flight = 0
+        self.requests = 0
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """实例专用的 HTTP 客户端，首次使用时创建（需要在事件循环中）"""
+        if self._session is None or self._session.closed:
+            self._session = create_upstream_session(self.transport_config)
+        return self._session
+
+    @property
+    def available(self) -> bool:
+        """实例未被判定为不可用且未处于熔断中"""
+        if self.status == STATUS_DOWN:
+            return False
+        return self.breaker is None or self.breaker.open_remaining() <= 0
+
+    def record_success(self, elapsed: float) -> None:
+        """记录一次成功的代理请求，同时计入熔断器"""
+        self._mark_up(elapsed)
+        if self.breaker is not None:
+            self.breaker.record_success()
+
+    def record_failure(self, error: BaseException) -> None:
+        """记录一次连接失败的代理请求，同时计入熔断器"""
+        self._mark_down(error)
+        if self.breaker is not None:
+            self.breaker.record_failure()
+
+    def _mark_up(self, elapsed: float) -> None:
+        """更新在线状态和延迟"""
+        latency_ms = elapsed * 1000
+        if self.latency_ms is None:
+            self.latency_ms = latency_ms
+        else:
+            self.latency_ms += LATENCY_EWMA_ALPHA * (latency_ms - self.latency_ms)
+        if self.status != STATUS_UP:
+            logger.info(f"主程序实例 {self.id} 可用")
+        self.status = STATUS_UP
+        self.consecutive_failures = 0
+        self.last_error = None
+
+    def _mark_down(self, error: BaseException) -> None:
+        """更新为不可用状态"""
+        self.consecutive_failures += 1
+        self.last_error = str(error) or type(error).__name__
+        if self.status != STATUS_DOWN:
+            logger.warning(f"主程序实例 {self.id} 不可用: {self.last_error}")
+        self.status = STATUS_DOWN
+
+    async def check(self, timeout: float = 5.0) -> None:
+        """
+        健康检查
+
+        能收到任意 HTTP 响应即视为实例在线，只有连接失败或超时才算不可用；
+        结果只更新实例状态和延迟，不计入熔断器，熔断器只根据实际的代理请求开合
+        """
+        start = time.perf_counter()
+        try:
+            async with self.session.get(
+                f"{self.base_url}/",
+                headers={"Accept-Encoding": "identity"},
+                timeout=aiohttp.ClientTimeout(total=timeout),
+                allow_redirects=False,
+            ):
+                pass
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self._mark_down(e)
+        else:
+            self._mark_up(time.perf_counter() - start)
+        finally:
+            self.last_check = time.time()
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "host": self.host,
+            "port": self.port,
+            "transport": self.transport_config.transport_name,
+            "status": self.status,
+            "latency_ms": round(self.latency_ms, 2) if self.latency_ms is not None else None,
+            "last_check": self.last_check,
+            "last_error": self.last_error,
+            "consecutive_failures": self.consecutive_failures,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "circuit": self.breaker.get_stats() if self.breaker is not None else None,
+        }
+
+
+def _load_key(instance: BotInstance) -> tuple[int, float]:
+    latency = instance.latency_ms if instance.latency_ms is not None else float("inf")
+    return instance.in_flight, latency
+
+
+class InstanceRegistry:
+    """主程序实例注册表"""
+
+    def __init__(
+        self,
+        instances: list[BotInstance],
+        default_id: str,
+        check_interval: float = 10.0,
+        routing: str = ROUTING_DEFAULT,
+    ):
+        """
+        Args:
+            instances: 实例列表，ID 不能重复
+            default_id: 默认实例 ID
+            check_interval: 健康检查间隔（秒），0 表示不做周期检查
+            routing: 请求未指定实例时的选择策略：default 总是使用默认实例；
+                least_in_flight 在可用实例中选择进行中请求最少的（相同时选延迟低的），
+                只适用于各实例提供相同数据的部署
+        """
+        self.instances: dict[str, BotInstance] = {}
+        for instance in instances:
+            if instance.id in self.instances:
+                logger.warning(f"主程序实例 ID 重复，忽略: {instance.id}")
+                continue
+            self.instances[instance.id] = instance
+        self.default_id = default_id
+        self.check_interval = check_interval
+        if routing not in ROUTING_STRATEGIES:
+            logger.warning(f"未知的主程序实例选择策略 {routing}，使用 {ROUTING_DEFAULT}")
+            routing = ROUTING_DEFAULT
+        self.routing = routing
+
+    @classmethod
+    def from_discovery_config(
+        cls,
+        main_host: str,
+        main_port: int,
+        discovery_config: dict[str, Any],
+    ) -> "InstanceRegistry":
+        """
+        从插件 discovery 配置段创建注册表
+
+        本机主程序总是第一个实例，instances 中的条目为额外实例：
+        {"id": "bot-2", "host": "127.0.0.1", "port": 8001, "uds": "", "name": ""}
+        """
+        base_config = UpstreamTransportConfig.from_discovery_config(discovery_config)
+        default_id = str(discovery_config.get("instance_id") or DEFAULT_INSTANCE_ID)
+
+        def make_breaker(instance_id: str) -> Optional[CircuitBreaker]:
+            if not discovery_config.get("circuit_breaker", True):
+                return None
+            return CircuitBreaker(
+                instance_id,
+                failure_threshold=int(discovery_config.get("circuit_failure_threshold", 5)),
+                reset_timeout=float(discovery_config.get("circuit_reset_timeout", 5.0)),
+                max_reset_timeout=float(discovery_config.get("circuit_max_reset_timeout", 60.0)),
+            )
+
+        instances = [
+            BotInstance(
+                default_id,
+                main_host,
+                main_port,
+                base_config,
+                name=str(discovery_config.get("instance_name") or ""),
+                breaker=make_breaker(default_id),
+            )
+        ]
+
+        for entry in discovery_config.get("instances") or []:
+            try:
+                transport_config = UpstreamTransportConfig.from_discovery_config(
+                    {**discovery_config, "main_server_uds": entry.get("uds", "")}
+                )
+                instances.append(
+                    BotInstance(
+                        str(entry["id"]),
+                        str(entry.get("host", "127.0.0.1")),
+                        int(entry["port"]),
+                        transport_config,
+                        name=str(entry.get("name", "")),
+                        breaker=make_breaker(str(entry["id"])),
+                    )
+                )
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"主程序实例配置无效，已忽略: {entry} ({e})")
+
+        return cls(
+            instances,
+            default_id,
+            check_interval=float(discovery_config.get("instance_check_interval", 10.0)),
+            routing=str(discovery_config.get("instance_routing") or ROUTING_DEFAULT),
+        )
+
+    @property
+    def default(self) -> BotInstance:
+        return self.instances[self.default_id]
+
+    def resolve(self, instance_id: Optional[str]) -> Optional[BotInstance]:
+        """
+        按 ID 查找实例
+
+        Args:
+            instance_id: 实例 ID，为空时按选择策略挑选实例
+
+        Returns:
+            实例，不存在时返回 None
+        """
+        if not instance_id:
+            return self.select()
+        return self.instances.get(instance_id)
+
+    def select(self) -> BotInstance:
+        """
+        为未指定实例的请求挑选实例
+
+        least_in_flight 策略下比较所有可用实例的进行中请求数，延迟未知的实例排在同负载实例之后；
+        没有可用实例时返回默认实例，由调用方按熔断或连接失败处理
+        """
+        if self.routing != ROUTING_LEAST_IN_FLIGHT or len(self.instances) == 1:
+            return self.default
+        best: Optional[BotInstance] = None
+        for instance in self.instances.values():
+            if not instance.available:
+                continue
+            if best is None or _load_key(instance) < _load_key(best):
+                best = instance
+        return best if best is not None else self.default
+
+    async def check_all(self) -> None:
+        """并发检查所有实例"""
+        await asyncio.gather(*(instance.check() for instance in self.instances.values()))
+
+    async def run_health_checks(self) -> None:
+        """周期性健康检查，直到任务被取消"""
+        if self.check_interval <= 0:
+            return
+        while True:
+            try:
+                await self.check_all()
+            except Exception as e:
+                logger.debug(f"主程序实例健康检查出错: {e}")
+            await asyncio.sleep(self.check_interval)
+
+    async def close(self) -> None:
+        await asyncio.gather(*(instance.close() for instance in self.instances.values()))
+
+    def to_list(self) -> list[dict[str, Any]]:
+        return [
+            {**instance.to_dict(), "default": instance.id == self.default_id}
+            for instance in self.instances.values()
+        ]
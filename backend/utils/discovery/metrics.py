@@ -0,0 +1,338 @@
+"""
+发现服务器指标
+按路由模板统计代理请求数、进行中请求数、状态码和延迟直方图，
+以及 WebSocket 连接和帧计数，以 Prometheus 文本格式导出
+"""
+
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from src.common.logger import get_logger
+
+logger = get_logger("WebUI.DiscoveryMetrics")
+
+# 默认延迟直方图分桶（秒）
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 路由模板刷新间隔（秒），插件热加载后新路由会在下次刷新时被识别
+ROUTE_REFRESH_INTERVAL = 300.0
+
+LabelValues = tuple[str, ...]
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    parts = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """指标基类"""
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+
+    def header(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+
+    def render(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()):
+        super().__init__(name, documentation, label_names)
+        self.values: dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = self.header()
+        for labels, value in self.values.items():
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """可增可减的仪表"""
+
+    metric_type = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float) -> None:
+        self.values[labels] = value
+
+
+class Histogram(_Metric):
+    """累积分桶直方图"""
+
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...] = (),
+        buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [各分桶计数..., 总数, 总和]
+        self.values: dict[LabelValues, list[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        data = self.values.get(labels)
+        if data is None:
+            data = [0.0] * (len(self.buckets) + 2)
+            self.values[labels] = data
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                data[i] += 1
+                break
+        data[-2] += 1
+        data[-1] += value
+
+    def render(self) -> list[str]:
+        lines = self.header()
+        for labels, data in self.values.items():
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, data):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {_format_value(cumulative)}"
+                )
+            inf = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, inf)} {_format_value(data[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {_format_value(data[-2])}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(data[-1])}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表，collectors 在每次导出时调用，用于采集其他组件的计数"""
+
+    def __init__(self):
+        self.metrics: list[_Metric] = []
+        self.collectors: list[Callable[[], Iterable[_Metric]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[_Metric]]) -> None:
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        """生成 Prometheus 文本格式"""
+        lines: list[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            try:
+                for metric in collector():
+                    lines.extend(metric.render())
+            except Exception as e:
+                logger.debug(f"采集指标失败: {e}")
+        return "\n".join(lines) + "\n"
+
+
+class RouteTemplateMatcher:
+    """
+    将实际请求路径归并为路由模板
+
+    模板来自主程序的 OpenAPI 文档，例如
+    /plugins/webui_backend/plugin_manager/plugins/foo/enable
+    -> /plugins/webui_backend/plugin_manager/plugins/{plugin_name}/enable。
+    无法匹配的路径归并为 /plugins/{插件}/{组件}/*，避免标签基数失控。
+    """
+
+    def __init__(self, cache_size: int = 4096):
+        self._patterns: list[tuple[re.Pattern, str]] = []
+        self._cache: OrderedDict[str, str] = OrderedDict()
+        self._cache_size = cache_size
+        self.loaded = False
+
+    def load(self, templates: Iterable[str]) -> None:
+        """载入路由模板，字面段越多的模板越优先"""
+        compiled = []
+        for template in templates:
+            if not template.startswith("/plugins/"):
+                continue
+            regex = re.sub(r"\\\{[^/]+?:path\\\}", ".+", re.escape(template))
+            regex = re.sub(r"\\\{[^/]+?\\\}", "[^/]+", regex)
+            literal_segments = sum(1 for seg in template.split("/") if seg and not seg.startswith("{"))
+            compiled.append((literal_segments, re.compile(f"^{regex}$"), template))
+
+        compiled.sort(key=lambda item: item[0], reverse=True)
+        self._patterns = [(pattern, template) for _, pattern, template in compiled]
+        self._cache.clear()
+        self.loaded = True
+
+    def match(self, path: str) -> str:
+        """
+        返回路径对应的路由模板
+
+        Args:
+            path: 完整请求路径，如 /plugins/webui_backend/stats/overview
+        """
+        template = self._cache.get(path)
+        if template is not None:
+            self._cache.move_to_end(path)
+            return template
+
+        template = self._fallback(path)
+        for pattern, candidate in self._patterns:
+            if pattern.match(path):
+                template = candidate
+                break
+
+        self._cache[path] = template
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return template
+
+    @staticmethod
+    def _fallback(path: str) -> str:
+        parts = path.strip("/").split("/")
+        if len(parts) <= 3:
+            return "/" + "/".join(parts[:3])
+        return "/" + "/".join(parts[:3]) + "/*"
+
+    async def refresh_forever(self, fetch_templates: Callable[[], Any]) -> None:
+        """
+        周期性刷新路由模板
+
+        Args:
+            fetch_templates: 返回模板列表的协程函数
+        """
+        while True:
+            try:
+                templates = await fetch_templates()
+                self.load(templates)
+                logger.debug(f"已载入 {len(self._patterns)} 个代理路由模板")
+            except Exception as e:
+                logger.debug(f"获取主程序路由模板失败: {e}")
+            await asyncio.sleep(ROUTE_REFRESH_INTERVAL if self.loaded else 30.0)
+
+
+class DiscoveryMetrics:
+    """发现服务器的全部指标"""
+
+    def __init__(self):
+        self.registry = MetricsRegistry()
+        self.routes = RouteTemplateMatcher()
+
+        self.requests = self.registry.register(
+            Counter("webui_proxy_requests_total", "代理请求总数", ("route", "method", "status"))
+        )
+        self.in_flight = self.registry.register(
+            Gauge("webui_proxy_requests_in_flight", "进行中的代理请求数", ("route",))
+        )
+        self.latency = self.registry.register(
+            Histogram(
+                "webui_proxy_request_duration_seconds",
+                "代理请求从收到到响应体发送完毕的耗时",
+                ("route", "method"),
+            )
+        )
+        self.ws_connections = self.registry.register(
+            Counter("webui_ws_connections_total", "WebSocket 代理连接总数", ("route",))
+        )
+        self.ws_active = self.registry.register(
+            Gauge("webui_ws_connections_active", "当前 WebSocket 代理连接数", ("route",))
+        )
+        self.ws_frames = self.registry.register(
+            Counter("webui_ws_frames_total", "WebSocket 代理转发的帧数", ("route", "direction"))
+        )
+
+    def set_ws_frames(self, totals: dict[str, dict[str, int]]) -> None:
+        """用 WebSocketMultiplexer.frame_totals() 的结果更新帧计数"""
+        values: dict[LabelValues, float] = {}
+        for route, counts in totals.items():
+            values[(route, "to_client")] = counts["sent"]
+            values[(route, "to_server")] = counts["received"]
+            values[(route, "dropped")] = counts["dropped"]
+        self.ws_frames.values = values
+
+    def render(self) -> str:
+        return self.registry.render()
+
+
+class ProxyMetricsMiddleware:
+    """
+    ASGI 中间件，统计 /plugins/* 代理请求
+
+    延迟计算到最后一个响应体块发出为止，流式响应也包含完整传输时间
+    """
+
+    def __init__(self, app, metrics: DiscoveryMetrics, prefix: str = "/plugins/"):
+        self.app = app
+        self.metrics = metrics
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        metrics = self.metrics
+        route = metrics.routes.match(scope["path"])
+        method = scope["method"]
+        status = "500"
+        recorded = False
+        start = time.perf_counter()
+
+        def record() -> None:
+            nonlocal recorded
+            if recorded:
+                return
+            recorded = True
+            metrics.in_flight.dec(route)
+            metrics.requests.inc(route, method, status)
+            metrics.latency.observe(time.perf_counter() - start, route, method)
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                record()
+
+        metrics.in_flight.inc(route)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            record()
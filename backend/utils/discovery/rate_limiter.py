@@ -0,0 +1,271 @@
+"""
+代理准入控制
+按 API Key 和路由分组执行令牌桶限速与并发上限，超限请求立即返回 429，
+避免单个脚本或页面把主程序压垮
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import time
+from typing import Any, Optional
+
+from src.common.logger import get_logger
+
+logger = get_logger("WebUI.AdmissionControl")
+
+# 未匹配任何路由前缀时使用的分组名
+DEFAULT_GROUP = "default"
+
+# 默认限额：路由前缀（相对于 /plugins/）-> 参数
+# 取值足够宽松，正常的仪表盘轮询和边输入边搜索日志不会触发，只挡住失控的脚本
+DEFAULT_RATE_LIMITS: dict[str, dict[str, float]] = {
+    DEFAULT_GROUP: {"rate": 50.0, "burst": 200, "max_concurrency": 32, "max_wait": 5.0},
+    "webui_backend/log_viewer/search": {"rate": 5.0, "burst": 30, "max_concurrency": 4, "max_wait": 5.0},
+    "webui_backend/log_viewer/stats": {"rate": 2.0, "burst": 10, "max_concurrency": 2, "max_wait": 5.0},
+}
+
+# 空闲超过该时长（秒）的限额状态会被清理
+IDLE_STATE_TTL = 600.0
+# 状态条目超过该数量时触发清理
+PRUNE_THRESHOLD = 4096
+
+
+class RouteLimit:
+    """单个路由分组的限额参数"""
+
+    __slots__ = ("group", "rate", "burst", "max_concurrency", "max_wait")
+
+    def __init__(self, group: str, rate: float, burst: float, max_concurrency: int, max_wait: float):
+        """
+        Args:
+            group: 分组名（路由前缀）
+            rate: 每秒补充的令牌数，0 表示不限速
+            burst: 令牌桶容量
+            max_concurrency: 同一 API Key 在该分组内的最大并发数，0 表示不限制
+            max_wait: 并发已满时最多排队等待的秒数，0 表示不排队
+        """
+        self.group = group
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+
+
+class _LimitState:
+    """某个 (API Key, 分组) 的运行状态"""
+
+    __slots__ = ("tokens", "updated", "active", "released", "last_used")
+
+    def __init__(self, burst: float):
+        now = time.monotonic()
+        self.tokens = burst
+        self.updated = now
+        self.active = 0
+        self.released: Optional[asyncio.Event] = None
+        self.last_used = now
+
+
+class AdmissionController:
+    """令牌桶 + 并发上限的准入控制"""
+
+    def __init__(self, limits: Optional[dict[str, dict[str, Any]]] = None):
+        """
+        Args:
+            limits: 路由前缀 -> {"rate", "burst", "max_concurrency", "max_wait"}，
+                "default" 为未匹配路由的限额；None 使用默认配置
+        """
+        limits = DEFAULT_RATE_LIMITS if limits is None else limits
+        self.default_limit: Optional[RouteLimit] = None
+        route_limits: list[RouteLimit] = []
+        for prefix, params in limits.items():
+            limit = RouteLimit(
+                group=prefix.strip("/"),
+                rate=float(params.get("rate", 0)),
+                burst=float(params.get("burst", params.get("rate", 1))),
+                max_concurrency=int(params.get("max_concurrency", 0)),
+                max_wait=float(params.get("max_wait", 0)),
+            )
+            if prefix == DEFAULT_GROUP:
+                self.default_limit = limit
+            else:
+                route_limits.append(limit)
+        # 最长前缀优先匹配
+        self.route_limits = sorted(route_limits, key=lambda limit: len(limit.group), reverse=True)
+
+        self._states: dict[tuple[str, str], _LimitState] = {}
+        # (分组, 原因) -> 次数
+        self.rejected: dict[tuple[str, str], int] = {}
+        # 分组 -> 排队次数
+        self.queued: dict[str, int] = {}
+
+    def limit_for(self, path: str) -> Optional[RouteLimit]:
+        """返回路径适用的限额，未配置时返回 None"""
+        path = path.strip("/")
+        for limit in self.route_limits:
+            if path.startswith(limit.group):
+                return limit
+        return self.default_limit
+
+    def _state(self, key: str, limit: RouteLimit) -> _LimitState:
+        state_key = (key, limit.group)
+        state = self._states.get(state_key)
+        if state is None:
+            if len(self._states) > PRUNE_THRESHOLD:
+                self._prune()
+            state = _LimitState(limit.burst)
+            self._states[state_key] = state
+        state.last_used = time.monotonic()
+        return state
+
+    def _prune(self) -> None:
+        cutoff = time.monotonic() - IDLE_STATE_TTL
+        for state_key in [k for k, s in self._states.items() if s.active == 0 and s.last_used < cutoff]:
+            del self._states[state_key]
+
+    def _reject(self, limit: RouteLimit, reason: str) -> None:
+        counter_key = (limit.group, reason)
+        self.rejected[counter_key] = self.rejected.get(counter_key, 0) + 1
+        logger.debug(f"代理请求被准入控制拒绝 [{limit.group}]: {reason}")
+
+    async def acquire(
+        self, api_key: Optional[str], path: str, client: Optional[str] = None
+    ) -> tuple[Optional[_LimitState], float]:
+        """
+        申请准入
+
+        先检查并发上限（必要时排队），再消耗令牌，因并发被拒绝的请求不占用限速额度
+
+        Args:
+            api_key: 请求携带的 API Key
+            path: 相对于 /plugins/ 的路径
+            client: 客户端地址，没有 API Key 的请求按地址分别计数
+
+        Returns:
+            (状态, 0) 表示准入，调用方完成后必须 release(状态)；
+            (None, 0) 表示该路径无限额；
+            (None, retry_after) 表示拒绝，retry_after 为建议的重试秒数
+        """
+        limit = self.limit_for(path)
+        if limit is None:
+            return None, 0.0
+
+        if api_key:
+            key = hashlib.sha256(api_key.encode()).hexdigest()[:16]
+        else:
+            key = f"anonymous:{client or 'unknown'}"
+        state = self._state(key, limit)
+
+        # 并发上限
+        if limit.max_concurrency > 0 and state.active >= limit.max_concurrency:
+            if limit.max_wait <= 0:
+                self._reject(limit, "concurrency")
+                return None, 1.0
+
+            self.queued[limit.group] = self.queued.get(limit.group, 0) + 1
+            deadline = time.monotonic() + limit.max_wait
+            while state.active >= limit.max_concurrency:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._reject(limit, "concurrency")
+                    return None, 1.0
+                if state.released is None:
+                    state.released = asyncio.Event()
+                event = state.released
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    pass
+
+        # 令牌桶，拿到并发名额之后才扣除
+        if limit.rate > 0:
+            now = time.monotonic()
+            state.tokens = min(limit.burst, state.tokens + (now - state.updated) * limit.rate)
+            state.updated = now
+            if state.tokens < 1.0:
+                self._reject(limit, "rate")
+                return None, (1.0 - state.tokens) / limit.rate
+            state.tokens -= 1.0
+
+        state.active += 1
+        return state, 0.0
+
+    @staticmethod
+    def release(state: _LimitState) -> None:
+        """释放并发名额并唤醒排队的请求"""
+        state.active -= 1
+        if state.released is not None:
+            state.released.set()
+            state.released = None
+
+    def get_stats(self) -> dict[str, Any]:
+        """获取拒绝和排队计数"""
+        return {
+            "rejected": [
+                {"group": group, "reason": reason, "count": count}
+                for (group, reason), count in self.rejected.items()
+            ],
+            "queued": dict(self.queued),
+            "tracked_keys": len(self._states),
+        }
+
+
+class AdmissionMiddleware:
+    """
+    ASGI 中间件，对 /plugins/* 请求执行准入控制
+
+    并发名额一直持有到响应体发送完毕，流式响应同样受限
+    """
+
+    def __init__(self, app, controller: AdmissionController, prefix: str = "/plugins/"):
+        self.app = app
+        self.controller = controller
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] == "OPTIONS"
+            or not scope["path"].startswith(self.prefix)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        api_key = None
+        for name, value in scope["headers"]:
+            if name == b"x-api-key":
+                api_key = value.decode("latin-1")
+                break
+
+        path = scope["path"][len(self.prefix):]
+        client = scope.get("client")
+        state, retry_after = await self.controller.acquire(api_key, path, client[0] if client else None)
+
+        if state is None and retry_after > 0:
+            await self._send_rejection(send, retry_after)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if state is not None:
+                self.controller.release(state)
+
+    @staticmethod
+    async def _send_rejection(send, retry_after: float) -> None:
+        retry_seconds = max(1, math.ceil(retry_after))
+        body = json.dumps(
+            {"error": "请求过于频繁，请稍后重试", "retry_after": retry_seconds},
+            ensure_ascii=False,
+        ).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", str(retry_seconds).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
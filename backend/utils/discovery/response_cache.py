@@ -0,0 +1,222 @@
+"""
+代理响应缓存
+为发现服务器代理的 GET 请求提供按路由 TTL 的内存缓存，
+经过同一路由前缀的写请求（POST/PUT/PATCH/DELETE）会使缓存失效
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from src.common.logger import get_logger
+
+logger = get_logger("WebUI.ProxyCache")
+
+# 会使缓存失效的请求方法
+MUTATING_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# 默认缓存的路由前缀及 TTL（秒），路径相对于 /plugins/
+DEFAULT_ROUTE_TTLS: dict[str, float] = {
+    "webui_backend/stats/overview": 5.0,
+    "webui_backend/model_stats/": 15.0,
+    "webui_backend/plugin_manager/plugins": 5.0,
+}
+
+# 用于失效分组的路径段数：{插件名}/{组件名}
+INVALIDATION_DEPTH = 2
+
+
+class CachedResponse:
+    """缓存的上游响应"""
+
+    __slots__ = ("status", "headers", "body", "expires_at", "group")
+
+    def __init__(self, status: int, headers: dict[str, str], body: bytes, expires_at: float, group: str):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.expires_at = expires_at
+        self.group = group
+
+
+def route_group(path: str) -> str:
+    """
+    获取路径所属的失效分组
+
+    例如 webui_backend/plugin_manager/plugins/foo/enable -> webui_backend/plugin_manager
+    """
+    parts = path.strip("/").split("/")
+    return "/".join(parts[:INVALIDATION_DEPTH])
+
+
+class ProxyResponseCache:
+    """
+    代理 GET 响应的 TTL 缓存
+
+    - 缓存键包含路径、查询参数、API Key 和 Accept-Encoding，不同用户和编码互不共享
+    - 每个路由分组维护一个代数，写请求会递增代数并清除该分组的所有条目；
+      在写请求之前发出、之后才返回的 GET 响应因代数不匹配而不会写入缓存
+    - 超出容量时按 LRU 淘汰
+    """
+
+    def __init__(
+        self,
+        route_ttls: Optional[dict[str, float]] = None,
+        max_entries: int = 512,
+        max_body_size: int = 1024 * 1024,
+    ):
+        """
+        Args:
+            route_ttls: 路由前缀 -> TTL（秒），按最长前缀匹配
+            max_entries: 最大缓存条目数
+            max_body_size: 单个响应体的最大缓存大小（字节）
+        """
+        ttls = DEFAULT_ROUTE_TTLS if route_ttls is None else route_ttls
+        # 最长前缀优先匹配
+        self.route_ttls = sorted(
+            ((prefix.strip("/"), float(ttl)) for prefix, ttl in ttls.items() if float(ttl) > 0),
+            key=lambda item: len(item[0]),
+            reverse=True,
+        )
+        self.max_entries = max_entries
+        self.max_body_size = max_body_size
+
+        self._entries: OrderedDict[tuple, CachedResponse] = OrderedDict()
+        self._groups: dict[str, set[tuple]] = {}
+        self._generations: dict[str, int] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def ttl_for(self, path: str) -> Optional[float]:
+        """返回路径的缓存 TTL，不缓存的路径返回 None"""
+        path = path.strip("/")
+        for prefix, ttl in self.route_ttls:
+            if path.startswith(prefix):
+                return ttl
+        return None
+
+    @staticmethod
+    def make_key(
+        path: str,
+        query_string: str,
+        api_key: Optional[str],
+        accept_encoding: str,
+        instance_id: str = "",
+    ) -> tuple:
+        """
+        构造缓存键
+
+        API Key 只保存摘要，查询参数按名称排序，使参数顺序不同的相同请求命中同一条目；
+        不同主程序实例的响应互不共享
+        """
+        key_digest = hashlib.sha256(api_key.encode()).hexdigest()[:16] if api_key else ""
+        query = "&".join(sorted(query_string.split("&"))) if query_string else ""
+        return (path.strip("/"), query, key_digest, accept_encoding, instance_id)
+
+    def generation(self, path: str) -> int:
+        """获取路径所属分组的当前代数，在发出上游请求前记录"""
+        return self._generations.get(route_group(path), 0)
+
+    def get(self, key: tuple) -> Optional[CachedResponse]:
+        """获取未过期的缓存响应"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(
+        self,
+        key: tuple,
+        status: int,
+        headers: dict[str, str],
+        body: bytes,
+        ttl: float,
+        generation: int,
+    ) -> bool:
+        """
+        写入缓存
+
+        Args:
+            key: make_key 生成的缓存键
+            status: 响应状态码，只缓存 200
+            headers: 响应头
+            body: 响应体
+            ttl: 存活时间（秒）
+            generation: 发出请求前通过 generation() 获取的代数
+
+        Returns:
+            是否写入
+        """
+        if status != 200 or len(body) > self.max_body_size:
+            return False
+        cache_control = headers.get("cache-control", "").lower()
+        if "no-store" in cache_control or "private" in cache_control:
+            return False
+
+        group = route_group(key[0])
+        if self._generations.get(group, 0) != generation:
+            # 请求期间发生过写操作，响应可能已过时
+            return False
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = CachedResponse(status, headers, body, time.monotonic() + ttl, group)
+        self._groups.setdefault(group, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+        return True
+
+    def invalidate(self, path: str) -> int:
+        """
+        使路径所属分组的缓存全部失效
+
+        Args:
+            path: 写请求的路径（相对于 /plugins/）
+
+        Returns:
+            被清除的条目数
+        """
+        group = route_group(path)
+        self._generations[group] = self._generations.get(group, 0) + 1
+        keys = self._groups.pop(group, set())
+        for key in keys:
+            self._entries.pop(key, None)
+        if keys:
+            self.invalidations += 1
+            logger.debug(f"代理缓存失效: {group} ({len(keys)} 条)")
+        return len(keys)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._entries.clear()
+        self._groups.clear()
+
+    def _remove(self, key: tuple) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._groups.get(entry.group)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._groups[entry.group]
+
+    def get_stats(self) -> dict[str, Any]:
+        """获取缓存统计"""
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
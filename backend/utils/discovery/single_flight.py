@@ -0,0 +1,85 @@
+"""
+单飞请求合并
+同一时刻的相同 GET 请求只向主程序发出一次，结果分发给所有等待者
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Any, Generic, Hashable, TypeVar
+
+from src.common.logger import get_logger
+
+logger = get_logger("WebUI.SingleFlight")
+
+T = TypeVar("T")
+
+# 默认参与合并的路由前缀（相对于 /plugins/），均为返回小型 JSON、计算开销较大的只读接口；
+# 日志读取、导出等大响应不在其中，它们保持流式转发
+DEFAULT_COALESCE_ROUTES: list[str] = [
+    "webui_backend/stats/",
+    "webui_backend/model_stats/",
+    "webui_backend/relationship/",
+]
+
+
+class SingleFlight(Generic[T]):
+    """
+    单飞执行器
+
+    第一个请求（leader）在独立任务中执行实际调用，之后到达的相同请求
+    直接等待该任务。任一等待者断开连接只会取消自己的等待，不影响上游调用。
+    """
+
+    def __init__(self, routes: list[str] | None = None):
+        """
+        Args:
+            routes: 参与合并的路由前缀，None 使用默认列表
+        """
+        prefixes = DEFAULT_COALESCE_ROUTES if routes is None else routes
+        self.routes = tuple(prefix.strip("/") for prefix in prefixes if prefix)
+        self._in_flight: dict[Hashable, asyncio.Task] = {}
+
+        # 实际发往上游的请求数
+        self.executed = 0
+        # 被合并、未发往上游的请求数
+        self.coalesced = 0
+
+    def matches(self, path: str) -> bool:
+        """判断路径是否参与合并"""
+        return path.strip("/").startswith(self.routes)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """
+        执行或加入一个进行中的调用
+
+        Args:
+            key: 请求键，相同的键会被合并
+            fn: 实际调用
+
+        Returns:
+            (结果, 是否为被合并的请求)
+        """
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task), True
+
+        task = asyncio.ensure_future(fn())
+        self._in_flight[key] = task
+        self.executed += 1
+        task.add_done_callback(lambda t: self._on_done(key, t))
+        return await asyncio.shield(task), False
+
+    def _on_done(self, key: Hashable, task: asyncio.Task) -> None:
+        self._in_flight.pop(key, None)
+        # 所有等待者都已断开时，由这里取走异常，避免 "exception was never retrieved"
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"合并请求执行失败: {task.exception()}")
+
+    def get_stats(self) -> dict[str, Any]:
+        """获取合并统计"""
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
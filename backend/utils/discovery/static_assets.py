@@ -0,0 +1,297 @@
+"""
+静态资源预压缩与缓存策略
+为 WebUI 静态文件生成 .br/.gz 压缩副本，并提供编码协商、强 ETag 和
+Cache-Control 计算，供发现服务器的 SPAStaticFiles 使用
+"""
+
+import asyncio
+import gzip
+import hashlib
+import os
+from pathlib import Path
+from typing import Optional
+
+from src.common.logger import get_logger
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，缺失时只生成 gzip
+    brotli = None
+
+logger = get_logger("WebUI.StaticAssets")
+
+# 值得压缩的文本类资源
+COMPRESSIBLE_SUFFIXES = {".html", ".js", ".mjs", ".css", ".svg", ".json", ".map", ".txt", ".xml", ".ico"}
+
+# 小于该大小的文件压缩收益不明显
+MIN_COMPRESS_SIZE = 1024
+
+# 压缩编码 -> 副本文件后缀，按服务端偏好排序
+ENCODING_SUFFIXES = {
+    "br": ".br",
+    "gzip": ".gz",
+}
+
+# Vite 构建产物 assets/* 的文件名带内容哈希，可以永久缓存
+ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# index.html 等不带哈希的文件每次都需要重新验证
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# (路径, mtime_ns, size) -> 内容摘要
+_etag_cache: dict[tuple[str, int, int], str] = {}
+# 正在线程中计算摘要的文件，同时持有任务引用直到完成
+_etag_tasks: dict[tuple[str, int, int], asyncio.Future] = {}
+
+
+def cache_control_for(relative_path: str) -> str:
+    """
+    根据相对路径返回 Cache-Control 策略
+
+    Args:
+        relative_path: 相对于静态目录的路径
+
+    Returns:
+        Cache-Control 头部值
+    """
+    normalized = relative_path.replace(os.sep, "/").lstrip("/")
+    if normalized.startswith("assets/"):
+        return ASSET_CACHE_CONTROL
+    return REVALIDATE_CACHE_CONTROL
+
+
+def compute_strong_etag(path: str, stat_result: os.stat_result, encoding: Optional[str] = None) -> str:
+    """
+    计算基于文件内容的强 ETag
+
+    摘要按 (路径, mtime, size) 缓存，文件未变化时不会重复读取。
+    不同编码的副本使用不同的 ETag，避免缓存把 gzip 内容当作 br 使用。
+
+    Args:
+        path: 原始（未压缩）文件路径
+        stat_result: 原始文件的 stat 结果
+        encoding: 实际发送的内容编码，None 表示未压缩
+
+    Returns:
+        带引号的强 ETag
+    """
+    key = (path, stat_result.st_mtime_ns, stat_result.st_size)
+    digest = _etag_cache.get(key)
+    if digest is None:
+        hasher = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b""):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()[:32]
+        _etag_cache[key] = digest
+    return _format_etag(digest, encoding)
+
+
+def cached_strong_etag(path: str, stat_result: os.stat_result, encoding: Optional[str] = None) -> Optional[str]:
+    """
+    返回已缓存的强 ETag，不在调用线程中读取文件
+
+    未缓存时在线程中计算摘要（同一文件同时只计算一次）并返回 None，
+    调用方本次改用不需要读取文件内容的 ETag。必须在事件循环中调用。
+
+    Args:
+        path: 原始（未压缩）文件路径
+        stat_result: 原始文件的 stat 结果
+        encoding: 实际发送的内容编码，None 表示未压缩
+
+    Returns:
+        带引号的强 ETag，尚未计算时为 None
+    """
+    key = (path, stat_result.st_mtime_ns, stat_result.st_size)
+    digest = _etag_cache.get(key)
+    if digest is not None:
+        return _format_etag(digest, encoding)
+
+    if key not in _etag_tasks:
+        task = asyncio.ensure_future(asyncio.to_thread(compute_strong_etag, path, stat_result))
+        _etag_tasks[key] = task
+        task.add_done_callback(lambda t: _on_etag_computed(key, t))
+    return None
+
+
+def _on_etag_computed(key: tuple[str, int, int], task: asyncio.Future) -> None:
+    _etag_tasks.pop(key, None)
+    if not task.cancelled() and task.exception() is not None:
+        logger.debug(f"计算静态文件 ETag 失败 [{key[0]}]: {task.exception()}")
+
+
+def _format_etag(digest: str, encoding: Optional[str]) -> str:
+    # 不同编码的副本使用不同的 ETag
+    if encoding:
+        return f'"{digest}-{encoding}"'
+    return f'"{digest}"'
+
+
+def warm_etag_cache(directory: Path) -> int:
+    """
+    预先计算静态目录中所有原始文件的强 ETag
+
+    这是一个阻塞操作，应在线程中调用。
+
+    Args:
+        directory: 静态文件目录
+
+    Returns:
+        计算的文件数量
+    """
+    count = 0
+    for file_path in directory.rglob("*"):
+        if not file_path.is_file() or file_path.suffix.lower() in (".gz", ".br", ".tmp"):
+            continue
+        try:
+            compute_strong_etag(str(file_path), file_path.stat())
+        except OSError as e:
+            logger.debug(f"计算静态文件 ETag 失败 [{file_path}]: {e}")
+            continue
+        count += 1
+    return count
+
+
+def _parse_accept_encoding(header: str) -> dict[str, float]:
+    """解析 Accept-Encoding 头部为 {编码: q值}"""
+    accepted: dict[str, float] = {}
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+    return accepted
+
+
+def negotiate_encoding(accept_encoding: str, available: list[str]) -> Optional[str]:
+    """
+    根据 Accept-Encoding 选择最合适的压缩编码
+
+    Args:
+        accept_encoding: 客户端的 Accept-Encoding 头部
+        available: 可用的编码列表（按服务端偏好排序）
+
+    Returns:
+        选中的编码，没有可用编码时返回 None
+    """
+    if not accept_encoding or not available:
+        return None
+
+    accepted = _parse_accept_encoding(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+
+    best: Optional[str] = None
+    best_q = 0.0
+    for encoding in available:
+        q = accepted.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def find_compressed_variants(path: str, stat_result: os.stat_result) -> dict[str, str]:
+    """
+    查找文件已有的压缩副本
+
+    比原始文件旧的副本视为过期，不会被使用
+
+    Args:
+        path: 原始文件路径
+        stat_result: 原始文件的 stat 结果
+
+    Returns:
+        {编码: 副本路径}
+    """
+    variants: dict[str, str] = {}
+    for encoding, suffix in ENCODING_SUFFIXES.items():
+        candidate = path + suffix
+        try:
+            candidate_stat = os.stat(candidate)
+        except OSError:
+            continue
+        if candidate_stat.st_mtime_ns >= stat_result.st_mtime_ns:
+            variants[encoding] = candidate
+    return variants
+
+
+def compress_bytes(data: bytes, encoding: str) -> bytes:
+    """
+    使用指定编码压缩数据
+
+    Args:
+        data: 原始数据
+        encoding: "br" 或 "gzip"
+
+    Returns:
+        压缩后的数据
+    """
+    if encoding == "br":
+        if brotli is None:
+            raise RuntimeError("brotli 未安装")
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _write_atomic(target: Path, data: bytes) -> None:
+    """先写临时文件再替换，避免并发请求读到半个文件"""
+    tmp = target.with_name(target.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, target)
+
+
+def precompress_static_dir(directory: Path) -> int:
+    """
+    为静态目录中的文本资源生成 .gz（以及可用时的 .br）副本
+
+    已存在且不比原文件旧的副本会被跳过，因此 UI 更新后只会重新压缩变化的文件。
+    这是一个阻塞操作，应在线程中调用。
+
+    Args:
+        directory: 静态文件目录
+
+    Returns:
+        新生成的副本数量
+    """
+    generated = 0
+    for file_path in directory.rglob("*"):
+        if not file_path.is_file() or file_path.suffix.lower() not in COMPRESSIBLE_SUFFIXES:
+            continue
+
+        try:
+            stat_result = file_path.stat()
+            if stat_result.st_size < MIN_COMPRESS_SIZE:
+                continue
+
+            existing = find_compressed_variants(str(file_path), stat_result)
+            data: Optional[bytes] = None
+
+            for encoding, suffix in ENCODING_SUFFIXES.items():
+                if encoding in existing:
+                    continue
+                if encoding == "br" and brotli is None:
+                    continue
+
+                if data is None:
+                    data = file_path.read_bytes()
+
+                compressed = compress_bytes(data, encoding)
+
+                # 压缩后反而更大的文件不生成副本
+                if len(compressed) >= len(data):
+                    continue
+
+                _write_atomic(file_path.with_name(file_path.name + suffix), compressed)
+                generated += 1
+        except OSError as e:
+            logger.debug(f"预压缩静态文件失败 [{file_path}]: {e}")
+
+    if generated:
+        logger.info(f"已生成 {generated} 个静态资源压缩副本")
+    return generated
@@ -0,0 +1,307 @@
+"""
+内存静态资源包
+在发现服务器启动或 UI 更新后，将前端构建产物连同压缩副本一次性载入内存，
+请求时只做一次字典查找，SPA 回退不再依赖异常和磁盘 stat
+"""
+
+import asyncio
+import hashlib
+import mimetypes
+from email.utils import formatdate
+from pathlib import Path
+from typing import Any, Optional
+
+from src.common.logger import get_logger
+
+from .http_ranges import parse_byte_range
+from .static_assets import (
+    COMPRESSIBLE_SUFFIXES,
+    ENCODING_SUFFIXES,
+    MIN_COMPRESS_SIZE,
+    brotli,
+    cache_control_for,
+    compress_bytes,
+    find_compressed_variants,
+    negotiate_encoding,
+)
+
+logger = get_logger("WebUI.StaticBundle")
+
+# 不做 SPA 回退、直接返回 404 的路径前缀
+SPA_EXCLUDED_PREFIXES = ("api/", "plugins/")
+
+
+class StaticVariant:
+    """某个静态文件的一种编码表示"""
+
+    __slots__ = ("body", "etag")
+
+    def __init__(self, body: bytes, etag: str):
+        # body 为不可变 bytes，发送时直接传递引用，不产生拷贝；
+        # 响应总是来自这份内存数据，与 ETag 和 Content-Length 一致，磁盘文件之后被重建也不影响
+        self.body = body
+        self.etag = etag
+
+
+class StaticAsset:
+    """内存中的静态文件"""
+
+    __slots__ = ("media_type", "cache_control", "last_modified", "variants")
+
+    def __init__(self, media_type: str, cache_control: str, last_modified: str):
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.last_modified = last_modified
+        # 编码 -> 表示，"identity" 为未压缩版本
+        self.variants: dict[str, StaticVariant] = {}
+
+    def select(self, accept_encoding: str) -> tuple[str, StaticVariant]:
+        """根据 Accept-Encoding 选择要发送的表示"""
+        encodings = [e for e in ENCODING_SUFFIXES if e in self.variants]
+        encoding = negotiate_encoding(accept_encoding, encodings)
+        if encoding:
+            return encoding, self.variants[encoding]
+        return "identity", self.variants["identity"]
+
+
+def _load_asset(file_path: Path, relative_path: str) -> StaticAsset:
+    """读取单个文件及其压缩副本，缺失的副本在内存中补齐"""
+    stat_result = file_path.stat()
+    data = file_path.read_bytes()
+    digest = hashlib.sha256(data).hexdigest()[:32]
+
+    asset = StaticAsset(
+        media_type=mimetypes.guess_type(str(file_path))[0] or "text/plain",
+        cache_control=cache_control_for(relative_path),
+        last_modified=formatdate(stat_result.st_mtime, usegmt=True),
+    )
+    asset.variants["identity"] = StaticVariant(data, f'"{digest}"')
+
+    if file_path.suffix.lower() not in COMPRESSIBLE_SUFFIXES or len(data) < MIN_COMPRESS_SIZE:
+        return asset
+
+    siblings = find_compressed_variants(str(file_path), stat_result)
+    for encoding in ENCODING_SUFFIXES:
+        sibling = siblings.get(encoding)
+        if sibling:
+            body = Path(sibling).read_bytes()
+        elif encoding == "br" and brotli is None:
+            continue
+        else:
+            body = compress_bytes(data, encoding)
+            if len(body) >= len(data):
+                continue
+        asset.variants[encoding] = StaticVariant(body, f'"{digest}-{encoding}"')
+
+    return asset
+
+
+class StaticBundle:
+    """
+    内存静态资源包
+
+    以相对路径为键保存所有静态文件，lookup 为纯字典查找，
+    未命中时直接返回 index.html 作为 SPA 回退，不抛出异常
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.assets: dict[str, StaticAsset] = {}
+        self.index: Optional[StaticAsset] = None
+        self.total_bytes = 0
+
+    def load(self) -> None:
+        """
+        从磁盘重新载入全部文件
+
+        新表完整构建后才替换旧表，载入期间的请求仍由旧表响应。
+        这是一个阻塞操作，应在线程中调用。
+        """
+        assets: dict[str, StaticAsset] = {}
+        total_bytes = 0
+
+        for file_path in self.directory.rglob("*"):
+            if not file_path.is_file() or file_path.suffix.lower() in (".gz", ".br", ".tmp"):
+                continue
+            relative_path = file_path.relative_to(self.directory).as_posix()
+            try:
+                asset = _load_asset(file_path, relative_path)
+            except OSError as e:
+                logger.warning(f"载入静态文件失败 [{file_path}]: {e}")
+                continue
+            assets[relative_path] = asset
+            total_bytes += sum(len(v.body) for v in asset.variants.values())
+
+        self.assets = assets
+        self.index = assets.get("index.html")
+        self.total_bytes = total_bytes
+        logger.info(f"静态资源包已载入: {len(assets)} 个文件, {total_bytes / 1024:.1f} KB")
+
+    async def reload(self) -> None:
+        """在线程中重新载入，不阻塞事件循环"""
+        await asyncio.to_thread(self.load)
+
+    @property
+    def loaded(self) -> bool:
+        return self.index is not None
+
+    def lookup(self, path: str) -> Optional[StaticAsset]:
+        """
+        查找路径对应的静态文件
+
+        Args:
+            path: 去掉前导 / 的请求路径
+
+        Returns:
+            命中的文件；SPA 路由返回 index.html；API/插件路径未命中返回 None
+        """
+        if not path or path.endswith("/"):
+            path += "index.html"
+
+        asset = self.assets.get(path)
+        if asset is not None:
+            return asset
+
+        asset = self.assets.get(f"{path}/index.html")
+        if asset is not None:
+            return asset
+
+        if path.startswith(SPA_EXCLUDED_PREFIXES):
+            return None
+        return self.index
+
+
+class StaticBundleApp:
+    """基于 StaticBundle 的 ASGI 静态文件应用"""
+
+    def __init__(self, bundle: StaticBundle, fallback: Any = None):
+        """
+        Args:
+            bundle: 内存静态资源包
+            fallback: 资源包尚未载入时使用的 ASGI 应用（通常为 SPAStaticFiles）
+        """
+        self.bundle = bundle
+        self.fallback = fallback
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not self.bundle.loaded:
+            if self.fallback is not None:
+                await self.fallback(scope, receive, send)
+            return
+
+        if scope["method"] not in ("GET", "HEAD"):
+            await self._send_plain(send, 405, b"Method Not Allowed")
+            return
+
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+
+        asset = self.bundle.lookup(path.lstrip("/"))
+        if asset is None:
+            await self._send_plain(send, 404, b"Not Found")
+            return
+
+        request_headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        encoding, variant = asset.select(request_headers.get("accept-encoding", ""))
+
+        headers = [
+            (b"content-type", asset.media_type.encode("latin-1")),
+            (b"cache-control", asset.cache_control.encode("latin-1")),
+            (b"etag", variant.etag.encode("latin-1")),
+            (b"last-modified", asset.last_modified.encode("latin-1")),
+            (b"vary", b"Accept-Encoding"),
+            (b"accept-ranges", b"bytes"),
+        ]
+        if encoding != "identity":
+            headers.append((b"content-encoding", encoding.encode("latin-1")))
+
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match and (if_none_match.strip() == "*" or variant.etag in if_none_match):
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        # 单段 Range 请求（与 StaticFiles 一样作用于所选编码的表示），If-Range 与 ETag 不一致时返回完整内容
+        body = variant.body
+        size = len(body)
+        status = 200
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if range_header and (not if_range or if_range.strip() == variant.etag):
+            try:
+                byte_range = parse_byte_range(range_header, size)
+            except ValueError:
+                headers.append((b"content-range", f"bytes */{size}".encode("latin-1")))
+                headers.append((b"content-length", b"0"))
+                await send({"type": "http.response.start", "status": 416, "headers": headers})
+                await send({"type": "http.response.body", "body": b""})
+                return
+            if byte_range is not None:
+                start, end = byte_range
+                status = 206
+                headers.append((b"content-range", f"bytes {start}-{end}/{size}".encode("latin-1")))
+                # 通过 memoryview 切片引用预载入的 bytes，Range 请求同样不复制数据
+                body = memoryview(variant.body)[start : end + 1]
+
+        headers.append((b"content-length", str(len(body)).encode("latin-1")))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+
+        if scope["method"] == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        # 直接发送预载入的 bytes 对象（或其切片视图），不做任何编码和复制
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    async def _send_plain(send, status: int, body: bytes) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+# ==================== 全局单例 ====================
+
+_bundle: Optional[StaticBundle] = None
+
+
+def get_static_bundle(directory: Optional[Path] = None) -> Optional[StaticBundle]:
+    """
+    获取静态资源包单例
+
+    Args:
+        directory: 首次调用时指定静态目录；之后传入 None 仅获取已有实例
+
+    Returns:
+        静态资源包，未初始化时返回 None
+    """
+    global _bundle
+    if _bundle is None and directory is not None:
+        _bundle = StaticBundle(directory)
+    return _bundle
+
+
+async def reload_static_bundle() -> bool:
+    """
+    重新载入静态资源包（UI 更新或回滚后调用）
+
+    Returns:
+        是否执行了重新载入
+    """
+    bundle = get_static_bundle()
+    if bundle is None:
+        return False
+    try:
+        await bundle.reload()
+        return True
+    except Exception as e:
+        logger.error(f"重新载入静态资源包失败: {e}")
+        return False
@@ -0,0 +1,129 @@
+"""
+发现服务器到主程序的传输层
+根据 discovery 配置创建连接池化的 HTTP 客户端和 WebSocket 连接函数，
+支持 TCP 和 Unix 域套接字（UDS）两种传输方式
+"""
+
+import os
+from collections.abc import Callable
+from typing import Any, Optional
+
+import aiohttp
+import websockets
+
+from src.common.logger import get_logger
+
+logger = get_logger("WebUI.DiscoveryTransport")
+
+
+class UpstreamTransportConfig:
+    """主程序连接参数"""
+
+    __slots__ = ("uds_path", "pool_limit", "pool_limit_per_host", "keepalive_timeout", "timeout", "connect_timeout")
+
+    def __init__(
+        self,
+        uds_path: Optional[str] = None,
+        pool_limit: int = 100,
+        pool_limit_per_host: int = 0,
+        keepalive_timeout: float = 30.0,
+        timeout: float = 30.0,
+        connect_timeout: float = 5.0,
+    ):
+        """
+        Args:
+            uds_path: 主程序监听的 Unix 域套接字路径，None 表示使用 TCP
+            pool_limit: 连接池总连接数上限，0 表示不限制
+            pool_limit_per_host: 每个主机的连接数上限，0 表示不限制
+            keepalive_timeout: 空闲连接保持时间（秒）
+            timeout: 单个请求的总超时（秒），流式转发时为两次读取之间的最长间隔
+            connect_timeout: 建立连接的超时（秒），主程序重启时尽快失败
+        """
+        self.uds_path = uds_path
+        self.pool_limit = pool_limit
+        self.pool_limit_per_host = pool_limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+
+    @classmethod
+    def from_discovery_config(cls, discovery_config: dict[str, Any]) -> "UpstreamTransportConfig":
+        """从插件 discovery 配置段读取参数"""
+        uds_path = discovery_config.get("main_server_uds") or None
+        if uds_path and not hasattr(aiohttp, "UnixConnector"):
+            logger.warning("当前平台不支持 Unix 域套接字，使用 TCP 连接主程序")
+            uds_path = None
+        elif uds_path and not os.path.exists(uds_path):
+            logger.warning(f"Unix 域套接字 {uds_path} 尚不存在，将在主程序创建后使用")
+
+        return cls(
+            uds_path=uds_path,
+            pool_limit=int(discovery_config.get("upstream_pool_limit", 100)),
+            pool_limit_per_host=int(discovery_config.get("upstream_pool_limit_per_host", 0)),
+            keepalive_timeout=float(discovery_config.get("upstream_keepalive_timeout", 30.0)),
+            timeout=float(discovery_config.get("upstream_timeout", 30.0)),
+            connect_timeout=float(discovery_config.get("upstream_connect_timeout", 5.0)),
+        )
+
+    @property
+    def stream_timeout(self) -> aiohttp.ClientTimeout:
+        """
+        流式转发使用的超时
+
+        总超时会连同响应体的读取一起计时，长时间的下载和导出会在中途被截断；
+        流式请求只限制建立连接和两次读取之间的间隔
+        """
+        return aiohttp.ClientTimeout(total=None, sock_connect=self.connect_timeout, sock_read=self.timeout)
+
+    @property
+    def transport_name(self) -> str:
+        return f"uds:{self.uds_path}" if self.uds_path else "tcp"
+
+
+def create_upstream_session(config: UpstreamTransportConfig) -> aiohttp.ClientSession:
+    """
+    创建转发用的 HTTP 客户端
+
+    关闭自动解压，让压缩过的响应体与 Content-Encoding 头部原样透传
+
+    Args:
+        config: 连接参数
+
+    Returns:
+        aiohttp 客户端会话
+    """
+    connector_kwargs = {
+        "limit": config.pool_limit,
+        "limit_per_host": config.pool_limit_per_host,
+        "keepalive_timeout": config.keepalive_timeout,
+    }
+    if config.uds_path:
+        connector: aiohttp.BaseConnector = aiohttp.UnixConnector(path=config.uds_path, **connector_kwargs)
+    else:
+        connector = aiohttp.TCPConnector(**connector_kwargs)
+
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=config.timeout, sock_connect=config.connect_timeout),
+        auto_decompress=False,
+    )
+
+
+def create_ws_connect(config: UpstreamTransportConfig) -> Callable[[str], Any]:
+    """
+    返回连接主程序 WebSocket 的函数
+
+    返回值与 websockets.connect 一样，既可以 await 也可以 async with
+
+    Args:
+        config: 连接参数
+    """
+    if config.uds_path:
+        uds_path = config.uds_path
+
+        def connect(url: str):
+            return websockets.unix_connect(uds_path, url)
+
+        return connect
+
+    return websockets.connect
@@ -0,0 +1,157 @@
+"""
+发现服务器工作进程管理
+在独立子进程中运行发现服务器，崩溃后按退避策略自动重启，
+使静态文件、代理和 WebSocket 流量不占用机器人主事件循环
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Optional
+
+from src.common.logger import get_logger
+
+logger = get_logger("WebUI.DiscoveryWorker")
+
+# 运行超过该时长（秒）后退出视为偶发崩溃，重启退避从头计算
+STABLE_UPTIME = 60.0
+
+
+class WorkerSupervisor:
+    """
+    子进程守护
+
+    通过 `python <script> <json>` 按文件路径启动子进程，子进程退出后自动重启。
+    连续快速崩溃时重启间隔按指数退避，最长 max_backoff 秒。
+    """
+
+    def __init__(
+        self,
+        script: str,
+        payload: dict[str, Any],
+        python_path: Optional[list[str]] = None,
+        max_backoff: float = 30.0,
+        stop_timeout: float = 5.0,
+    ):
+        """
+        Args:
+            script: 子进程入口脚本的路径；按路径运行不会导入脚本所在的包
+            payload: 传给子进程的 JSON 参数
+            python_path: 追加到子进程 PYTHONPATH 的目录
+            max_backoff: 最大重启间隔（秒）
+            stop_timeout: 停止时等待子进程退出的时间，超时后强制结束
+        """
+        self.script = script
+        self.payload = payload
+        self.python_path = python_path or []
+        self.max_backoff = max_backoff
+        self.stop_timeout = stop_timeout
+
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.restarts = 0
+        self.started_at: Optional[float] = None
+        self.last_exit_code: Optional[int] = None
+        self._stop_event = asyncio.Event()
+        self._restart_requested = False
+
+    def _build_env(self) -> dict[str, str]:
+        env = dict(os.environ)
+        paths = [*self.python_path, os.getcwd()]
+        if env.get("PYTHONPATH"):
+            paths.append(env["PYTHONPATH"])
+        env["PYTHONPATH"] = os.pathsep.join(paths)
+        return env
+
+    async def _spawn(self) -> asyncio.subprocess.Process:
+        payload = {
+            **self.payload,
+            "parent_pid": os.getpid(),
+            "restarts": self.restarts,
+            "last_exit_code": self.last_exit_code,
+        }
+        process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            self.script,
+            json.dumps(payload),
+            cwd=os.getcwd(),
+            env=self._build_env(),
+        )
+        self.started_at = time.time()
+        logger.info(f"发现服务器工作进程已启动 (pid={process.pid}, restarts={self.restarts})")
+        return process
+
+    async def run(self) -> None:
+        """启动子进程并持续守护，直到 stop() 被调用"""
+        backoff = 1.0
+        while not self._stop_event.is_set():
+            try:
+                self.process = await self._spawn()
+            except Exception as e:
+                logger.error(f"启动发现服务器工作进程失败: {e}")
+                self.process = None
+            else:
+                started = time.monotonic()
+                self.last_exit_code = await self.process.wait()
+                if self._stop_event.is_set():
+                    break
+
+                if self._restart_requested:
+                    # 主动重启（例如 UI 更新后），无需退避
+                    self._restart_requested = False
+                    self.restarts += 1
+                    continue
+
+                if time.monotonic() - started > STABLE_UPTIME:
+                    backoff = 1.0
+                logger.warning(
+                    f"发现服务器工作进程意外退出 (code={self.last_exit_code})，{backoff:.0f} 秒后重启"
+                )
+
+            self.restarts += 1
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=backoff)
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(backoff * 2, self.max_backoff)
+
+        self.process = None
+
+    async def _terminate(self) -> None:
+        process = self.process
+        if process is None or process.returncode is not None:
+            return
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), timeout=self.stop_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"发现服务器工作进程未在 {self.stop_timeout} 秒内退出，强制结束")
+            process.kill()
+            await process.wait()
+
+    async def restart(self) -> None:
+        """结束当前子进程，守护循环会立即启动新进程"""
+        if self.process is None or self._stop_event.is_set():
+            return
+        self._restart_requested = True
+        await self._terminate()
+
+    async def stop(self) -> None:
+        """停止守护并结束子进程"""
+        self._stop_event.set()
+        await self._terminate()
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    def get_status(self) -> dict[str, Any]:
+        """获取工作进程状态"""
+        return {
+            "alive": self.alive,
+            "pid": self.process.pid if self.process else None,
+            "restarts": self.restarts,
+            "started_at": self.started_at,
+            "last_exit_code": self.last_exit_code,
+        }
@@ -0,0 +1,374 @@
+"""
+WebSocket 代理多路复用
+- 每个浏览器连接拥有独立的有界发送队列和发送任务，慢客户端不会拖慢上游或其他客户端
+- 广播类路由（如实时日志）的多个浏览器连接共享同一条主程序连接
+- 文本帧和二进制帧原样透传
+"""
+
+import asyncio
+import itertools
+from collections import deque
+from collections.abc import Callable
+from typing import Any, Optional, Union
+
+import websockets
+from fastapi import WebSocket
+from websockets.exceptions import ConnectionClosed
+
+from src.common.logger import get_logger
+
+logger = get_logger("WebUI.WSMultiplexer")
+
+Frame = Union[str, bytes]
+
+# 队列溢出策略
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_DISCONNECT = "disconnect"
+
+# 默认共享上游连接的路由前缀（相对于 /plugins/），这些路由只向客户端广播，
+# 客户端除心跳外不发送会改变服务端状态的命令
+DEFAULT_MULTIPLEX_ROUTES: list[str] = [
+    "webui_backend/log_viewer/realtime",
+]
+
+# 慢客户端被断开时使用的关闭码（1013: Try Again Later）
+SLOW_CLIENT_CLOSE_CODE = 1013
+
+_connection_ids = itertools.count(1)
+
+
+class ClientChannel:
+    """
+    单个浏览器连接的发送端
+
+    上游帧通过 offer() 非阻塞入队，由独立的发送任务写入浏览器。
+    队列满时按策略丢弃最旧的帧或断开连接。
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        path: str,
+        mode: str,
+        max_queue: int = 256,
+        overflow_policy: str = OVERFLOW_DROP_OLDEST,
+    ):
+        self.id = next(_connection_ids)
+        self.websocket = websocket
+        self.path = path
+        self.mode = mode
+        self.max_queue = max_queue
+        self.overflow_policy = overflow_policy
+
+        self.queue: deque[Frame] = deque()
+        self._wakeup = asyncio.Event()
+        self.closed = False
+        self.close_code = 1000
+        self.close_reason = ""
+
+        self.sent = 0
+        self.dropped = 0
+        self.received = 0
+        self.max_depth = 0
+        # 主程序连接建立后才计入统计，避免不存在的路径产生统计条目
+        self.connected = False
+
+    def offer(self, frame: Frame) -> bool:
+        """
+        将帧放入发送队列（不阻塞）
+
+        Returns:
+            是否入队成功
+        """
+        if self.closed:
+            return False
+
+        if len(self.queue) >= self.max_queue:
+            if self.overflow_policy == OVERFLOW_DISCONNECT:
+                logger.debug(f"WebSocket 客户端 #{self.id} 发送队列已满，断开连接")
+                self.close(SLOW_CLIENT_CLOSE_CODE, "客户端接收过慢")
+                return False
+            self.queue.popleft()
+            self.dropped += 1
+
+        self.queue.append(frame)
+        self.max_depth = max(self.max_depth, len(self.queue))
+        self._wakeup.set()
+        return True
+
+    def close(self, code: int = 1000, reason: str = "") -> None:
+        """标记关闭，发送任务会在队列中的帧发完后关闭浏览器连接"""
+        if self.closed:
+            return
+        self.closed = True
+        self.close_code = code
+        self.close_reason = reason
+        if code == SLOW_CLIENT_CLOSE_CODE:
+            # 因过慢被断开时，剩余的帧没有必要再发送
+            self.queue.clear()
+        self._wakeup.set()
+
+    async def run_sender(self) -> None:
+        """发送循环，直到连接关闭或发送失败"""
+        try:
+            while True:
+                while not self.queue:
+                    if self.closed:
+                        await self.websocket.close(code=self.close_code, reason=self.close_reason)
+                        return
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+
+                frame = self.queue.popleft()
+                if isinstance(frame, bytes):
+                    await self.websocket.send_bytes(frame)
+                else:
+                    await self.websocket.send_text(frame)
+                self.sent += 1
+        except Exception as e:
+            logger.debug(f"WebSocket 客户端 #{self.id} 发送失败: {e}")
+        finally:
+            self.closed = True
+
+    def snapshot(self) -> dict[str, Any]:
+        """连接状态快照"""
+        return {
+            "id": self.id,
+            "path": self.path,
+            "mode": self.mode,
+            "queue_depth": len(self.queue),
+            "max_queue_depth": self.max_depth,
+            "queue_limit": self.max_queue,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "received": self.received,
+        }
+
+
+class UpstreamChannel:
+    """多个浏览器连接共享的一条主程序 WebSocket 连接"""
+
+    def __init__(self, key: str, url: str, replay_size: int, connect: Callable[[str], Any]):
+        self.key = key
+        self.url = url
+        self._connect = connect
+        self.clients: set[ClientChannel] = set()
+        # 最近的帧，新加入的客户端先收到这些（替代主程序在连接建立时发送的历史）
+        self.history: deque[Frame] = deque(maxlen=replay_size)
+        self.backend_ws: Any = None
+        self._pump_task: Optional[asyncio.Task] = None
+        # 连接主程序的任务，同一上游的所有客户端等待同一个任务
+        self.connecting: Optional[asyncio.Task] = None
+        # 正在等待连接建立、尚未加入 clients 的客户端数
+        self.pending = 0
+        self.closed = False
+        self.frames = 0
+
+    def start(self) -> asyncio.Task:
+        """在独立任务中连接主程序，连接建立后启动读取任务"""
+        if self.connecting is None:
+            self.connecting = asyncio.create_task(self._start())
+            self.connecting.add_done_callback(self._on_connected)
+        return self.connecting
+
+    async def _start(self) -> None:
+        self.backend_ws = await self._connect(self.url)
+        if self.closed:
+            # 连接期间所有等待者都已离开
+            await self.backend_ws.close()
+            return
+        self._pump_task = asyncio.create_task(self._pump())
+
+    def _on_connected(self, task: asyncio.Task) -> None:
+        # 连接失败时标记关闭；等待者都已取消时由这里取走异常
+        if task.cancelled() or task.exception() is not None:
+            self.closed = True
+
+    @property
+    def idle(self) -> bool:
+        """没有客户端也没有等待中的客户端"""
+        return not self.clients and self.pending == 0
+
+    async def _pump(self) -> None:
+        """读取上游帧并分发到所有客户端队列"""
+        try:
+            async for frame in self.backend_ws:
+                self.frames += 1
+                self.history.append(frame)
+                for client in tuple(self.clients):
+                    client.offer(frame)
+        except ConnectionClosed:
+            pass
+        except Exception as e:
+            logger.debug(f"共享上游连接读取错误 [{self.key}]: {e}")
+        finally:
+            self.closed = True
+            for client in tuple(self.clients):
+                client.close(1011, "上游连接已关闭")
+
+    def add(self, client: ClientChannel) -> None:
+        for frame in self.history:
+            client.offer(frame)
+        self.clients.add(client)
+
+    async def close(self) -> None:
+        self.closed = True
+        if self.connecting is not None and not self.connecting.done():
+            self.connecting.cancel()
+        if self.backend_ws is not None:
+            try:
+                await self.backend_ws.close()
+            except Exception:
+                pass
+        if self._pump_task is not None and not self._pump_task.done():
+            self._pump_task.cancel()
+
+
+class WebSocketMultiplexer:
+    """
+    WebSocket 代理连接管理
+
+    维护共享上游连接表和所有浏览器连接的发送端，供代理路由使用并提供统计
+    """
+
+    def __init__(
+        self,
+        routes: Optional[list[str]] = None,
+        max_queue: int = 256,
+        overflow_policy: str = OVERFLOW_DROP_OLDEST,
+        replay_size: int = 100,
+        connect: Optional[Callable[[str], Any]] = None,
+    ):
+        """
+        Args:
+            routes: 共享上游连接的路由前缀，None 使用默认列表
+            max_queue: 每个浏览器连接的发送队列上限（帧数）
+            overflow_policy: 队列满时的策略，drop_oldest 或 disconnect
+            replay_size: 共享连接为新客户端保留的最近帧数
+            connect: 连接主程序 WebSocket 的函数，默认 websockets.connect
+        """
+        self.connect = connect or websockets.connect
+        prefixes = DEFAULT_MULTIPLEX_ROUTES if routes is None else routes
+        self.routes = tuple(prefix.strip("/") for prefix in prefixes if prefix)
+        self.max_queue = max_queue
+        if overflow_policy not in (OVERFLOW_DROP_OLDEST, OVERFLOW_DISCONNECT):
+            logger.warning(f"未知的 WebSocket 队列溢出策略 {overflow_policy}，使用 {OVERFLOW_DROP_OLDEST}")
+            overflow_policy = OVERFLOW_DROP_OLDEST
+        self.overflow_policy = overflow_policy
+        self.replay_size = replay_size
+
+        self.upstreams: dict[str, UpstreamChannel] = {}
+        self.connections: dict[int, ClientChannel] = {}
+        # 已关闭连接的累计计数：路径 -> {"sent", "dropped", "received"}
+        self.closed_totals: dict[str, dict[str, int]] = {}
+        self._lock = asyncio.Lock()
+
+    def matches(self, path: str) -> bool:
+        """判断路径是否使用共享上游连接"""
+        return path.strip("/").startswith(self.routes)
+
+    def create_client(self, websocket: WebSocket, path: str, mode: str) -> ClientChannel:
+        """创建并登记浏览器连接的发送端"""
+        client = ClientChannel(
+            websocket,
+            path,
+            mode,
+            max_queue=self.max_queue,
+            overflow_policy=self.overflow_policy,
+        )
+        self.connections[client.id] = client
+        return client
+
+    def release_client(self, client: ClientChannel) -> None:
+        if self.connections.pop(client.id, None) is None or not client.connected:
+            return
+        totals = self.closed_totals.setdefault(client.path, {"sent": 0, "dropped": 0, "received": 0})
+        totals["sent"] += client.sent
+        totals["dropped"] += client.dropped
+        totals["received"] += client.received
+
+    def frame_totals(self) -> dict[str, dict[str, int]]:
+        """按路径汇总所有连接（含已关闭连接）的帧计数"""
+        totals = {path: dict(counts) for path, counts in self.closed_totals.items()}
+        for client in self.connections.values():
+            if not client.connected:
+                continue
+            counts = totals.setdefault(client.path, {"sent": 0, "dropped": 0, "received": 0})
+            counts["sent"] += client.sent
+            counts["dropped"] += client.dropped
+            counts["received"] += client.received
+        return totals
+
+    async def attach(
+        self,
+        key: str,
+        url: str,
+        client: ClientChannel,
+        connect: Optional[Callable[[str], Any]] = None,
+    ) -> UpstreamChannel:
+        """
+        将客户端挂到共享上游连接，不存在时建立
+
+        只在查表和登记时持有锁，连接主程序在锁外进行：同一上游的客户端等待同一个连接任务，
+        其他上游的连接和 detach 不受影响
+
+        Args:
+            key: 上游连接键（实例 + 路径 + 查询参数）
+            url: 主程序 WebSocket 地址
+            client: 浏览器连接发送端
+            connect: 连接该主程序实例的函数，默认使用构造时传入的函数
+        """
+        async with self._lock:
+            upstream = self.upstreams.get(key)
+            if upstream is None or upstream.closed:
+                upstream = UpstreamChannel(key, url, self.replay_size, connect or self.connect)
+                self.upstreams[key] = upstream
+                logger.debug(f"建立共享上游 WebSocket 连接: {key}")
+            upstream.pending += 1
+            connecting = upstream.start()
+
+        try:
+            # shield：某个等待者断开只取消它自己的等待，不影响其他客户端共用的连接
+            await asyncio.shield(connecting)
+        except BaseException:
+            upstream.pending -= 1
+            await self._discard_if_idle(upstream)
+            raise
+
+        upstream.pending -= 1
+        if upstream.closed:
+            # 连接建立后上游立即断开
+            await self._discard_if_idle(upstream)
+            raise ConnectionError("上游连接已关闭")
+        upstream.add(client)
+        client.connected = True
+        return upstream
+
+    async def detach(self, upstream: UpstreamChannel, client: ClientChannel) -> None:
+        """客户端离开共享连接，最后一个客户端离开时关闭上游"""
+        upstream.clients.discard(client)
+        await self._discard_if_idle(upstream)
+
+    async def _discard_if_idle(self, upstream: UpstreamChannel) -> None:
+        """上游没有客户端时从表中移除并关闭，关闭在锁外进行"""
+        async with self._lock:
+            if not upstream.idle:
+                return
+            removed = self.upstreams.get(upstream.key) is upstream
+            if removed:
+                del self.upstreams[upstream.key]
+        if removed or not upstream.closed:
+            await upstream.close()
+            logger.debug(f"关闭共享上游 WebSocket 连接: {upstream.key}")
+
+    def get_stats(self) -> dict[str, Any]:
+        """获取连接统计，包括每个连接的队列深度"""
+        return {
+            "overflow_policy": self.overflow_policy,
+            "queue_limit": self.max_queue,
+            "shared_upstreams": [
+                {"key": u.key, "clients": len(u.clients), "frames": u.frames}
+                for u in self.upstreams.values()
+            ],
+            "connections": [c.snapshot() for c in self.connections.values()],
+        }
@@ -0,0 +1,114 @@
+"""
+WebSocket 帧批量发送
+客户端在连接时通过 batch_ms / max_batch 协商批量模式后，
+同一时间窗口内的多条记录合并为一个 JSON 数组帧发送，减少帧数和前端渲染次数
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Any, Optional
+
+from src.common.logger import get_logger
+
+from .message_broadcaster import encode_message
+
+logger = get_logger("WebUI.FrameBatcher")
+
+# 批量窗口上限（毫秒）
+MAX_BATCH_MS = 5000
+# 单个批次的记录数上限
+MAX_BATCH_SIZE = 1000
+DEFAULT_BATCH_SIZE = 100
+
+
+class FrameBatcher:
+    """
+    按时间窗口合并发送的记录
+
+    第一条记录到达后开始计时，窗口结束或积累到 max_batch 条时，
+    把已编码的记录拼接为 JSON 数组一次发送（不重新编码）；
+    发送期间新到的记录等待下一批，批次已满时 add() 会等待发送完成，把背压传回调用方
+    """
+
+    def __init__(
+        self,
+        send_text: Callable[[str], Awaitable[None]],
+        batch_ms: int,
+        max_batch: int = DEFAULT_BATCH_SIZE,
+    ):
+        """
+        Args:
+            send_text: 发送文本帧的函数，失败时抛出异常
+            batch_ms: 时间窗口（毫秒）
+            max_batch: 单个批次的记录数上限
+        """
+        self._send_text = send_text
+        self.interval = min(max(batch_ms, 1), MAX_BATCH_MS) / 1000
+        self.max_batch = min(max(max_batch, 1), MAX_BATCH_SIZE)
+        self._pending: list[str] = []
+        self._lock = asyncio.Lock()
+        self._has_pending = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.closed = False
+
+        self.batches = 0
+        self.items = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def add(self, text: str) -> None:
+        """
+        加入一条已编码为 JSON 的记录
+
+        Raises:
+            ConnectionError: 之前的发送已失败，连接不可用
+        """
+        if self.closed:
+            raise ConnectionError("WebSocket 批量发送已停止")
+        self._pending.append(text)
+        self._has_pending.set()
+        if len(self._pending) >= self.max_batch:
+            await self.flush()
+
+    async def add_record(self, record: dict[str, Any]) -> None:
+        """加入一条未编码的记录"""
+        await self.add(encode_message(record))
+
+    async def flush(self) -> None:
+        """立即发送已积累的记录"""
+        async with self._lock:
+            if not self._pending or self.closed:
+                return
+            items, self._pending = self._pending, []
+            self._has_pending.clear()
+            try:
+                await self._send_text(f"[{','.join(items)}]")
+            except Exception:
+                self.closed = True
+                raise
+            self.batches += 1
+            self.items += len(items)
+
+    async def _run(self) -> None:
+        try:
+            while not self.closed:
+                await self._has_pending.wait()
+                await asyncio.sleep(self.interval)
+                await self.flush()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug(f"批量发送失败，停止发送: {e}")
+
+    async def stop(self) -> None:
+        """停止定时发送，未发送的记录被丢弃"""
+        self.closed = True
+        self._pending.clear()
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
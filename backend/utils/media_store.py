@@ -0,0 +1,254 @@
+"""
+按内容哈希寻址的媒体文件
+消息和表情包接口只返回 /media/{kind}/{hash} 形式的 URL，由媒体接口直接输出原始文件，
+浏览器按强 ETag 和 immutable 缓存，同一个表情包只下载一次
+
+<img> 无法携带 X-API-Key，URL 中附带只对该文件有效的签名，API Key 不出现在 URL 里；
+签名不含时间且密钥持久化保存，同一文件的 URL 始终不变，浏览器缓存跨重启也能命中
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import io
+import mimetypes
+import os
+import re
+import secrets
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+from src.common.logger import get_logger
+
+logger = get_logger("WebUI.MediaStore")
+
+# 媒体类型
+KIND_IMAGE = "image"  # 聊天图片（Images 表）
+KIND_EMOJI = "emoji"  # 表情包原图（Emoji 表）
+KIND_EMOJI_THUMB = "emoji_thumb"  # 表情包缩略图
+MEDIA_KINDS = (KIND_IMAGE, KIND_EMOJI, KIND_EMOJI_THUMB)
+
+# 前端访问媒体接口的路径前缀（经发现服务器代理）
+MEDIA_URL_PREFIX = "/plugins/webui_backend/media"
+
+# 内容哈希只允许这些字符，防止路径注入
+MEDIA_HASH_PATTERN = re.compile(r"^[0-9A-Za-z_-]{1,128}$")
+
+# 媒体 URL 签名密钥的文件名，保存在 data/webui 下；删除该文件即可让已发出的媒体链接全部失效
+MEDIA_KEY_FILENAME = "media_url.key"
+
+# 签名密钥，首次签名时加载
+_signing_key: Optional[bytes] = None
+
+# 缩略图尺寸
+THUMBNAIL_SIZE = (200, 200)
+
+# 哈希 -> 文件路径 缓存的条目数上限
+PATH_CACHE_SIZE = 4096
+
+# 缩略图缓存的总字节数上限
+THUMBNAIL_CACHE_BYTES = 32 * 1024 * 1024
+
+# 按文件头识别的图片类型
+_MAGIC_TYPES: tuple[tuple[bytes, str], ...] = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+)
+
+
+def _load_signing_key() -> bytes:
+    """读取持久化的签名密钥，不存在时生成并保存；无法读写时使用只在本次运行有效的随机密钥"""
+    try:
+        from src.config.config import PROJECT_ROOT
+
+        path = Path(PROJECT_ROOT) / "data" / "webui" / MEDIA_KEY_FILENAME
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            except FileExistsError:
+                pass  # 其他进程刚刚生成，读取它的密钥
+            else:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(secrets.token_bytes(32))
+        key = path.read_bytes()
+        if len(key) < 32:
+            raise ValueError(f"媒体签名密钥 {path} 长度不足")
+        return key
+    except (ImportError, OSError, ValueError) as e:
+        logger.warning(f"无法加载持久化的媒体签名密钥，重启后媒体链接会改变: {e}")
+        return secrets.token_bytes(32)
+
+
+def _media_signature(kind: str, media_hash: str) -> str:
+    global _signing_key
+    if _signing_key is None:
+        _signing_key = _load_signing_key()
+    digest = hmac.new(_signing_key, f"{kind}/{media_hash}".encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:16]).decode("ascii").rstrip("=")
+
+
+def media_url(kind: str, media_hash: Optional[str]) -> Optional[str]:
+    """
+    带签名的媒体文件 URL，可以直接用作 <img src>；同一文件的 URL 始终相同
+
+    Args:
+        kind: 媒体类型
+        media_hash: 内容哈希，为空时返回 None
+    """
+    if not media_hash:
+        return None
+    return f"{MEDIA_URL_PREFIX}/{kind}/{media_hash}?sig={_media_signature(kind, media_hash)}"
+
+
+def verify_media_signature(kind: str, media_hash: str, signature: Optional[str]) -> bool:
+    """校验 media_url 生成的签名，与类型和哈希匹配时返回 True"""
+    if not signature:
+        return False
+    return hmac.compare_digest(signature, _media_signature(kind, media_hash))
+
+
+def sniff_media_type(head: bytes, path: str = "") -> str:
+    """根据文件头（和扩展名）判断 MIME 类型"""
+    for magic, media_type in _MAGIC_TYPES:
+        if head.startswith(magic):
+            return media_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    guessed, _ = mimetypes.guess_type(path)
+    return guessed or "application/octet-stream"
+
+
+def _render_thumbnail(path: str, max_size: tuple[int, int]) -> tuple[bytes, str]:
+    """生成缩略图，GIF 动图保持原样"""
+    from PIL import Image
+
+    with Image.open(path) as img:
+        if img.format == "GIF" and getattr(img, "is_animated", False):
+            with open(path, "rb") as f:
+                return f.read(), "image/gif"
+
+        # 保持宽高比缩放
+        img.thumbnail(max_size, Image.Resampling.LANCZOS)
+
+        # 转换为RGB（处理RGBA、P等模式）
+        if img.mode not in ("RGB", "L"):
+            if img.mode == "RGBA":
+                background = Image.new("RGB", img.size, (255, 255, 255))
+                background.paste(img, mask=img.split()[3])
+                img = background
+            else:
+                img = img.convert("RGB")
+
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=85, optimize=True)
+        return buffer.getvalue(), "image/jpeg"
+
+
+class MediaStore:
+    """
+    哈希到媒体文件的解析
+
+    文件路径按哈希缓存（内容寻址，哈希对应的内容不会变化），
+    消息列表接口批量查询时顺便填充缓存，随后浏览器请求媒体文件时不再查询数据库
+    """
+
+    def __init__(self, path_cache_size: int = PATH_CACHE_SIZE, thumbnail_cache_bytes: int = THUMBNAIL_CACHE_BYTES):
+        self._paths: OrderedDict[tuple[str, str], str] = OrderedDict()
+        self.path_cache_size = path_cache_size
+        self._thumbnails: OrderedDict[str, tuple[bytes, str]] = OrderedDict()
+        self._thumbnail_bytes = 0
+        self.thumbnail_cache_bytes = thumbnail_cache_bytes
+
+    @staticmethod
+    def _table_for(kind: str) -> tuple[Any, Any]:
+        """返回 (模型, 路径列)"""
+        from src.common.database.core.models import Emoji, Images
+
+        if kind == KIND_IMAGE:
+            return Images, Images.path
+        return Emoji, Emoji.full_path
+
+    def _remember(self, table: str, media_hash: str, path: str) -> None:
+        key = (table, media_hash)
+        self._paths[key] = path
+        self._paths.move_to_end(key)
+        while len(self._paths) > self.path_cache_size:
+            self._paths.popitem(last=False)
+
+    async def lookup_paths(self, kind: str, hashes: set[str]) -> dict[str, str]:
+        """
+        批量获取哈希对应的文件路径，缓存未命中的部分用一次 IN 查询获取
+
+        Returns:
+            哈希 -> 文件路径，数据库中不存在的哈希不出现在结果中
+        """
+        table = KIND_IMAGE if kind == KIND_IMAGE else KIND_EMOJI
+        found: dict[str, str] = {}
+        missing: set[str] = set()
+        for media_hash in hashes:
+            path = self._paths.get((table, media_hash))
+            if path is None:
+                missing.add(media_hash)
+            else:
+                found[media_hash] = path
+        if not missing:
+            return found
+
+        from sqlalchemy import select
+        from src.common.database.core import get_db_session
+
+        model, path_column = self._table_for(kind)
+        async with get_db_session() as session:
+            result = await session.execute(
+                select(model.emoji_hash, path_column).where(model.emoji_hash.in_(missing))
+            )
+            for media_hash, path in result.all():
+                if path and media_hash not in found:
+                    found[media_hash] = path
+                    self._remember(table, media_hash, path)
+        return found
+
+    async def resolve_path(self, kind: str, media_hash: str) -> Optional[str]:
+        paths = await self.lookup_paths(kind, {media_hash})
+        return paths.get(media_hash)
+
+    async def thumbnail(self, media_hash: str, path: str) -> tuple[bytes, str]:
+        """获取表情包缩略图（在线程中生成，结果按字节数上限缓存）"""
+        cached = self._thumbnails.get(media_hash)
+        if cached is not None:
+            self._thumbnails.move_to_end(media_hash)
+            return cached
+
+        data, media_type = await asyncio.to_thread(_render_thumbnail, path, THUMBNAIL_SIZE)
+        if len(data) <= self.thumbnail_cache_bytes:
+            self._thumbnails[media_hash] = (data, media_type)
+            self._thumbnail_bytes += len(data)
+            while self._thumbnail_bytes > self.thumbnail_cache_bytes:
+                _, (evicted, _) = self._thumbnails.popitem(last=False)
+                self._thumbnail_bytes -= len(evicted)
+        return data, media_type
+
+    def forget(self, media_hash: str) -> None:
+        """表情包被删除时清除缓存"""
+        for table in (KIND_IMAGE, KIND_EMOJI):
+            self._paths.pop((table, media_hash), None)
+        cached = self._thumbnails.pop(media_hash, None)
+        if cached is not None:
+            self._thumbnail_bytes -= len(cached[0])
+
+
+_media_store: Optional[MediaStore] = None
+
+
+def get_media_store() -> MediaStore:
+    """获取媒体解析器单例"""
+    global _media_store
+    if _media_store is None:
+        _media_store = MediaStore()
+    return _media_store
@@ -2,79 +2,725 @@
 消息广播器
 用于实时推送聊天消息到 WebSocket 客户端
 零侵入实现 - 不修改 MMC 核心代码
+
+每个订阅者拥有独立的有界发送队列和发送任务，广播只做入队，
+慢客户端不会拖慢机器人的消息事件处理；每条消息只编码一次，
+所有订阅者共享同一份 JSON 文本
+
+每个聊天流的消息带有递增的 seq，客户端重连时可以用 since_seq 只补发缺失的部分；
+除了按聊天流订阅，还可以按过滤条件订阅，过滤器编入索引，每条消息只与可能匹配的过滤器比较；
+配置跨进程传输后，机器人进程的消息会推送到 WebUI 工作进程的订阅者，序号统一由机器人进程分配
 """
 
 import asyncio
-from collections import deque
+import itertools
+import json
+from collections import OrderedDict, deque
 from collections.abc import Callable, Coroutine
-from typing import Any, Union
+from typing import Any, Optional, Union
 
 from src.common.logger import get_logger
 
+from .broadcast_transport import BroadcastTransport, create_transport
+from .message_filter import FilterIndex, MessageFilter
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖，缺失时使用标准库 json
+    orjson = None
+
 logger = get_logger("WebUI.MessageBroadcaster")
 
 # 回调类型：同步或异步函数
 CallbackType = Callable[[dict[str, Any]], Union[None, Coroutine[Any, Any, None]]]
 
+# 发送队列溢出策略
+OVERFLOW_DROP_OLDEST = "drop_oldest"  # 丢弃最旧的消息
+OVERFLOW_COALESCE = "coalesce"  # 将积压的消息合并为一条提示，客户端据此重新拉取历史
+OVERFLOW_DISCONNECT = "disconnect"  # 断开慢客户端
+OVERFLOW_POLICIES = (OVERFLOW_DROP_OLDEST, OVERFLOW_COALESCE, OVERFLOW_DISCONNECT)
+
+
+def decode_message(text: str) -> dict[str, Any]:
+    """解码 encode_message 生成的 JSON 文本"""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def encode_message(msg: dict[str, Any]) -> str:
+    """
+    将消息编码为 JSON 文本
+
+    优先使用 orjson，无法序列化的值转为字符串
+    """
+    if orjson is not None:
+        return orjson.dumps(msg, default=str).decode("utf-8")
+    return json.dumps(msg, ensure_ascii=False, default=str)
+
+
+# 消息段类型 -> 显示的占位文本
+SEGMENT_PLACEHOLDERS: dict[str, str] = {
+    "image": "[图片]",
+    "emoji": "[表情]",
+    "voice": "[语音]",
+    "video": "[视频]",
+    "file": "[文件]",
+}
+
+# 区分列表中的 None 元素和迭代结束
+_EXHAUSTED = object()
+
+
+class SegmentExtractor:
+    """
+    从 message_segment 中提取文本内容和引用消息 ID
+
+    用显式栈代替递归遍历嵌套的 seglist，一次遍历同时得到内容和引用；
+    进程内只创建一个实例，不在每条消息上重建闭包
+    """
+
+    __slots__ = ("placeholders",)
+
+    def __init__(self, placeholders: dict[str, str]):
+        self.placeholders = placeholders
+
+    def extract(self, segment: dict | list | None) -> tuple[str, Optional[str]]:
+        """
+        Args:
+            segment: message_segment 数据（单个段或段列表）
+
+        Returns:
+            (消息文本内容, 第一个被引用消息的 message_id 或 None)
+        """
+        if not segment:
+            return "", None
+
+        contents: list[str] = []
+        reply_to_id = None
+        placeholders = self.placeholders
+        stack = [iter(segment if isinstance(segment, list) else (segment,))]
+        while stack:
+            seg = next(stack[-1], _EXHAUSTED)
+            if seg is _EXHAUSTED:
+                stack.pop()
+                continue
+            if not isinstance(seg, dict):
+                continue
+
+            seg_type = seg.get("type")
+            data = seg.get("data")
+            if seg_type == "text":
+                if isinstance(data, str):
+                    contents.append(data)
+                elif isinstance(data, dict):
+                    contents.append(data.get("text", ""))
+            elif seg_type == "seglist":
+                if isinstance(data, list):
+                    stack.append(iter(data))
+            elif seg_type == "reply":
+                # reply 类型的 data 直接是 message_id 字符串
+                if reply_to_id is None:
+                    reply_to_id = data
+            elif seg_type == "at":
+                at_name = data.get("name", "") if isinstance(data, dict) else ""
+                contents.append(f"@{at_name}")
+            else:
+                placeholder = placeholders.get(seg_type)
+                if placeholder is not None:
+                    contents.append(placeholder)
+
+        return "".join(contents), reply_to_id
+
+
+_segment_extractor = SegmentExtractor(SEGMENT_PLACEHOLDERS)
+
+# DatabaseMessages 类型，首次序列化时解析；False 表示不可用
+_database_messages_type: Any = None
+
+
+def _get_database_messages_type() -> Optional[type]:
+    global _database_messages_type
+    if _database_messages_type is None:
+        try:
+            from src.common.data_models.database_data_model import DatabaseMessages
+
+            _database_messages_type = DatabaseMessages
+        except ImportError:
+            _database_messages_type = False
+    return _database_messages_type or None
+
+
+class MessageRecord:
+    """
+    缓冲区中的一条聊天消息
+
+    用 __slots__ 保存字段，比同样内容的字典小得多；需要推送时才转换为线路格式字典。
+    提供只读的 get()，过滤器和溢出合并可以像字典一样读取字段
+    """
+
+    __slots__ = (
+        "direction",
+        "sender_type",
+        "message_id",
+        "stream_id",
+        "platform",
+        "user_id",
+        "user_nickname",
+        "content",
+        "display_message",
+        "timestamp",
+        "is_emoji",
+        "is_picid",
+        "reply_to_id",
+        "group_id",
+        "group_name",
+        "seq",
+    )
+
+    def __init__(
+        self,
+        direction: str,
+        sender_type: str,
+        message_id: Any = None,
+        stream_id: Optional[str] = None,
+        platform: Optional[str] = None,
+        user_id: Any = None,
+        user_nickname: Optional[str] = None,
+        content: str = "",
+        display_message: str = "",
+        timestamp: Optional[float] = None,
+        is_emoji: bool = False,
+        is_picid: bool = False,
+        reply_to_id: Optional[str] = None,
+        group_id: Any = None,
+        group_name: Optional[str] = None,
+        seq: Optional[int] = None,
+    ):
+        self.direction = direction
+        self.sender_type = sender_type
+        self.message_id = message_id
+        self.stream_id = stream_id
+        self.platform = platform
+        self.user_id = user_id
+        self.user_nickname = user_nickname
+        self.content = content
+        self.display_message = display_message
+        self.timestamp = timestamp
+        self.is_emoji = is_emoji
+        self.is_picid = is_picid
+        self.reply_to_id = reply_to_id
+        self.group_id = group_id
+        self.group_name = group_name
+        self.seq = seq
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "MessageRecord":
+        """从线路格式字典恢复（如其他进程发布的消息）"""
+        return cls(
+            direction=data.get("direction", "incoming"),
+            sender_type=data.get("sender_type", "user"),
+            **{field: data.get(field) for field in cls.__slots__[2:]},
+        )
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key == "type":
+            return "message"
+        if key == "is_bot":
+            return self.direction == "outgoing"
+        if key in _RECORD_FIELDS:
+            return getattr(self, key)
+        return default
+
+    def to_dict(self) -> dict[str, Any]:
+        """转换为推送给客户端的线路格式"""
+        data = {
+            "type": "message",
+            "direction": self.direction,
+            "sender_type": self.sender_type,
+            "is_bot": self.direction == "outgoing",
+            "message_id": self.message_id,
+            "stream_id": self.stream_id,
+            "platform": self.platform,
+            "user_id": self.user_id,
+            "user_nickname": self.user_nickname,
+            "content": self.content,
+            "display_message": self.display_message,
+            "timestamp": self.timestamp,
+            "is_emoji": self.is_emoji,
+            "is_picid": self.is_picid,
+            "reply_to_id": self.reply_to_id,
+            "group_id": self.group_id,
+            "group_name": self.group_name,
+        }
+        if self.seq is not None:
+            data["seq"] = self.seq
+        return data
+
+
+_RECORD_FIELDS = frozenset(MessageRecord.__slots__)
+
+
+class Frame:
+    """
+    一条待推送的消息
+
+    message 为聊天消息的 MessageRecord，或 coalesced / reset 等控制消息的字典；
+    JSON 文本在第一次被需要时编码并缓存，之后所有订阅者和历史重放共享同一份
+    """
+
+    __slots__ = ("message", "_text")
+
+    def __init__(self, message: Union[MessageRecord, dict[str, Any]], text: Optional[str] = None):
+        self.message = message
+        self._text = text
+
+    @property
+    def data(self) -> dict[str, Any]:
+        """线路格式的消息字典"""
+        message = self.message
+        return message.to_dict() if isinstance(message, MessageRecord) else message
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = encode_message(self.data)
+        return self._text
+
+
+class Subscriber:
+    """
+    单个订阅者的发送端
+
+    消息通过 offer() 非阻塞入队，由独立的发送任务依次调用回调
+    """
+
+    def __init__(
+        self,
+        callback: CallbackType,
+        max_queue: int,
+        overflow_policy: str,
+        on_overflow: Optional[Callable[[], Any]] = None,
+        raw: bool = False,
+    ):
+        """
+        Args:
+            callback: 接收消息的回调函数
+            max_queue: 发送队列上限（条）
+            overflow_policy: 队列满时的策略
+            on_overflow: disconnect 策略下队列溢出时调用，用于关闭连接
+            raw: 为 True 时回调收到已编码的 JSON 文本，而不是消息字典
+        """
+        self.callback = callback
+        self.raw = raw
+        self.max_queue = max(1, max_queue)
+        self.overflow_policy = overflow_policy
+        self.on_overflow = on_overflow
+
+        self.queue: deque[Frame] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.closed = False
+        # 订阅数（同一回调可以订阅多个聊天流）
+        self.subscriptions = 0
+
+        self.sent = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def offer(self, frame: Frame) -> bool:
+        """
+        将消息放入发送队列（不阻塞）
+
+        Returns:
+            是否入队成功
+        """
+        if self.closed:
+            return False
+
+        if len(self.queue) >= self.max_queue:
+            if self.overflow_policy == OVERFLOW_DISCONNECT:
+                logger.debug("订阅者发送队列已满，断开连接")
+                self.dropped += len(self.queue) + 1
+                self.close()
+                if self.on_overflow is not None:
+                    try:
+                        self.on_overflow()
+                    except Exception as e:
+                        logger.debug(f"关闭慢订阅者失败: {e}")
+                return False
+            if self.overflow_policy == OVERFLOW_COALESCE:
+                self._coalesce()
+            else:
+                self.queue.popleft()
+                self.dropped += 1
+
+        self.queue.append(frame)
+        self.max_depth = max(self.max_depth, len(self.queue))
+        self._wakeup.set()
+        return True
+
+    def _coalesce(self) -> None:
+        """把积压的消息合并为一条 coalesced 提示，告知客户端哪些聊天流需要重新拉取"""
+        skipped = 0
+        stream_ids: set[str] = set()
+        for frame in self.queue:
+            queued = frame.message
+            if queued.get("type") == "coalesced":
+                skipped += queued.get("dropped", 0)
+                stream_ids.update(queued.get("stream_ids", []))
+            else:
+                skipped += 1
+                self.dropped += 1
+                if queued.get("stream_id"):
+                    stream_ids.add(queued["stream_id"])
+        self.queue.clear()
+        self.queue.append(Frame({"type": "coalesced", "dropped": skipped, "stream_ids": sorted(stream_ids)}))
+
+    def close(self) -> None:
+        """停止发送，丢弃队列中的消息"""
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        """发送循环，回调抛出异常时视为连接已失效"""
+        try:
+            while not self.closed:
+                if not self.queue:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                frame = self.queue.popleft()
+                result = self.callback(frame.text if self.raw else frame.data)
+                if asyncio.iscoroutine(result):
+                    await result
+                self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug(f"消息回调执行失败，停止向该订阅者发送: {e}")
+        finally:
+            self.closed = True
+            self.queue.clear()
+
+    async def stop(self) -> None:
+        """关闭并等待发送任务结束"""
+        self.close()
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "queue_depth": len(self.queue),
+            "max_queue_depth": self.max_depth,
+            "queue_limit": self.max_queue,
+            "overflow_policy": self.overflow_policy,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "closed": self.closed,
+        }
+
 
 class MessageBroadcaster:
     """消息广播器 - 将消息推送到 WebSocket 客户端"""
 
-    def __init__(self, max_buffer_size: int = 500):
+    def __init__(
+        self,
+        max_buffer_size: int = 500,
+        max_queue: int = 256,
+        overflow_policy: str = OVERFLOW_DROP_OLDEST,
+        stream_buffer_size: int = 100,
+        buffer_budget: int = 5000,
+    ):
         """
         初始化消息广播器
 
         Args:
-            max_buffer_size: 缓冲区最大大小，超过后会丢弃旧消息
+            max_buffer_size: 全局缓冲区最大大小，超过后会丢弃旧消息（用于订阅全部消息的客户端）
+            max_queue: 每个订阅者的发送队列上限（条）
+            overflow_policy: 发送队列满时的策略，drop_oldest / coalesce / disconnect
+            stream_buffer_size: 每个聊天流各自保留的最近消息数
+            buffer_budget: 所有聊天流缓冲区的消息总数上限，超出时淘汰最久没有新消息的聊天流
         """
-        # stream_id -> callbacks 的映射
-        self.subscribers: dict[str, set[CallbackType]] = {}
-        # 订阅所有消息的回调
-        self.global_subscribers: set[CallbackType] = set()
+        # stream_id -> 订阅者 的映射
+        self.subscribers: dict[str, set[Subscriber]] = {}
+        # 订阅所有消息的订阅者
+        self.global_subscribers: set[Subscriber] = set()
+        # 按过滤条件订阅的订阅者
+        self.filters = FilterIndex()
+        # 回调 -> 订阅者，同一回调的多个订阅共享一个发送队列
+        self._by_callback: dict[CallbackType, Subscriber] = {}
         # 消息缓冲区
-        self.buffer: deque[dict[str, Any]] = deque(maxlen=max_buffer_size)
+        self.buffer: deque[Frame] = deque(maxlen=max_buffer_size)
+        # 每个聊天流的环形缓冲区，按最近活跃排序（最久未活跃的在前）
+        self.stream_buffers: OrderedDict[str, deque[Frame]] = OrderedDict()
+        self.stream_buffer_size = max(1, stream_buffer_size)
+        self.buffer_budget = max(self.stream_buffer_size, buffer_budget)
+        self._stream_buffered = 0
+        self.evicted_streams = 0
+        # 每个聊天流最新的序号，随聊天流缓冲区一起淘汰
+        self._stream_seq: dict[str, int] = {}
+        # 已淘汰聊天流的最大序号，没有序号记录的聊天流从这里继续编号，保证同一聊天流的序号单调递增
+        self._seq_floor = 0
+        self.max_queue = max_queue
+        self.overflow_policy = OVERFLOW_DROP_OLDEST
+        self.set_overflow_policy(overflow_policy)
         self._lock = asyncio.Lock()
+        # 跨进程传输，默认只在本进程内广播
+        self.transport = BroadcastTransport()
+        self.remote_received = 0
+        self.remote_invalid = 0
+
+    async def set_transport(self, transport: BroadcastTransport) -> bool:
+        """
+        替换跨进程传输，旧传输会被关闭
+
+        Returns:
+            是否启动成功；失败时退回进程内传输
+        """
+        await self.transport.close()
+        self.transport = BroadcastTransport()
+        try:
+            await transport.start(self._receive_remote)
+        except (OSError, RuntimeError) as e:
+            logger.error(f"实时消息跨进程传输启动失败，只在本进程内广播: {e}")
+            await transport.close()
+            return False
+        self.transport = transport
+        return True
+
+    def set_overflow_policy(self, overflow_policy: str) -> None:
+        """设置新订阅者使用的溢出策略"""
+        if overflow_policy not in OVERFLOW_POLICIES:
+            logger.warning(f"未知的消息队列溢出策略 {overflow_policy}，使用 {OVERFLOW_DROP_OLDEST}")
+            overflow_policy = OVERFLOW_DROP_OLDEST
+        self.overflow_policy = overflow_policy
 
     async def subscribe(
-        self, callback: CallbackType, stream_id: str | None = None
-    ) -> None:
+        self,
+        callback: CallbackType,
+        stream_id: str | None = None,
+        on_overflow: Optional[Callable[[], Any]] = None,
+        replay: int = 0,
+        raw: bool = False,
+        since_seq: Optional[int] = None,
+        message_filter: Optional[MessageFilter] = None,
+        ack: Optional[dict[str, Any]] = None,
+    ) -> Optional[int]:
         """
         订阅消息推送
 
         Args:
-            callback: 接收消息的回调函数，参数为消息字典
+            callback: 接收消息的回调函数，参数为消息字典；由订阅者自己的发送任务调用，
+                抛出异常表示连接已失效
             stream_id: 指定订阅的聊天流ID，None表示订阅所有消息
+            on_overflow: disconnect 策略下发送队列溢出时调用，用于关闭连接
+            replay: 订阅前先放入队列的最近缓存消息数，保证与新消息之间不重不漏且顺序正确
+            raw: 为 True 时回调收到已编码的 JSON 文本（所有订阅者共享），可直接作为文本帧发送
+            since_seq: 客户端已收到的该聊天流最大序号，指定时只补发之后的消息（忽略 replay）；
+                缺失部分已不在缓冲区时改为发送 {"type": "reset"}，客户端应重新拉取历史
+            message_filter: 按过滤条件订阅（忽略 stream_id 和 since_seq），
+                replay 时从全局缓冲区中挑选满足条件的消息
+            ack: 订阅确认消息，登记订阅后放在补发消息之前入队；聊天流订阅会补上 "seq"（此刻的最新序号），
+                过滤订阅会补上 "filter_id"，之后推送的消息序号都大于该值
+
+        Returns:
+            按过滤条件订阅时返回过滤器ID，用于取消该订阅；否则为 None
         """
         async with self._lock:
+            subscriber = self._by_callback.get(callback)
+            if subscriber is None:
+                subscriber = Subscriber(callback, self.max_queue, self.overflow_policy, on_overflow, raw)
+                subscriber.start()
+                self._by_callback[callback] = subscriber
+
+            if message_filter is not None:
+                filter_id = self.filters.add(message_filter, subscriber)
+                subscriber.subscriptions += 1
+                if ack is not None:
+                    subscriber.offer(Frame({**ack, "filter_id": filter_id}))
+                if replay > 0:
+                    frames = list(
+                        itertools.islice(
+                            (f for f in reversed(self.buffer) if message_filter.matches(f.message)),
+                            replay,
+                        )
+                    )
+                    for frame in reversed(frames):
+                        subscriber.offer(frame)
+                logger.debug(f"客户端按过滤条件订阅: {message_filter.to_dict()}")
+                return filter_id
+
+            # 先登记再读取序号和补发，期间没有 await，不会有消息插在确认和补发之间
+            # 重复订阅同一聊天流（或重复订阅全部消息）不重复计数，一次取消即可退订
+            targets = self.subscribers.setdefault(stream_id, set()) if stream_id else self.global_subscribers
+            if subscriber not in targets:
+                targets.add(subscriber)
+                subscriber.subscriptions += 1
             if stream_id:
-                if stream_id not in self.subscribers:
-                    self.subscribers[stream_id] = set()
-                self.subscribers[stream_id].add(callback)
                 logger.debug(f"客户端订阅聊天流: {stream_id}")
             else:
-                self.global_subscribers.add(callback)
                 logger.debug("客户端订阅所有消息")
 
+            if ack is not None:
+                subscriber.offer(Frame({**ack, "seq": self.current_seq(stream_id)} if stream_id else ack))
+
+            if stream_id and since_seq is not None:
+                frames = self.frames_since(stream_id, since_seq)
+                if frames is None:
+                    subscriber.offer(
+                        Frame({"type": "reset", "stream_id": stream_id, "seq": self.current_seq(stream_id)})
+                    )
+                else:
+                    for frame in frames:
+                        subscriber.offer(frame)
+            elif replay > 0:
+                for frame in self._recent_frames(stream_id, replay):
+                    subscriber.offer(frame)
+            return None
+
     async def unsubscribe(
-        self, callback: CallbackType, stream_id: str | None = None
+        self,
+        callback: CallbackType,
+        stream_id: str | None = None,
+        filter_id: Optional[int] = None,
     ) -> None:
         """
         取消订阅
 
         Args:
             callback: 要移除的回调函数
-            stream_id: 指定取消订阅的聊天流ID
+            stream_id: 指定取消订阅的聊天流ID，None 表示取消订阅所有消息
+            filter_id: 指定取消的过滤订阅（subscribe 的返回值）
+
+        没有对应的订阅时不做任何事，回调的其他订阅不受影响
         """
         async with self._lock:
-            if stream_id and stream_id in self.subscribers:
-                self.subscribers[stream_id].discard(callback)
+            subscriber = self._by_callback.get(callback)
+            if subscriber is None:
+                return
+            if filter_id is not None:
+                entry = self.filters.get(filter_id)
+                if entry is None or entry[1] is not subscriber:
+                    return
+                self.filters.remove(filter_id)
+            elif stream_id:
+                stream_subscribers = self.subscribers.get(stream_id)
+                if stream_subscribers is None or subscriber not in stream_subscribers:
+                    return
+                stream_subscribers.discard(subscriber)
                 # 如果该流没有订阅者了，删除键
-                if not self.subscribers[stream_id]:
+                if not stream_subscribers:
                     del self.subscribers[stream_id]
             else:
-                self.global_subscribers.discard(callback)
+                if subscriber not in self.global_subscribers:
+                    return
+                self.global_subscribers.discard(subscriber)
+
+            subscriber.subscriptions -= 1
+            if subscriber.subscriptions <= 0:
+                del self._by_callback[callback]
+                await subscriber.stop()
             logger.debug(f"客户端取消订阅: stream_id={stream_id}")
 
+    async def unsubscribe_all(self, callback: CallbackType) -> None:
+        """取消回调的全部订阅并停止其发送任务，在连接关闭时调用"""
+        async with self._lock:
+            subscriber = self._by_callback.pop(callback, None)
+            if subscriber is None:
+                return
+            self.global_subscribers.discard(subscriber)
+            for filter_id in self.filters.ids_for(subscriber):
+                self.filters.remove(filter_id)
+            for stream_id in [sid for sid, subs in self.subscribers.items() if subscriber in subs]:
+                self.subscribers[stream_id].discard(subscriber)
+                if not self.subscribers[stream_id]:
+                    del self.subscribers[stream_id]
+            await subscriber.stop()
+
+    def enqueue(
+        self,
+        message: Any,
+        stream_id: str | None = None,
+        direction: str = "incoming",
+        sender_type: str = "user",
+    ) -> None:
+        """
+        序列化消息并放入各订阅者的发送队列（不等待发送）
+
+        参数同 broadcast
+        """
+        record = self._serialize_message(message, stream_id, direction, sender_type)
+        if not self.transport.assigns_seq:
+            # 工作进程的消息来自中心，本进程产生的消息（正常不应出现）只在本进程分发，不带序号
+            self._dispatch(Frame(record))
+            return
+        self._sequence_and_publish(record)
+
+    def _sequence_and_publish(self, record: MessageRecord) -> None:
+        """分配聊天流序号，分发给本进程的订阅者并发布到其他进程"""
+        msg_stream_id = record.stream_id
+        if msg_stream_id:
+            seq = self._stream_seq.get(msg_stream_id, self._seq_floor) + 1
+            self._stream_seq[msg_stream_id] = seq
+            record.seq = seq
+        frame = Frame(record)
+        self._dispatch(frame)
+        if self.transport.remote:
+            self.transport.publish(frame)
+
+    def _receive_remote(self, text: str) -> None:
+        """
+        处理中心发来的消息（只在客户端进程中调用）
+
+        消息已由中心编号，沿用其 JSON 文本和序号直接分发
+        """
+        try:
+            msg_dict = decode_message(text)
+        except ValueError:
+            self.remote_invalid += 1
+            return
+        if not isinstance(msg_dict, dict):
+            self.remote_invalid += 1
+            return
+        self.remote_received += 1
+        msg_stream_id = msg_dict.get("stream_id")
+        seq = msg_dict.get("seq")
+        if msg_stream_id and isinstance(seq, int):
+            self._stream_seq[msg_stream_id] = max(self._stream_seq.get(msg_stream_id, 0), seq)
+        message = MessageRecord.from_dict(msg_dict) if msg_dict.get("type") == "message" else msg_dict
+        self._dispatch(Frame(message, text))
+
+    def _dispatch(self, frame: Frame) -> None:
+        """写入缓冲区并放入匹配的订阅者的发送队列"""
+        message = frame.message
+        msg_stream_id = message.get("stream_id")
+        self.buffer.append(frame)
+        self._buffer_for_stream(msg_stream_id, frame)
+
+        stream_subscribers = self.subscribers.get(msg_stream_id, ()) if msg_stream_id else ()
+        for subscriber in self.global_subscribers:
+            subscriber.offer(frame)
+        for subscriber in stream_subscribers:
+            subscriber.offer(frame)
+        if len(self.filters):
+            # 已经通过全局或聊天流订阅收到的订阅者不再重复推送
+            for subscriber in self.filters.match(
+                message, exclude=itertools.chain(self.global_subscribers, stream_subscribers)
+            ):
+                subscriber.offer(frame)
+
     async def broadcast(
         self,
         message: Any,
@@ -85,48 +731,16 @@ class MessageBroadcaster:
         """
         广播消息到所有订阅者
 
+        只把消息放入各订阅者的发送队列，不等待任何客户端发送完成，
+        耗时只与订阅者数量有关
+
         Args:
             message: 消息对象（DatabaseMessages 或 dict）
             stream_id: 聊天流ID
             direction: 消息方向 ("incoming" / "outgoing")
             sender_type: 发送者类型 ("user" / "bot" / "webui")
         """
-        # 序列化消息
-        msg_dict = self._serialize_message(message, stream_id, direction, sender_type)
-
-        # 添加到缓冲区
-        async with self._lock:
-            self.buffer.append(msg_dict)
-            # 复制订阅者列表
-            global_subs = list(self.global_subscribers)
-            stream_subs = (
-                list(self.subscribers.get(stream_id, [])) if stream_id else []
-            )
-
-        # 发送给全局订阅者
-        tasks = []
-        for callback in global_subs:
-            tasks.append(self._safe_callback(callback, msg_dict))
-
-        # 发送给特定流订阅者
-        for callback in stream_subs:
-            tasks.append(self._safe_callback(callback, msg_dict))
-
-        # 并行执行所有回调
-        if tasks:
-            await asyncio.gather(*tasks, return_exceptions=True)
-
-    async def _safe_callback(
-        self, callback: CallbackType, msg_dict: dict[str, Any]
-    ) -> None:
-        """安全执行回调函数"""
-        try:
-            if asyncio.iscoroutinefunction(callback):
-                await callback(msg_dict)
-            else:
-                callback(msg_dict)
-        except Exception as e:
-            logger.debug(f"消息回调执行失败: {e}")
+        self.enqueue(message, stream_id, direction, sender_type)
 
     def _serialize_message(
         self,
@@ -134,9 +748,9 @@ class MessageBroadcaster:
         stream_id: str | None,
         direction: str,
         sender_type: str,
-    ) -> dict[str, Any]:
+    ) -> MessageRecord:
         """
-        将消息对象序列化为字典
+        将消息对象转换为消息记录
 
         Args:
             message: 消息对象
@@ -145,175 +759,60 @@ class MessageBroadcaster:
             sender_type: 发送者类型
 
         Returns:
-            序列化后的消息字典
+            消息记录
         """
-        try:
-            from src.common.data_models.database_data_model import DatabaseMessages
-        except ImportError:
-            DatabaseMessages = None
+        database_messages_type = _get_database_messages_type()
 
-        # 基础消息结构
-        msg_dict: dict[str, Any] = {
-            "type": "message",
-            "direction": direction,
-            "sender_type": sender_type,
-            "is_bot": direction == "outgoing",
-        }
-
-        if DatabaseMessages and isinstance(message, DatabaseMessages):
+        if database_messages_type is not None and isinstance(message, database_messages_type):
             # DatabaseMessages 对象
-            msg_dict.update(
-                {
-                    "message_id": message.message_id,
-                    "stream_id": stream_id or message.chat_id,
-                    "platform": (
-                        message.chat_info.platform if message.chat_info else None
-                    ),
-                    "user_id": message.user_info.user_id if message.user_info else None,
-                    "user_nickname": (
-                        message.user_info.user_nickname if message.user_info else None
-                    ),
-                    "content": message.processed_plain_text,
-                    "display_message": message.display_message,
-                    "timestamp": message.time,
-                    "is_emoji": message.is_emoji,
-                    "is_picid": message.is_picid,
-                    "reply_to_id": message.reply_to,  # 引用消息ID
-                    "group_id": (
-                        message.group_info.group_id if message.group_info else None
-                    ),
-                    "group_name": (
-                        message.group_info.group_name if message.group_info else None
-                    ),
-                }
+            chat_info = message.chat_info
+            user_info = message.user_info
+            group_info = message.group_info
+            return MessageRecord(
+                direction,
+                sender_type,
+                message_id=message.message_id,
+                stream_id=stream_id or message.chat_id,
+                platform=chat_info.platform if chat_info else None,
+                user_id=user_info.user_id if user_info else None,
+                user_nickname=user_info.user_nickname if user_info else None,
+                content=message.processed_plain_text,
+                display_message=message.display_message,
+                timestamp=message.time,
+                is_emoji=message.is_emoji,
+                is_picid=message.is_picid,
+                reply_to_id=message.reply_to,  # 引用消息ID
+                group_id=group_info.group_id if group_info else None,
+                group_name=group_info.group_name if group_info else None,
             )
-        elif isinstance(message, dict):
+
+        if isinstance(message, dict):
             # MessageEnvelope 或其他字典
             message_info = message.get("message_info", {})
             user_info = message_info.get("user_info", {})
             group_info = message_info.get("group_info", {})
-            message_segment = message.get("message_segment", {})
-
-            # 提取引用消息ID
-            reply_to_id = self._extract_reply_from_segment(message_segment)
-
-            # 提取消息内容
-            content = self._extract_content_from_segment(message_segment)
-
-            msg_dict.update(
-                {
-                    "message_id": message_info.get("message_id"),
-                    "stream_id": stream_id,
-                    "platform": message_info.get("platform") or message.get("platform"),
-                    "user_id": user_info.get("user_id"),
-                    "user_nickname": user_info.get("user_nickname"),
-                    "content": content,
-                    "display_message": content,
-                    "timestamp": message_info.get("time"),
-                    "is_emoji": False,
-                    "is_picid": False,
-                    "reply_to_id": reply_to_id,
-                    "group_id": group_info.get("group_id") if group_info else None,
-                    "group_name": group_info.get("group_name") if group_info else None,
-                }
-            )
-        else:
-            # 未知类型
-            msg_dict.update(
-                {
-                    "message_id": None,
-                    "stream_id": stream_id,
-                    "content": str(message),
-                    "timestamp": None,
-                }
-            )
 
-        return msg_dict
+            # 提取消息内容和引用消息ID
+            content, reply_to_id = _segment_extractor.extract(message.get("message_segment"))
 
-    def _extract_reply_from_segment(
-        self, segment: dict | list | None
-    ) -> str | None:
-        """
-        从 message_segment 中提取引用消息 ID
-
-        Args:
-            segment: message_segment 数据
-
-        Returns:
-            被引用消息的 message_id，或 None
-        """
-        if not segment:
-            return None
-
-        if isinstance(segment, dict):
-            seg_type = segment.get("type")
-            if seg_type == "reply":
-                # reply 类型的 data 直接是 message_id 字符串
-                return segment.get("data")
-            elif seg_type == "seglist":
-                # seglist 包含多个段
-                for seg in segment.get("data", []):
-                    if isinstance(seg, dict) and seg.get("type") == "reply":
-                        return seg.get("data")
-        elif isinstance(segment, list):
-            for seg in segment:
-                if isinstance(seg, dict) and seg.get("type") == "reply":
-                    return seg.get("data")
-
-        return None
-
-    def _extract_content_from_segment(
-        self, segment: dict | list | None
-    ) -> str:
-        """
-        从 message_segment 中提取文本内容
-
-        Args:
-            segment: message_segment 数据
-
-        Returns:
-            消息文本内容
-        """
-        if not segment:
-            return ""
-
-        contents = []
-
-        def extract_from_seg(seg: dict) -> None:
-            seg_type = seg.get("type")
-            data = seg.get("data")
-
-            if seg_type == "text":
-                if isinstance(data, str):
-                    contents.append(data)
-                elif isinstance(data, dict):
-                    contents.append(data.get("text", ""))
-            elif seg_type == "image":
-                contents.append("[图片]")
-            elif seg_type == "emoji":
-                contents.append("[表情]")
-            elif seg_type == "voice":
-                contents.append("[语音]")
-            elif seg_type == "video":
-                contents.append("[视频]")
-            elif seg_type == "file":
-                contents.append("[文件]")
-            elif seg_type == "at":
-                at_name = data.get("name", "") if isinstance(data, dict) else ""
-                contents.append(f"@{at_name}")
-            elif seg_type == "seglist":
-                for sub_seg in data if isinstance(data, list) else []:
-                    if isinstance(sub_seg, dict):
-                        extract_from_seg(sub_seg)
-
-        if isinstance(segment, dict):
-            extract_from_seg(segment)
-        elif isinstance(segment, list):
-            for seg in segment:
-                if isinstance(seg, dict):
-                    extract_from_seg(seg)
+            return MessageRecord(
+                direction,
+                sender_type,
+                message_id=message_info.get("message_id"),
+                stream_id=stream_id,
+                platform=message_info.get("platform") or message.get("platform"),
+                user_id=user_info.get("user_id"),
+                user_nickname=user_info.get("user_nickname"),
+                content=content,
+                display_message=content,
+                timestamp=message_info.get("time"),
+                reply_to_id=reply_to_id,
+                group_id=group_info.get("group_id") if group_info else None,
+                group_name=group_info.get("group_name") if group_info else None,
+            )
 
-        return "".join(contents)
+        # 未知类型
+        return MessageRecord(direction, sender_type, stream_id=stream_id, content=str(message))
 
     def get_recent_messages(self, limit: int = 100) -> list[dict[str, Any]]:
         """
@@ -325,7 +824,7 @@ class MessageBroadcaster:
         Returns:
             消息列表
         """
-        return list(self.buffer)[-limit:]
+        return [frame.data for frame in self._recent_frames(None, limit)]
 
     def get_recent_messages_for_stream(
         self, stream_id: str, limit: int = 100
@@ -340,14 +839,123 @@ class MessageBroadcaster:
         Returns:
             消息列表
         """
-        messages = [
-            msg for msg in self.buffer if msg.get("stream_id") == stream_id
-        ]
-        return messages[-limit:]
+        return [frame.data for frame in self._recent_frames(stream_id, limit)]
+
+    def _buffer_for_stream(self, stream_id: str | None, frame: Frame) -> None:
+        """写入聊天流自己的环形缓冲区，总量超出预算时淘汰最久未活跃的聊天流"""
+        if not stream_id:
+            return
+        buf = self.stream_buffers.get(stream_id)
+        if buf is None:
+            buf = deque(maxlen=self.stream_buffer_size)
+            self.stream_buffers[stream_id] = buf
+        else:
+            self.stream_buffers.move_to_end(stream_id)
+
+        if len(buf) < self.stream_buffer_size:
+            self._stream_buffered += 1
+        buf.append(frame)
+
+        while self._stream_buffered > self.buffer_budget:
+            evicted_id, evicted = self._evict_oldest_stream()
+            logger.debug(f"消息缓冲区超出预算，淘汰聊天流缓存: {evicted_id} ({len(evicted)} 条)")
+
+    def _evict_oldest_stream(self) -> tuple[str, deque[Frame]]:
+        """淘汰最久未活跃的聊天流缓冲区及其序号记录"""
+        evicted_id, evicted = self.stream_buffers.popitem(last=False)
+        self._stream_buffered -= len(evicted)
+        self.evicted_streams += 1
+        self._forget_seq(evicted_id)
+        return evicted_id, evicted
+
+    def _forget_seq(self, stream_id: str) -> None:
+        """丢弃聊天流的序号记录；该聊天流之后的消息从 _seq_floor 继续编号，客户端旧的 since_seq 会得到 reset"""
+        seq = self._stream_seq.pop(stream_id, 0)
+        if seq > self._seq_floor:
+            self._seq_floor = seq
+
+    def _recent_frames(self, stream_id: str | None, limit: int) -> list[Frame]:
+        """获取最近的缓存帧，stream_id 为 None 时不区分聊天流；耗时与返回条数成正比"""
+        if limit <= 0:
+            return []
+        buf = self.buffer if stream_id is None else self.stream_buffers.get(stream_id)
+        if not buf:
+            return []
+        frames = list(itertools.islice(reversed(buf), limit))
+        frames.reverse()
+        return frames
+
+    def current_seq(self, stream_id: str) -> int:
+        """聊天流最新消息的序号，没有消息时为 0"""
+        return self._stream_seq.get(stream_id, 0)
+
+    def frames_since(self, stream_id: str, since_seq: int) -> Optional[list[Frame]]:
+        """
+        获取聊天流中序号大于 since_seq 的缓存帧
+
+        Returns:
+            缺失的帧（可能为空）；缺失部分已被淘汰或序号不连续（如服务重启）时返回 None
+        """
+        latest = self.current_seq(stream_id)
+        if since_seq == latest:
+            return []
+        if since_seq > latest or since_seq < 0:
+            return None
+        buf = self.stream_buffers.get(stream_id)
+        # 客户端进程与中心断开期间分发的消息没有序号，视为 0
+        if not buf or (buf[0].message.get("seq") or 0) > since_seq + 1:
+            return None
+        frames = list(
+            itertools.takewhile(lambda frame: (frame.message.get("seq") or 0) > since_seq, reversed(buf))
+        )
+        frames.reverse()
+        return frames
+
+    def set_stream_buffer_limits(
+        self,
+        stream_buffer_size: Optional[int] = None,
+        buffer_budget: Optional[int] = None,
+    ) -> None:
+        """调整聊天流缓冲区大小和总预算，已有缓存按新大小截断"""
+        if stream_buffer_size is not None:
+            self.stream_buffer_size = max(1, int(stream_buffer_size))
+            for stream_id, buf in self.stream_buffers.items():
+                self.stream_buffers[stream_id] = deque(buf, maxlen=self.stream_buffer_size)
+            self._stream_buffered = sum(len(buf) for buf in self.stream_buffers.values())
+        if buffer_budget is not None:
+            self.buffer_budget = int(buffer_budget)
+        self.buffer_budget = max(self.stream_buffer_size, self.buffer_budget)
+        while self._stream_buffered > self.buffer_budget:
+            self._evict_oldest_stream()
 
     def clear_buffer(self) -> None:
         """清空消息缓冲区"""
         self.buffer.clear()
+        self.stream_buffers.clear()
+        self._stream_buffered = 0
+        for stream_id in list(self._stream_seq):
+            self._forget_seq(stream_id)
+
+    def get_stats(self) -> dict[str, Any]:
+        """获取订阅者发送队列统计"""
+        return {
+            "overflow_policy": self.overflow_policy,
+            "queue_limit": self.max_queue,
+            "buffered": len(self.buffer),
+            "buffered_streams": len(self.stream_buffers),
+            "stream_buffered": self._stream_buffered,
+            "stream_buffer_size": self.stream_buffer_size,
+            "buffer_budget": self.buffer_budget,
+            "evicted_streams": self.evicted_streams,
+            "tracked_seq_streams": len(self._stream_seq),
+            "filter_index": self.filters.get_stats(),
+            "transport": {
+                **self.transport.get_stats(),
+                "remote_received": self.remote_received,
+                "remote_invalid": self.remote_invalid,
+            },
+            "subscribers": [s.snapshot() for s in self._by_callback.values()],
+        }
 
 
 # ==================== 全局单例 ====================
@@ -362,3 +970,58 @@ def get_message_broadcaster() -> MessageBroadcaster:
         _broadcaster = MessageBroadcaster()
         logger.info("消息广播器已初始化")
     return _broadcaster
+
+
+def configure_message_broadcaster(
+    max_queue: Optional[int] = None,
+    overflow_policy: Optional[str] = None,
+    stream_buffer_size: Optional[int] = None,
+    buffer_budget: Optional[int] = None,
+) -> MessageBroadcaster:
+    """
+    按插件配置调整广播器，队列参数只影响之后建立的订阅
+
+    Args:
+        max_queue: 每个订阅者的发送队列上限（条）
+        overflow_policy: 发送队列满时的策略
+        stream_buffer_size: 每个聊天流保留的最近消息数
+        buffer_budget: 所有聊天流缓冲区的消息总数上限
+
+    Returns:
+        广播器单例
+    """
+    broadcaster = get_message_broadcaster()
+    if max_queue is not None:
+        broadcaster.max_queue = max(1, int(max_queue))
+    if overflow_policy is not None:
+        broadcaster.set_overflow_policy(str(overflow_policy))
+    if stream_buffer_size is not None or buffer_budget is not None:
+        broadcaster.set_stream_buffer_limits(stream_buffer_size, buffer_budget)
+    return broadcaster
+
+
+async def configure_broadcast_transport(
+    transport: str = "local",
+    role: str = "hub",
+    socket_path: str = "",
+) -> MessageBroadcaster:
+    """
+    设置广播器的跨进程传输
+
+    Args:
+        transport: local 只在本进程内广播；unix 通过 Unix 域套接字在进程间转发
+        role: hub 为中心（机器人进程），负责分配序号；client 为连接中心的 WebUI 工作进程
+        socket_path: 套接字路径，留空使用默认路径
+
+    Returns:
+        广播器单例
+    """
+    broadcaster = get_message_broadcaster()
+    await broadcaster.set_transport(create_transport(transport, role, socket_path))
+    return broadcaster
+
+
+async def close_broadcast_transport() -> None:
+    """关闭跨进程传输，恢复为进程内广播"""
+    if _broadcaster is not None:
+        await _broadcaster.set_transport(BroadcastTransport())
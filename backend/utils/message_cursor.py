@@ -0,0 +1,95 @@
+"""
+历史消息键集分页
+按 (time, message_id) 定位分页位置，游标对客户端不透明；
+查询从游标位置沿时间索引扫描，每页的开销只与页大小有关
+"""
+
+import base64
+import json
+import math
+from typing import Any, Optional
+
+# 分页游标方向
+CURSOR_BEFORE = "before"
+CURSOR_AFTER = "after"
+
+# 分页位置：(时间戳, 消息 ID)，消息 ID 为 None 时只比较时间
+PagePosition = tuple[float, Optional[str]]
+
+
+def encode_cursor(direction: str, timestamp: float, message_id: Optional[str]) -> str:
+    """把分页位置编码为不透明的游标（URL 安全的 base64 JSON）"""
+    payload = json.dumps({"d": direction, "t": timestamp, "id": message_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, float, Optional[str]]:
+    """
+    解析分页游标
+
+    Returns:
+        (方向, 时间戳, 消息 ID)
+
+    Raises:
+        ValueError: 游标格式无效
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        direction = data["d"]
+        timestamp = float(data["t"])
+        message_id = data.get("id")
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise ValueError("无效的分页游标") from e
+    if (
+        direction not in (CURSOR_BEFORE, CURSOR_AFTER)
+        or not math.isfinite(timestamp)
+        or (message_id is not None and not isinstance(message_id, str))
+    ):
+        raise ValueError("无效的分页游标")
+    return direction, timestamp, message_id
+
+
+def keyset_condition(model: Any, direction: str, timestamp: float, message_id: Optional[str]) -> Any:
+    """(time, message_id) 严格早于/晚于游标位置的 SQLAlchemy 条件；没有消息 ID 时只比较时间"""
+    from sqlalchemy import and_, or_
+
+    if direction == CURSOR_BEFORE:
+        if message_id is None:
+            return model.time < timestamp
+        return or_(model.time < timestamp, and_(model.time == timestamp, model.message_id < message_id))
+    if message_id is None:
+        return model.time > timestamp
+    return or_(model.time > timestamp, and_(model.time == timestamp, model.message_id > message_id))
+
+
+def next_page_cursor(
+    messages: list[dict[str, Any]],
+    has_more: bool,
+    before: Optional[PagePosition] = None,
+    after: Optional[PagePosition] = None,
+) -> Optional[str]:
+    """
+    计算继续翻页的游标
+
+    Args:
+        messages: 本页消息，按时间升序排列，包含 time 和 message_id
+        has_more: 翻页方向上是否还有更多消息
+        before: 本页查询使用的 before 位置
+        after: 本页查询使用的 after 位置
+
+    Returns:
+        不带位置（最近的消息）或 before 方向：指向本页最早一条的 before 游标，没有更早的消息时为 None；
+        after 方向：指向本页最后一条的 after 游标，本页为空时沿用原位置，便于之后继续拉取新消息
+    """
+    if before is None and after is None:
+        if not messages:
+            return None
+        oldest = min(messages, key=lambda m: (m.get("time") or 0, m.get("message_id") or ""))
+        return encode_cursor(CURSOR_BEFORE, oldest.get("time") or 0, oldest.get("message_id"))
+    if before is not None:
+        if not has_more or not messages:
+            return None
+        return encode_cursor(CURSOR_BEFORE, messages[0]["time"], messages[0]["message_id"])
+    if messages:
+        return encode_cursor(CURSOR_AFTER, messages[-1]["time"], messages[-1]["message_id"])
+    return encode_cursor(CURSOR_AFTER, *after)
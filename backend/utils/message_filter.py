@@ -0,0 +1,250 @@
+"""
+实时消息订阅过滤器
+客户端在订阅命令中携带过滤条件（平台、群号、用户、方向、发送者类型、关键词），
+广播器把过滤条件编入按字段值建立的索引，每条消息只与可能匹配的过滤器比较
+"""
+
+import itertools
+from collections.abc import Iterable
+from typing import Any, Optional
+
+# 可以建立索引的字段：过滤条件字段 -> 消息字段，按选择性从高到低排列，
+# 每个过滤器只登记在它限定的第一个字段的索引中
+INDEXED_FIELDS: tuple[tuple[str, str], ...] = (
+    ("stream_ids", "stream_id"),
+    ("group_ids", "group_id"),
+    ("user_ids", "user_id"),
+    ("platforms", "platform"),
+)
+
+# 其余精确匹配的字段
+EXACT_FIELDS: tuple[tuple[str, str], ...] = (
+    ("directions", "direction"),
+    ("sender_types", "sender_type"),
+)
+
+# 过滤条件中字段的别名（单数形式或单个值）
+FIELD_ALIASES: dict[str, str] = {
+    "stream_id": "stream_ids",
+    "group_id": "group_ids",
+    "user_id": "user_ids",
+    "platform": "platforms",
+    "direction": "directions",
+    "sender_type": "sender_types",
+    "keyword": "keywords",
+}
+
+# 单个过滤器每个字段最多允许的取值数
+MAX_VALUES_PER_FIELD = 500
+
+
+def _normalize_values(field: str, raw: Any) -> Optional[frozenset[str]]:
+    if raw is None:
+        return None
+    values = [raw] if isinstance(raw, (str, int)) else raw
+    if not isinstance(values, (list, tuple, set)):
+        raise ValueError(f"过滤字段 {field} 应为字符串或字符串列表")
+    if len(values) > MAX_VALUES_PER_FIELD:
+        raise ValueError(f"过滤字段 {field} 最多允许 {MAX_VALUES_PER_FIELD} 个值")
+    normalized = frozenset(str(value) for value in values if value is not None and str(value) != "")
+    return normalized or None
+
+
+class MessageFilter:
+    """
+    一组过滤条件
+
+    各字段之间为“且”，同一字段的多个取值之间为“或”；
+    关键词不区分大小写，匹配消息内容或显示文本
+    """
+
+    __slots__ = (
+        "stream_ids",
+        "group_ids",
+        "user_ids",
+        "platforms",
+        "directions",
+        "sender_types",
+        "keywords",
+    )
+
+    def __init__(
+        self,
+        stream_ids: Optional[frozenset[str]] = None,
+        group_ids: Optional[frozenset[str]] = None,
+        user_ids: Optional[frozenset[str]] = None,
+        platforms: Optional[frozenset[str]] = None,
+        directions: Optional[frozenset[str]] = None,
+        sender_types: Optional[frozenset[str]] = None,
+        keywords: Optional[tuple[str, ...]] = None,
+    ):
+        self.stream_ids = stream_ids
+        self.group_ids = group_ids
+        self.user_ids = user_ids
+        self.platforms = platforms
+        self.directions = directions
+        self.sender_types = sender_types
+        self.keywords = keywords
+
+    @classmethod
+    def from_spec(cls, spec: dict[str, Any]) -> "MessageFilter":
+        """
+        从订阅命令中的过滤条件创建过滤器
+
+        Args:
+            spec: 如 {"platforms": ["qq"], "group_ids": ["123"], "keyword": "麦麦"}，
+                字段可以用单数形式，取值可以是单个值或列表
+
+        Raises:
+            ValueError: 过滤条件格式错误
+        """
+        if not isinstance(spec, dict):
+            raise ValueError("过滤条件应为对象")
+
+        fields: dict[str, Any] = {}
+        for key, raw in spec.items():
+            field = FIELD_ALIASES.get(key, key)
+            if field not in cls.__slots__:
+                raise ValueError(f"未知的过滤字段: {key}")
+            if field == "keywords":
+                keywords = _normalize_values(key, raw)
+                fields[field] = tuple(sorted(k.lower() for k in keywords)) if keywords else None
+            else:
+                fields[field] = _normalize_values(key, raw)
+        return cls(**fields)
+
+    @property
+    def index_field(self) -> Optional[str]:
+        """登记索引使用的字段，None 表示没有可索引的条件"""
+        for field, _ in INDEXED_FIELDS:
+            if getattr(self, field) is not None:
+                return field
+        return None
+
+    def matches(self, message: dict[str, Any]) -> bool:
+        """判断消息是否满足全部条件"""
+        for field, key in itertools.chain(INDEXED_FIELDS, EXACT_FIELDS):
+            allowed = getattr(self, field)
+            if allowed is None:
+                continue
+            value = message.get(key)
+            if value is None or str(value) not in allowed:
+                return False
+
+        if self.keywords is not None:
+            text = f"{message.get('content') or ''}\n{message.get('display_message') or ''}".lower()
+            if not any(keyword in text for keyword in self.keywords):
+                return False
+        return True
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            field: sorted(getattr(self, field)) if field != "keywords" else list(self.keywords)
+            for field in self.__slots__
+            if getattr(self, field) is not None
+        }
+
+
+class FilterIndex:
+    """
+    过滤订阅的索引
+
+    每个过滤器按 INDEXED_FIELDS 中它限定的第一个字段登记到“字段值 -> 过滤器”的映射中，
+    匹配消息时只取出消息对应字段值下的过滤器逐个校验；没有可索引条件的过滤器每条消息都要校验
+    """
+
+    def __init__(self):
+        # 索引字段 -> 字段值 -> 过滤器ID -> (过滤器, 订阅者)
+        self._indexes: dict[str, dict[str, dict[int, tuple[MessageFilter, Any]]]] = {
+            field: {} for field, _ in INDEXED_FIELDS
+        }
+        # 没有可索引条件的过滤器
+        self._unindexed: dict[int, tuple[MessageFilter, Any]] = {}
+        # 过滤器ID -> (过滤器, 订阅者)
+        self._entries: dict[int, tuple[MessageFilter, Any]] = {}
+        self._next_id = itertools.count(1)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, message_filter: MessageFilter, subscriber: Any) -> int:
+        """
+        登记过滤器
+
+        Returns:
+            过滤器ID，用于取消订阅
+        """
+        filter_id = next(self._next_id)
+        entry = (message_filter, subscriber)
+        self._entries[filter_id] = entry
+        field = message_filter.index_field
+        if field is None:
+            self._unindexed[filter_id] = entry
+        else:
+            index = self._indexes[field]
+            for value in getattr(message_filter, field):
+                index.setdefault(value, {})[filter_id] = entry
+        return filter_id
+
+    def remove(self, filter_id: int) -> Optional[tuple[MessageFilter, Any]]:
+        """移除过滤器，返回被移除的 (过滤器, 订阅者)"""
+        entry = self._entries.pop(filter_id, None)
+        if entry is None:
+            return None
+        message_filter = entry[0]
+        field = message_filter.index_field
+        if field is None:
+            self._unindexed.pop(filter_id, None)
+        else:
+            index = self._indexes[field]
+            for value in getattr(message_filter, field):
+                bucket = index.get(value)
+                if bucket is None:
+                    continue
+                bucket.pop(filter_id, None)
+                if not bucket:
+                    del index[value]
+        return entry
+
+    def get(self, filter_id: int) -> Optional[tuple[MessageFilter, Any]]:
+        return self._entries.get(filter_id)
+
+    def ids_for(self, subscriber: Any) -> list[int]:
+        """订阅者登记的全部过滤器ID"""
+        return [filter_id for filter_id, (_, owner) in self._entries.items() if owner is subscriber]
+
+    def match(self, message: dict[str, Any], exclude: Iterable[Any] = ()) -> list[Any]:
+        """
+        找出过滤器与消息匹配的订阅者（每个订阅者只出现一次）
+
+        Args:
+            message: 序列化后的消息字典
+            exclude: 已经通过其他订阅收到该消息的订阅者
+        """
+        if not self._entries:
+            return []
+        seen = set(exclude)
+        matched = []
+        for field, key in INDEXED_FIELDS:
+            value = message.get(key)
+            if value is None:
+                continue
+            bucket = self._indexes[field].get(str(value))
+            if not bucket:
+                continue
+            for message_filter, subscriber in bucket.values():
+                if subscriber not in seen and message_filter.matches(message):
+                    seen.add(subscriber)
+                    matched.append(subscriber)
+        for message_filter, subscriber in self._unindexed.values():
+            if subscriber not in seen and message_filter.matches(message):
+                seen.add(subscriber)
+                matched.append(subscriber)
+        return matched
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            "filters": len(self._entries),
+            "unindexed": len(self._unindexed),
+            "indexed_values": {field: len(index) for field, index in self._indexes.items()},
+        }
@@ -108,6 +108,81 @@ export function clearServerInfoCache() {
   cachedServerInfo = null
 }
 
+// ==================== 主程序实例选择 ====================
+
+/**
+ * 保存所选主程序实例 ID 的 localStorage 键
+ * 为空时不指定实例，由发现服务器按 instance_routing 策略选择
+ */
+const BOT_INSTANCE_STORAGE_KEY = 'mofox_bot_instance'
+
+/**
+ * 主程序实例状态（/api/server-info 返回的 instances 条目）
+ */
+export interface BotInstanceInfo {
+  id: string
+  name: string
+  status: 'unknown' | 'up' | 'down'
+  latency_ms: number | null
+  in_flight: number
+  default: boolean
+}
+
+/**
+ * 获取发现服务器代理的所有主程序实例
+ *
+ * @returns 实例列表，只有一个实例或请求失败时前端无需显示实例选择
+ */
+export async function getBotInstances(): Promise<BotInstanceInfo[]> {
+  if (import.meta.env.MODE === 'demo') {
+    return []
+  }
+  try {
+    const response = await fetch(`${DISCOVERY_SERVER_URL}/api/server-info`)
+    if (!response.ok) {
+      return []
+    }
+    const data = await response.json()
+    return data.instances || []
+  } catch (error) {
+    console.error('获取主程序实例列表失败:', error)
+    return []
+  }
+}
+
+/**
+ * 获取当前选择的主程序实例 ID，未选择时为空字符串
+ */
+export function getBotInstance(): string {
+  return localStorage.getItem(BOT_INSTANCE_STORAGE_KEY) || ''
+}
+
+/**
+ * 选择主程序实例，传入空字符串恢复为由发现服务器选择
+ */
+export function setBotInstance(instanceId: string) {
+  if (instanceId) {
+    localStorage.setItem(BOT_INSTANCE_STORAGE_KEY, instanceId)
+  } else {
+    localStorage.removeItem(BOT_INSTANCE_STORAGE_KEY)
+  }
+}
+
+/**
+ * 为 URL 附加 bot_instance 查询参数
+ *
+ * 用于无法设置请求头的场景（WebSocket、<img src> 等），
+ * 图片等媒体链接的签名只在签发它的实例上有效，必须发往同一实例
+ */
+export function withBotInstance(url: string): string {
+  const instanceId = getBotInstance()
+  if (!instanceId || !url) {
+    return url
+  }
+  const separator = url.includes('?') ? '&' : '?'
+  return `${url}${separator}bot_instance=${encodeURIComponent(instanceId)}`
+}
+
 /**
  * 获取 API 基础 URL
  * 
@@ -394,6 +469,12 @@ class ApiClient {
     if (this.token) {
       headers.set('X-API-Key', this.token)
     }
+
+    // 指定主程序实例（发现服务器代理多个机器人时）
+    const botInstance = getBotInstance()
+    if (botInstance) {
+      headers.set('X-Bot-Instance', botInstance)
+    }
     
     // 设置默认 Content-Type（除非是 FormData，让浏览器自动设置）
     if (!headers.has('Content-Type') && options.body && !(options.body instanceof FormData)) {
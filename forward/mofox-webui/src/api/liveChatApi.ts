@@ -3,7 +3,7 @@
  * 提供实时消息相关的 API 请求封装
  */
 
-import { api, getServerInfo } from './index'
+import { api, getServerInfo, withBotInstance } from './index'
 
 // ==================== 类型定义 ====================
 
@@ -32,8 +32,8 @@ export interface MessageInfo {
   reply_to_id: string | null
   direction: 'incoming' | 'outgoing'
   sender_type: 'user' | 'bot' | 'webui'
-  image_data?: string | null  // base64 图片数据 (data:image/...)
-  emoji_data?: string | null  // base64 表情包数据 (data:image/...)
+  image_data?: string | null  // 图片 URL (/plugins/webui_backend/media/image/{hash})，带短期签名，可直接用作 src
+  emoji_data?: string | null  // 表情包 URL (/plugins/webui_backend/media/emoji/{hash})，带短期签名，可直接用作 src
 }
 
 /** 聊天流列表响应 */
@@ -48,6 +48,16 @@ interface MessagesResponse {
   success: boolean
   messages: MessageInfo[]
   count: number
+  next_cursor?: string | null  // 继续向同一方向翻页的游标，为空表示没有更早的消息
+  has_more?: boolean
+  error?: string | null
+}
+
+/** 历史消息分页结果 */
+export interface MessagePage {
+  messages: MessageInfo[]
+  nextCursor: string | null
+  hasMore: boolean
 }
 
 /** 发送消息请求 */
@@ -117,6 +127,40 @@ export async function getMessages(
   }
 }
 
+/**
+ * 按游标分页获取历史消息
+ * @param streamId 聊天流ID
+ * @param cursor 上一页返回的 nextCursor，为空时获取最近的消息
+ * @param limit 每页数量
+ * @returns 本页消息（按时间升序）和继续翻页的游标
+ */
+export async function getMessagesPage(
+  streamId: string,
+  cursor: string | null = null,
+  limit: number = 100
+): Promise<MessagePage> {
+  const params = new URLSearchParams({ limit: String(limit) })
+  if (cursor) params.set('cursor', cursor)
+  try {
+    const response = await api.get<MessagesResponse>(
+      `live_chat/messages/${streamId}?${params.toString()}`
+    )
+    if (response.success && response.data) {
+      const data = response.data as unknown as MessagesResponse
+      if (data.success && data.messages) {
+        return {
+          messages: data.messages,
+          nextCursor: data.next_cursor ?? null,
+          hasMore: data.has_more ?? false
+        }
+      }
+    }
+  } catch (error) {
+    console.error('获取历史消息失败:', error)
+  }
+  return { messages: [], nextCursor: null, hasMore: false }
+}
+
 /**
  * 发送消息
  * @param request 发送消息请求
@@ -150,26 +194,6 @@ export async function sendMessage(request: SendMessageRequest): Promise<{
   }
 }
 
-/**
- * 获取图片 URL
- * @param hash 图片哈希
- * @returns 图片 URL
- */
-export function getImageUrl(hash: string | null): string {
-  if (!hash) return ''
-  return `/plugins/webui_backend/live_chat/image/${hash}`
-}
-
-/**
- * 获取表情 URL
- * @param hash 表情哈希
- * @returns 表情 URL
- */
-export function getEmojiUrl(hash: string | null): string {
-  if (!hash) return ''
-  return `/plugins/webui_backend/live_chat/emoji/${hash}`
-}
-
 /**
  * 创建 WebSocket 连接 URL
  * @returns WebSocket URL
@@ -178,7 +202,9 @@ export async function createWebSocketUrl(): Promise<string> {
   // 使用相对路径，自动通过代理服务器转发（开发环境走Vite代理，生产环境走发现服务器代理）
   const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:'
   const token = localStorage.getItem('mofox_token') || ''
-  return `${protocol}//${window.location.host}/ws/plugins/webui_backend/live_chat/realtime?token=${encodeURIComponent(token)}`
+  return withBotInstance(
+    `${protocol}//${window.location.host}/ws/plugins/webui_backend/live_chat/realtime?token=${encodeURIComponent(token)}`
+  )
 }
 
 /**